@@ -0,0 +1,179 @@
+"""
+Weekly digest check: many chats, one digest, timed and retried.
+
+Fills the activity store with --chats chats of --users chatters each, then:
+
+  1. times the old per-chat job's store calls (flush, read, add win,
+     flush, drop, flush per chat) on a copy, for comparison (local
+     activity file only)
+  2. runs the digest with the claim step failing once (a crash after the
+     wins were written), then retries it with --fail-sends chats' sends
+     failing, then once more: every chat must be announced once, with
+     exactly one recorded win
+  4. runs it again: nothing is announced, no win is added
+
+Telegram is the in-process fake, with send limits lifted so the numbers
+show the digest itself rather than pacing.
+
+    python bench/digest_check.py --chats 500 --users 300
+    python bench/digest_check.py --shared-store
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fakes import FakeTelegramRequest  # noqa: E402
+
+WEEK = "2026-W10"
+
+
+def fill(store, chats, users):
+    for n, chat in enumerate(chats):
+        for u in range(users):
+            for _ in range((u * 7 + n) % 13 + 1):
+                store.increment(chat.chat_id, WEEK, str(1000 + u), f"@user_{u}")
+
+
+def old_job_store_calls(store, chats):
+    """What announce_weekly_winner did to the store per chat, one chat after another."""
+    for chat in chats:
+        store._dirty = True  # each chat's first flush also wrote buffered counts
+        store.flush()
+        week = store.read(chat.chat_id, WEEK, {})
+        if not week:
+            continue
+        user_id, entry = max(week.items(), key=lambda kv: kv[1]["count"])
+        store.record_wins(f"_old:{WEEK}", [(chat.chat_id, user_id, entry["handle"])])
+        store.flush()
+        store.drop_buckets([(chat.chat_id, WEEK)])
+        store.flush()
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="spore-digest-")
+    os.chdir(workdir)
+    os.environ.update(
+        {
+            "SEND_GLOBAL_PER_SEC": "100000",
+            "SEND_GROUP_PER_MIN": "1000000",
+            "SEND_PRIVATE_PER_SEC": "100000",
+        }
+    )
+    if args.shared_store:
+        os.environ["SHARED_STORE_PATH"] = os.path.join(workdir, "shared.db")
+    from telegram import Bot
+
+    from spore.activity import ACTIVITY_PATH, ACTIVITY_STORE, ActivityStore
+    from spore.chats import ChatConfig
+    from spore.cluster import COORDINATOR
+    from spore import digest
+    from spore.digest import WON_BUCKET_PREFIX, run_weekly_digest
+
+    chats = [ChatConfig(-1002000000000 - n, name=f"chat{n}") for n in range(args.chats)]
+    fill(ACTIVITY_STORE, chats, args.users)
+    ACTIVITY_STORE.flush()
+    print(f"{args.chats} chats x {args.users} users")
+
+    old_seconds = None
+    if not args.shared_store:
+        print(f"activity file {os.path.getsize(ACTIVITY_PATH) / 1e6:.1f} MB")
+        shutil.copy(ACTIVITY_PATH, "old.bin")
+        old_store = ActivityStore("old.bin")
+        old_store.read(chats[0].chat_id, WEEK)
+        start = time.perf_counter()
+        old_job_store_calls(old_store, chats)
+        old_seconds = time.perf_counter() - start
+        print(f"old per-chat store calls: {old_seconds:.3f}s ({3 * args.chats} file writes)")
+
+    transport = FakeTelegramRequest()
+    bot = Bot("123456:digest", request=transport, get_updates_request=FakeTelegramRequest())
+    await bot.initialize()
+    context = types.SimpleNamespace(bot=bot)
+    failures = []
+
+    real_claim_jobs = COORDINATOR.claim_jobs
+
+    def crash_once(keys):
+        COORDINATOR.claim_jobs = real_claim_jobs
+        raise OSError("simulated crash after the wins were written")
+
+    COORDINATOR.claim_jobs = crash_once
+    try:
+        await run_weekly_digest(context, WEEK, chats)
+        failures.append("first attempt should have failed")
+    except OSError as e:
+        print(f"attempt 1: {e}")
+    if transport.api.sent:
+        failures.append("announcements went out before the claims")
+
+    real_announce = digest._announce
+    unlucky = {chat.chat_id for chat in chats[: args.fail_sends]}
+
+    async def flaky_announce(context, chat_digest):
+        if chat_digest.chat.chat_id in unlucky:
+            return False
+        return await real_announce(context, chat_digest)
+
+    digest._announce = flaky_announce
+    start = time.perf_counter()
+    summary = await run_weekly_digest(context, WEEK, chats)
+    new_seconds = time.perf_counter() - start
+    digest._announce = real_announce
+    print(f"attempt 2 (retry, {args.fail_sends} sends failing): {summary}")
+    if summary["failed"] != len(unlucky):
+        failures.append(f"expected {len(unlucky)} failed announcements, got {summary['failed']}")
+
+    summary = await run_weekly_digest(context, WEEK, chats)
+    print(f"attempt 3 (retry the failed): {summary}")
+    if summary["announced"] != len(unlucky) or summary["failed"]:
+        failures.append(f"expected the {len(unlucky)} failed chats to be announced on retry")
+    print(f"batched digest incl. sends: {new_seconds:.3f}s")
+    if old_seconds is not None:
+        print(f"  {old_seconds / new_seconds:.1f}x faster than the old store calls alone")
+
+    announced = {}
+    for sent in transport.api.sent:
+        announced[int(sent["chat_id"])] = announced.get(int(sent["chat_id"]), 0) + 1
+    if sorted(announced.values()) != [1] * len(chats):
+        failures.append(f"expected one announcement per chat, got {len(transport.api.sent)} for {len(announced)} chats")
+    wins = ACTIVITY_STORE.read_buckets([c.chat_id for c in chats], ["_wins", WEEK, WON_BUCKET_PREFIX + WEEK])
+    total_wins = sum(entry["count"] for buckets in wins.values() for entry in buckets.get("_wins", {}).values())
+    leftovers = sum(1 for buckets in wins.values() if WEEK in buckets or WON_BUCKET_PREFIX + WEEK in buckets)
+    if total_wins != len(chats) or leftovers:
+        failures.append(f"expected {len(chats)} wins and no week buckets left, got {total_wins} / {leftovers}")
+    sample = transport.api.sent[0]["text"]
+    print("sample announcement:\n  " + sample.replace("\n", "\n  "))
+
+    summary = await run_weekly_digest(context, WEEK, chats)
+    print(f"attempt 4 (again): {summary}")
+    if summary["announced"] or len(transport.api.sent) != len(chats):
+        failures.append("the last run announced again")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    print("OK" if not failures else f"workdir: {workdir}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--fail-sends", type=int, default=10, help="chats whose announcement fails on the first retry")
+    parser.add_argument("--shared-store", action="store_true", help="multi-worker SQLite store instead of the file")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Drain check: SIGTERM a webhook worker mid-work and verify the shutdown.
+
+Three runs of one bot.py worker in the same directory (no shared store):
+
+  1. slow LLM (1.5s), DRAIN_TIMEOUT_SECONDS=6: mentions in flight at
+     SIGTERM still get their replies, activity is flushed, nothing abandoned
+  2. LLM slower than the deadline, GM window open: the mentions and the
+     GM are abandoned at the deadline, the worker exits in time, activity
+     is still flushed and the GM's claim is released
+  3. fast LLM: the abandoned GM is caught up, exactly once
+
+    python bench/drain_check.py
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fakes import Faults, StubCoinGecko, StubOpenAI, StubTelegram, UpdateFactory  # noqa: E402
+from multiworker_check import CHAT_ID, SECRET, free_port, gm_messages, open_gm_window, wait_ready  # noqa: E402
+from restart_check import post_all, week_counts  # noqa: E402
+
+DRAIN_TIMEOUT = 6.0
+OTHER_CHATS = [CHAT_ID - n for n in range(1, 5)]
+
+
+def replies(telegram):
+    return [sent for sent in telegram.api.sent if sent.get("chat_id") and int(sent["chat_id"]) in OTHER_CHATS]
+
+
+def main():
+    telegram = StubTelegram(Faults()).start()
+    openai_stub = StubOpenAI(Faults()).start()
+    coingecko = StubCoinGecko(Faults()).start()
+
+    workdir = tempfile.mkdtemp(prefix="spore-drain-")
+    os.symlink(os.path.join(ROOT, "knowledge"), os.path.join(workdir, "knowledge"))
+
+    def write_chats(**settings):
+        with open(os.path.join(workdir, "chats.json"), "w", encoding="utf-8") as f:
+            json.dump({"chats": [{"chat_id": CHAT_ID, "name": "main", **settings}]}, f)
+
+    write_chats(gm=False)
+
+    port = free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:drain",
+            "TELEGRAM_BASE_URL": f"{telegram.base_url}/bot",
+            "OPENAI_API_KEY": "sk-drain",
+            "OPENAI_BASE_URL": f"{openai_stub.base_url}/v1",
+            "COINGECKO_URL": f"{coingecko.base_url}/api/v3/simple/price",
+            "BOT_USERNAME": "SporeLoreBot",
+            "BOT_MODE": "webhook",
+            "WEBHOOK_LISTEN": "127.0.0.1",
+            "WEBHOOK_PORT": str(port),
+            "WEBHOOK_SECRET": SECRET,
+            "WEBHOOK_URL": "",
+            "TIMER_TICK_SECONDS": "1",
+            # Only the shutdown flush may write activity
+            "ACTIVITY_FLUSH_SECONDS": "3600",
+            "FLOOD_GUARD": "0",
+            "INTENT_ROUTER": "0",
+            "DRAIN_TIMEOUT_SECONDS": str(DRAIN_TIMEOUT),
+        }
+    )
+    factory = UpdateFactory()
+    failures = []
+
+    def run(label, payloads, llm_ms, settle=0.3):
+        """Start the worker, POST `payloads`, SIGTERM it; returns (exit seconds, log text)."""
+        openai_stub.faults.latency_ms = llm_ms
+        log_path = os.path.join(workdir, f"bot-{label}.log")
+        with open(log_path, "w") as log:
+            proc = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "bot.py")],
+                cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            try:
+                if not wait_ready(port, proc):
+                    failures.append(f"{label}: bot did not become ready")
+                    return None, ""
+                post_all(port, payloads)
+                time.sleep(settle)
+                start = time.perf_counter()
+                proc.send_signal(signal.SIGTERM)
+                proc.wait(timeout=DRAIN_TIMEOUT + 10)
+                took = time.perf_counter() - start
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+        with open(log_path, encoding="utf-8") as f:
+            text = f.read()
+        drain_lines = [line for line in text.splitlines() if "Drained" in line or "Shutdown complete" in line]
+        print(f"[{label}] exited after {took:.2f}s (code {proc.returncode})")
+        for line in drain_lines:
+            print("   ", line.split(" - ")[-1])
+        if proc.returncode != 0:
+            failures.append(f"{label}: exit code {proc.returncode}")
+        return took, text
+
+    def mentions():
+        # Different users too: one user's updates are handled in order
+        return [
+            factory.message(chat_id, 200 + n, "what is spore?", mention=True)
+            for n, chat_id in enumerate(OTHER_CHATS)
+        ]
+
+    def chatter(n):
+        return [factory.message(CHAT_ID, 100 + i % 2, f"chatter {i}") for i in range(n)]
+
+    # 1. In-flight replies finish inside the deadline
+    took, text = run("drain", chatter(10) + mentions(), llm_ms=1500)
+    if len(replies(telegram)) != len(OTHER_CHATS):
+        failures.append(f"drain: expected {len(OTHER_CHATS)} replies, got {len(replies(telegram))}")
+    if "nothing abandoned" not in text:
+        failures.append("drain: something was abandoned")
+    counts = week_counts(workdir)
+    print(f"    activity after run 1: {counts}")
+    if sum(counts.values()) != 10:
+        failures.append(f"drain: expected 10 counted messages, got {sum(counts.values())}")
+
+    # 2. Past the deadline: abandoned, but state still flushed
+    write_chats(gm_window=open_gm_window())
+    sent_before = len(replies(telegram))
+    took, text = run("deadline", chatter(6) + mentions(), llm_ms=30000, settle=2.0)
+    if took is not None and took > DRAIN_TIMEOUT + 2:
+        failures.append(f"deadline: took {took:.1f}s to exit (deadline {DRAIN_TIMEOUT}s)")
+    if "abandoned" not in text or "timer:gm" not in text:
+        failures.append("deadline: expected abandoned updates and the GM in the drain report")
+    if len(replies(telegram)) != sent_before:
+        failures.append("deadline: abandoned mentions were answered")
+    counts = week_counts(workdir)
+    print(f"    activity after run 2: {counts}")
+    if sum(counts.values()) != 16:
+        failures.append(f"deadline: expected 16 counted messages, got {sum(counts.values())}")
+    if gm_messages(telegram):
+        failures.append("deadline: GM was sent although it was abandoned")
+
+    # 3. The abandoned GM is caught up once
+    run("catch-up", [], llm_ms=0, settle=3.0)
+    gms = len(gm_messages(telegram))
+    print(f"    GMs after run 3: {gms}")
+    if gms != 1:
+        failures.append(f"catch-up: expected exactly 1 GM, got {gms}")
+
+    telegram.stop()
+    openai_stub.stop()
+    coingecko.stop()
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        print(f"bot logs: {workdir}")
+    else:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
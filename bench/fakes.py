@@ -0,0 +1,480 @@
+"""
+Local stand-ins for the bot's upstreams, shared by the bench scripts:
+
+- StubOpenAI:     fake /v1/chat/completions server
+- StubCoinGecko:  fake /api/v3/simple/price and /exchange_rates server
+- FakeTelegramRequest: in-process Bot API transport for a real telegram Bot
+- StubTelegram:   the same fake Bot API served over HTTP
+
+Each stub supports a fixed latency, random jitter and error injection, all
+driven by a seeded RNG so runs are reproducible.
+"""
+
+import asyncio
+import email.policy
+import json
+import math
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from telegram.request import BaseRequest
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def approx_tokens(text: str) -> int:
+    """Rough BPE-ish token count (words + punctuation)."""
+    return len(TOKEN_RE.findall(text or ""))
+
+
+class Faults:
+    """Latency + error injection shared by all stubs."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple[float, bool]:
+        """Return (delay seconds, should_fail) for one request."""
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self._rng.random() < self.error_rate
+        return (self.latency_ms + jitter) / 1000.0, fail
+
+
+class _StubServer:
+    """Threaded HTTP server on 127.0.0.1 with an ephemeral port."""
+
+    def __init__(self, faults: Faults):
+        self.faults = faults
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub._dispatch(self, None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                stub._dispatch(self, self.rfile.read(length))
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _dispatch(self, handler, body):
+        delay, fail = self.faults.draw()
+        with self._lock:
+            self.requests += 1
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self._send(handler, 500, {"error": {"message": "injected failure"}})
+            return
+        status, payload = self.handle_request(handler, body)
+        self._send(handler, status, payload)
+
+    @staticmethod
+    def _send(handler, status, payload):
+        raw = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(raw)))
+        handler.end_headers()
+        handler.wfile.write(raw)
+
+    def handle_request(self, handler, body):
+        return self.handle(handler.path, body)
+
+    def handle(self, path, body):
+        raise NotImplementedError
+
+
+class StubOpenAI(_StubServer):
+    """
+    Answers chat completions deterministically and records every prompt,
+    so the harness can check what was actually sent upstream.
+
+    Prompt caching is imitated like OpenAI does it: once a system prompt of
+    at least 1024 tokens has been seen, later calls starting with it report
+    it (rounded down to 128 tokens) as prompt_tokens_details.cached_tokens.
+    """
+
+    GM_REPLY = "gm spores, the mycelium is building today"
+
+    def __init__(self, faults: Faults):
+        super().__init__(faults)
+        self.calls = []
+        self._cached_prefixes = set()
+
+    def handle(self, path, body):
+        if not urlparse(path).path.endswith("/chat/completions"):
+            return 404, {"error": {"message": f"unknown path {path}"}}
+
+        req = json.loads(body or b"{}")
+        messages = req.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in messages if m["role"] == "user"), "")
+        prompt_tokens = sum(approx_tokens(m.get("content", "")) for m in messages)
+        system_tokens = approx_tokens(system)
+
+        if "good-morning" in system:
+            content = self.GM_REPLY
+        else:
+            question = user.split("\n")[1] if "\n" in user else user
+            content = f"stub answer about: {question.strip()[:80]}"
+
+        with self._lock:
+            cached_tokens = 0
+            if system_tokens >= 1024:
+                if system in self._cached_prefixes:
+                    cached_tokens = system_tokens // 128 * 128
+                self._cached_prefixes.add(system)
+            self.calls.append({
+                "system": system,
+                "user": user,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "prompt_cache_key": req.get("prompt_cache_key"),
+            })
+
+        completion_tokens = approx_tokens(content)
+        return 200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+
+class StubCoinGecko(_StubServer):
+    """Serves /simple/price and /exchange_rates from fixed tables."""
+
+    PRICES = {
+        "bitcoin": (97123.45, 1.25),
+        "ethereum": (3456.78, -0.75),
+        "fungi": (0.000123, -1.23),
+        "froggi": (0.002077, 3.45),
+        "pepi-2": (0.000456, 0.0),
+        "jelli": (0.000789, 12.5),
+    }
+
+    # Units per BTC, as CoinGecko reports them
+    RATES = {
+        "btc": ("Bitcoin", "BTC", 1.0),
+        "eth": ("Ether", "ETH", 28.1),
+        "usd": ("US Dollar", "$", 97123.45),
+        "eur": ("Euro", "€", 89553.7),
+        "gbp": ("British Pound Sterling", "£", 76727.5),
+        "jpy": ("Japanese Yen", "¥", 14568517.5),
+    }
+
+    def handle(self, path, body):
+        parsed = urlparse(path)
+        if parsed.path.endswith("/exchange_rates"):
+            return 200, {
+                "rates": {
+                    code: {"name": name, "unit": unit, "value": value, "type": "fiat"}
+                    for code, (name, unit, value) in self.RATES.items()
+                }
+            }
+        if not parsed.path.endswith("/simple/price"):
+            return 404, {"error": f"unknown path {path}"}
+        query = parse_qs(parsed.query)
+        ids = (query.get("ids") or [""])[0].split(",")
+        vs = (query.get("vs_currencies") or ["usd"])[0].split(",")
+        data = {}
+        for cid in ids:
+            if cid not in self.PRICES:
+                continue
+            price, change = self.PRICES[cid]
+            entry = {}
+            for cur in vs:
+                entry[cur] = price
+                entry[f"{cur}_24h_change"] = change
+            data[cid] = entry
+        return 200, data
+
+
+class FakeBotAPI:
+    """
+    Minimal Bot API semantics shared by the in-process transport and the
+    HTTP stub: getMe, sendMessage (recorded in `sent`), sendPhoto (recorded
+    in `photos`, uploads get a new file_id), answerInlineQuery (recorded in
+    `inline_answers`), getUpdates and a generic `True` for everything else.
+
+    With flood_limit set, a chat that receives more than flood_limit
+    messages within flood_window seconds gets a 429 with retry_after,
+    like Telegram's flood control.
+    """
+
+    def __init__(self, bot_id=7000000001, username="SporeLoreBot", flood_limit=0, flood_window=60.0):
+        self.bot_id = bot_id
+        self.username = username
+        self.flood_limit = flood_limit
+        self.flood_window = flood_window
+        self.sent = []
+        self.inline_answers = []
+        self.photos = []
+        self.calls = {}
+        self.flood_errors = 0
+        self._recent = {}
+        self._message_id = 0
+        self._lock = threading.Lock()
+
+    def _flood_check(self, chat_id):
+        """Return retry_after seconds if this send would exceed the flood limit."""
+        if not self.flood_limit:
+            return 0
+        now = time.monotonic()
+        recent = [t for t in self._recent.get(chat_id, []) if now - t < self.flood_window]
+        self._recent[chat_id] = recent
+        if len(recent) >= self.flood_limit:
+            return max(1, math.ceil(self.flood_window - (now - recent[0])))
+        recent.append(now)
+        return 0
+
+    def call(self, endpoint: str, params: dict) -> tuple[int, dict]:
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            if endpoint == "getMe":
+                return 200, {
+                    "ok": True,
+                    "result": {
+                        "id": self.bot_id,
+                        "is_bot": True,
+                        "first_name": "Spore",
+                        "username": self.username,
+                        "can_join_groups": True,
+                        "can_read_all_group_messages": True,
+                        "supports_inline_queries": True,
+                    },
+                }
+            if endpoint == "sendMessage":
+                chat_id = int(params["chat_id"])
+                retry_after = self._flood_check(chat_id)
+                if retry_after:
+                    self.flood_errors += 1
+                    return 429, {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after},
+                    }
+                self._message_id += 1
+                self.sent.append(dict(params))
+                return 200, {
+                    "ok": True,
+                    "result": {
+                        "message_id": self._message_id,
+                        "date": int(time.time()),
+                        "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+                        "from": {"id": self.bot_id, "is_bot": True, "first_name": "Spore"},
+                        "text": params.get("text", ""),
+                    },
+                }
+            if endpoint == "sendPhoto":
+                chat_id = int(params["chat_id"])
+                photo = params.get("photo")
+                # A plain string is a file_id being re-sent; anything else is an upload
+                uploaded = not (isinstance(photo, str) and not photo.startswith("attach://"))
+                file_id = f"photo-{len(self.photos) + 1}" if uploaded else photo
+                self._message_id += 1
+                self.photos.append({"chat_id": chat_id, "file_id": file_id, "uploaded": uploaded,
+                                    "caption": params.get("caption")})
+                return 200, {
+                    "ok": True,
+                    "result": {
+                        "message_id": self._message_id,
+                        "date": int(time.time()),
+                        "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+                        "from": {"id": self.bot_id, "is_bot": True, "first_name": "Spore"},
+                        "photo": [{"file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 320}],
+                    },
+                }
+            if endpoint == "answerInlineQuery":
+                answer = dict(params)
+                if isinstance(answer.get("results"), str):
+                    answer["results"] = json.loads(answer["results"])
+                self.inline_answers.append(answer)
+                return 200, {"ok": True, "result": True}
+            if endpoint == "getUpdates":
+                return 200, {"ok": True, "result": []}
+            return 200, {"ok": True, "result": True}
+
+
+class FakeTelegramRequest(BaseRequest):
+    """
+    Bot API transport that never leaves the process. Plug it into a real
+    telegram.Bot / ApplicationBuilder().request(...) so the whole PTB stack
+    (serialization, Message objects, reply helpers) is exercised.
+    Every outgoing message is recorded in `sent`.
+    """
+
+    def __init__(self, bot_id=7000000001, username="SporeLoreBot", faults: Faults | None = None, api=None):
+        self.api = api or FakeBotAPI(bot_id, username)
+        self.faults = faults or Faults()
+
+    @property
+    def sent(self):
+        return self.api.sent
+
+    @property
+    def calls(self):
+        return self.api.calls
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+
+        delay, fail = self.faults.draw()
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            body = {"ok": False, "error_code": 500, "description": "Internal Server Error: injected"}
+            return 500, json.dumps(body).encode("utf-8")
+
+        status, body = self.api.call(endpoint, params)
+        return status, json.dumps(body).encode("utf-8")
+
+
+class StubTelegram(_StubServer):
+    """
+    Bot API over real HTTP, for running bot.py as a subprocess with
+    TELEGRAM_BASE_URL=<base_url>/bot.
+    """
+
+    def __init__(self, faults: Faults | None = None, api=None):
+        super().__init__(faults or Faults())
+        self.api = api or FakeBotAPI()
+
+    def handle_request(self, handler, body):
+        content_type = handler.headers.get("Content-Type", "")
+        endpoint = urlparse(handler.path).path.rsplit("/", 1)[-1]
+        params = {}
+        if body:
+            if content_type.startswith("application/json"):
+                params = json.loads(body)
+            elif content_type.startswith("multipart/form-data"):
+                message = BytesParser(policy=email.policy.HTTP).parsebytes(
+                    f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+                )
+                for part in message.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    if part.get_filename() is None:
+                        params[name] = part.get_content()
+            else:
+                params = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+        return self.api.call(endpoint, params)
+
+
+class UpdateFactory:
+    """Builds realistic Update payloads (dicts) for group messages and inline queries."""
+
+    def __init__(self, bot_username="SporeLoreBot", bot_id=7000000001):
+        self.bot_username = bot_username
+        self.bot_id = bot_id
+        self._update_id = 0
+        self._message_id = 0
+
+    def message(self, chat_id, user_id, text, mention=False, reply_to_bot=False, username=None):
+        self._update_id += 1
+        self._message_id += 1
+        entities = []
+        if mention:
+            text = f"@{self.bot_username} {text}".rstrip()
+            entities.append({"type": "mention", "offset": 0, "length": len(self.bot_username) + 1})
+        if text.startswith("/"):
+            cmd_len = len(text.split()[0])
+            entities.append({"type": "bot_command", "offset": 0, "length": cmd_len})
+
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"chat {chat_id}"},
+            "from": {
+                "id": user_id,
+                "is_bot": False,
+                "first_name": f"user{user_id}",
+                "username": username or f"user{user_id}",
+            },
+            "text": text,
+        }
+        if entities:
+            message["entities"] = entities
+        if reply_to_bot:
+            message["reply_to_message"] = {
+                "message_id": max(1, self._message_id - 1),
+                "date": int(time.time()),
+                "chat": message["chat"],
+                "from": {"id": self.bot_id, "is_bot": True, "first_name": "Spore"},
+                "text": "earlier bot reply",
+            }
+        return {"update_id": self._update_id, "message": message}
+
+    def inline_query(self, user_id, query):
+        self._update_id += 1
+        return {
+            "update_id": self._update_id,
+            "inline_query": {
+                "id": str(self._update_id),
+                "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                "query": query,
+                "offset": "",
+            },
+        }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
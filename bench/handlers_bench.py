@@ -0,0 +1,366 @@
+"""
+Offline benchmark + eval harness for the bot's handlers.
+
+Drives handle_chat, prices and send_gm with synthetic Updates against local
+stub servers (OpenAI + CoinGecko) and an in-process fake Telegram transport,
+then reports throughput, latency percentiles, prompt token counts and
+reply-correctness on a fixed question set.
+
+Usage:
+    python bench/handlers_bench.py --iterations 20 --out bench_results.json
+    python bench/handlers_bench.py --openai-latency-ms 300 --openai-error-rate 0.1
+    python bench/handlers_bench.py --compare bench_results.json
+
+Runs are reproducible for a given --seed (fault injection and op order).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import (  # noqa: E402
+    Faults,
+    FakeTelegramRequest,
+    StubCoinGecko,
+    StubOpenAI,
+    UpdateFactory,
+    percentile,
+)
+
+BOT_USERNAME = "SporeLoreBot"
+GM_CHAT_ID = -1009999999999
+
+DEGRADED_MARKERS = (
+    "My spores are clogged",
+    "can’t fetch prices",
+    "Could not fetch prices",
+    "gm spores 🌞",
+)
+
+
+# name -> (handler, message kwargs or None for jobs, check(reply texts) -> bool)
+def build_cases():
+    def contains(*needles):
+        return lambda replies: len(replies) == 1 and all(n in replies[0] for n in needles)
+
+    return {
+        "price_single": (
+            "handle_chat",
+            {"text": "what's the fungi price?", "mention": True},
+            contains("FUNGI: $0.000123", "(-1.23%)"),
+        ),
+        "price_multi": (
+            "handle_chat",
+            {"text": "how much is btc and eth trading at", "mention": True},
+            contains("BTC: $97,123.45", "ETH: $3,456.78"),
+        ),
+        "prices_command": (
+            "prices",
+            {"text": "/prices"},
+            contains("Market Spores", "*Froggi* (FROGGI): $0.002077"),
+        ),
+        "prices_in_mention": (
+            "handle_chat",
+            {"text": "/prices", "mention": True},
+            contains("Market Spores"),
+        ),
+        "link_whitepaper": (
+            "handle_chat",
+            {"text": "where is the whitepaper?", "mention": True},
+            contains("Whitepaper: https://fungifungi.art/whitepaper.pdf"),
+        ),
+        "lore_whitepaper": (
+            "handle_chat",
+            {"text": "explain the whitepaper in two lines", "mention": True},
+            contains("stub answer about: explain the whitepaper in two lines"),
+        ),
+        "lore_reply_to_bot": (
+            "handle_chat",
+            {"text": "who runs this bot?", "reply_to_bot": True},
+            contains("stub answer about: who runs this bot?"),
+        ),
+        "empty_mention": (
+            "handle_chat",
+            {"text": "", "mention": True},
+            contains("stub answer about: They pinged you"),
+        ),
+        "ignored_chatter": (
+            "handle_chat",
+            {"text": "lol fungi to the moon"},
+            lambda replies: replies == [],
+        ),
+        "gm": (
+            "send_gm",
+            None,
+            contains(StubOpenAI.GM_REPLY),
+        ),
+    }
+
+
+class FakeJobQueue:
+    """Records jobs the handlers try to schedule."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def run_once(self, callback, when, name=None, **kwargs):
+        self.scheduled.append((name, when))
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run_bench(args):
+    openai_stub = StubOpenAI(
+        Faults(args.openai_latency_ms, args.openai_jitter_ms, args.openai_error_rate, args.seed)
+    ).start()
+    coingecko_stub = StubCoinGecko(
+        Faults(args.coingecko_latency_ms, args.coingecko_jitter_ms, args.coingecko_error_rate, args.seed + 1)
+    ).start()
+
+    os.environ.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:bench",
+            "OPENAI_API_KEY": "sk-bench",
+            "OPENAI_BASE_URL": f"{openai_stub.base_url}/v1",
+            "COINGECKO_URL": f"{coingecko_stub.base_url}/api/v3/simple/price",
+            "COINGECKO_FX_URL": f"{coingecko_stub.base_url}/api/v3/exchange_rates",
+            "BOT_USERNAME": BOT_USERNAME,
+            "GM_CHAT_ID": str(GM_CHAT_ID),
+        }
+    )
+    os.chdir(ROOT)
+
+    from spore.handlers import handle_chat, prices
+    from spore.knowledge import KNOWLEDGE_STORE
+    from spore.llm import get_client
+    from spore.scheduling import send_gm
+    from telegram import Bot, Update
+
+    transport = FakeTelegramRequest(
+        username=BOT_USERNAME,
+        faults=Faults(args.telegram_latency_ms, 0, 0, args.seed + 2),
+    )
+    tg_bot = Bot("123456:bench", request=transport, get_updates_request=FakeTelegramRequest())
+    await tg_bot.initialize()
+    KNOWLEDGE_STORE.refresh()
+    get_client()  # the bot warms this up at startup; keep the import out of the timings
+
+    handlers = {
+        "handle_chat": handle_chat,
+        "prices": prices,
+        "send_gm": send_gm,
+    }
+    cases = build_cases()
+    factory = UpdateFactory(BOT_USERNAME, tg_bot.id)
+
+    # Fixed, seeded op order: every case once per iteration, shuffled
+    rng = random.Random(args.seed)
+    ops = []
+    for _ in range(args.iterations):
+        names = list(cases)
+        rng.shuffle(names)
+        ops.extend(names)
+
+    latencies = {name: [] for name in cases}
+    all_latencies = []
+    outcomes = {name: {"correct": 0, "degraded": 0, "wrong": 0} for name in cases}
+    op_chats = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run_op(i, name):
+        handler_name, msg_kwargs, _ = cases[name]
+        context = SimpleNamespace(bot=tg_bot, job_queue=FakeJobQueue())
+        if msg_kwargs is None:
+            chat_id = GM_CHAT_ID
+            call = handlers[handler_name](context)
+        else:
+            # Unique chat per op so replies can be attributed afterwards
+            chat_id = -1001000000000 - i
+            payload = factory.message(chat_id, 1000 + i % 50, **msg_kwargs)
+            update = Update.de_json(payload, tg_bot)
+            call = handlers[handler_name](update, context)
+        async with semaphore:
+            start = time.perf_counter()
+            await call
+            elapsed = time.perf_counter() - start
+        latencies[name].append(elapsed)
+        all_latencies.append(elapsed)
+        op_chats.append((name, chat_id))
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(run_op(i, name) for i, name in enumerate(ops)))
+    wall = time.perf_counter() - wall_start
+
+    replies_by_chat = {}
+    for sent in transport.sent:
+        replies_by_chat.setdefault(int(sent["chat_id"]), []).append(sent.get("text", ""))
+
+    gm_replies = replies_by_chat.get(GM_CHAT_ID, [])
+    for name, chat_id in op_chats:
+        check = cases[name][2]
+        if chat_id == GM_CHAT_ID:
+            replies = [gm_replies.pop(0)] if gm_replies else []
+        else:
+            replies = replies_by_chat.get(chat_id, [])
+        if check(replies):
+            outcomes[name]["correct"] += 1
+        elif any(marker in r for r in replies for marker in DEGRADED_MARKERS):
+            outcomes[name]["degraded"] += 1
+        else:
+            outcomes[name]["wrong"] += 1
+
+    chat_calls = [c for c in openai_stub.calls if "good-morning" not in c["system"]]
+    gm_calls = [c for c in openai_stub.calls if "good-morning" in c["system"]]
+    knowledge_ok = all("fungifungi.art/whitepaper.pdf" in c["system"] for c in chat_calls)
+
+    def token_stats(calls):
+        values = sorted(c["prompt_tokens"] for c in calls)
+        if not values:
+            return {"calls": 0}
+        cached = sum(c["cached_tokens"] for c in calls)
+        return {
+            "calls": len(values),
+            "mean": round(sum(values) / len(values), 1),
+            "p50": percentile(values, 50),
+            "max": values[-1],
+            "cached_pct": round(100.0 * cached / sum(values), 1),
+            "prefixes": len({c["system"] for c in calls}),
+        }
+
+    total = len(ops)
+    correct = sum(o["correct"] for o in outcomes.values())
+    results = {
+        "meta": {
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "faults": {
+                "openai": [args.openai_latency_ms, args.openai_jitter_ms, args.openai_error_rate],
+                "coingecko": [args.coingecko_latency_ms, args.coingecko_jitter_ms, args.coingecko_error_rate],
+                "telegram_latency_ms": args.telegram_latency_ms,
+            },
+        },
+        "overall": {
+            "ops": total,
+            "wall_s": round(wall, 3),
+            "throughput_ops_s": round(total / wall, 2) if wall else 0.0,
+            "correct_rate": round(correct / total, 4) if total else 0.0,
+            "knowledge_in_prompt": knowledge_ok,
+            **summarize(all_latencies),
+        },
+        "cases": {name: {**summarize(latencies[name]), **outcomes[name]} for name in cases},
+        "prompt_tokens": {"chat": token_stats(chat_calls), "gm": token_stats(gm_calls)},
+        "upstream": {
+            "openai_requests": openai_stub.requests,
+            "openai_errors": openai_stub.errors,
+            "coingecko_requests": coingecko_stub.requests,
+            "coingecko_errors": coingecko_stub.errors,
+            "telegram_calls": transport.calls,
+        },
+    }
+
+    await tg_bot.shutdown()
+    openai_stub.stop()
+    coingecko_stub.stop()
+    return results
+
+
+def print_report(results, baseline=None):
+    overall = results["overall"]
+    print(
+        f"\nops={overall['ops']} wall={overall['wall_s']}s "
+        f"throughput={overall['throughput_ops_s']} ops/s "
+        f"correct={overall['correct_rate']:.2%} knowledge_in_prompt={overall['knowledge_in_prompt']}"
+    )
+    header = f"{'case':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ok':>6}{'degr':>6}{'bad':>6}"
+    if baseline:
+        header += f"{'Δp50':>10}{'Δp95':>10}"
+    print(header)
+    for name, stats in results["cases"].items():
+        line = (
+            f"{name:<20}{stats.get('p50_ms', 0):>10}{stats.get('p95_ms', 0):>10}"
+            f"{stats.get('p99_ms', 0):>10}{stats['correct']:>6}{stats['degraded']:>6}{stats['wrong']:>6}"
+        )
+        old = (baseline or {}).get("cases", {}).get(name)
+        if old:
+            line += f"{stats['p50_ms'] - old['p50_ms']:>+10.2f}{stats['p95_ms'] - old['p95_ms']:>+10.2f}"
+        print(line)
+    tokens = results["prompt_tokens"]
+    print(f"prompt tokens: chat={tokens['chat']} gm={tokens['gm']}")
+    if baseline:
+        old = baseline["overall"]
+        print(
+            f"vs baseline ({baseline['meta']['git']}): "
+            f"throughput {overall['throughput_ops_s'] - old['throughput_ops_s']:+.2f} ops/s, "
+            f"p95 {overall['p95_ms'] - old['p95_ms']:+.2f} ms, "
+            f"correct {overall['correct_rate'] - old['correct_rate']:+.2%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--openai-latency-ms", type=float, default=0)
+    parser.add_argument("--openai-jitter-ms", type=float, default=0)
+    parser.add_argument("--openai-error-rate", type=float, default=0)
+    parser.add_argument("--coingecko-latency-ms", type=float, default=0)
+    parser.add_argument("--coingecko-jitter-ms", type=float, default=0)
+    parser.add_argument("--coingecko-error-rate", type=float, default=0)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to diff against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    out_path = os.path.abspath(args.out) if args.out else None
+    results = asyncio.run(run_bench(args))
+    print_report(results, baseline)
+
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""
+Load generator for the full update pipeline.
+
+Builds the real Application (dedupe, activity, chat/price/command handler
+groups, update processor, outbound scheduler, jobs) on an in-process fake
+Bot API transport with stub OpenAI / CoinGecko servers. A generated or
+recorded message stream is pushed into app.update_queue, as the webhook
+does. The report covers:
+
+  - offered vs sustained msgs/sec (updates fully through every handler group)
+  - queue lag (put -> first handler) and end-to-end latency, plus whether
+    lag kept growing (= the bot is falling behind)
+  - update_queue depth, pending update tasks and RSS growth over the run
+  - the /stats stage table and outbound scheduler counters
+
+    python bench/load_replay.py --rate 200 --duration 20
+    python bench/load_replay.py --rate 0 --messages 5000          # as fast as it absorbs
+    python bench/load_replay.py --chats 50 --users 2000 --mention-ratio 0.1 --price-ratio 0.3
+    python bench/load_replay.py --replay bench/payloads/sample_updates.jsonl --messages 2000
+    python bench/load_replay.py --shared-store --openai-latency-ms 400 --out load.json
+
+Telegram's send limits apply as configured (SEND_* env vars); pass
+--no-send-limits to measure intake without reply pacing.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fakes import Faults, FakeTelegramRequest, StubCoinGecko, StubOpenAI, UpdateFactory, percentile  # noqa: E402
+from handlers_bench import git_revision  # noqa: E402
+from webhook_replay import load_payloads  # noqa: E402
+
+BOT_USERNAME = "SporeLoreBot"
+
+CHATTER = (
+    "gm fam",
+    "who's building today?",
+    "lol this chart",
+    "anyone at the spaces later?",
+    "wen airdrop",
+    "that meme is peak mycelium energy",
+    "just bought more, no regrets",
+    "good night spores 🍄",
+    "has anyone tried the new mint page yet? it loaded super fast for me but the gallery took ages",
+)
+PRICE_QUESTIONS = (
+    "what's the fungi price?",
+    "how much is btc and eth trading at",
+    "$pepi price?",
+    "froggi and jelli prices pls",
+)
+LORE_QUESTIONS = (
+    "where is the whitepaper?",
+    "who is froggi?",
+    "what's the story behind the spores?",
+    "",
+)
+
+
+def rss_bytes() -> int:
+    """Current resident set size (falls back to the peak where /proc is missing)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def generate(args, factory, rng):
+    """Endless stream of message payloads with the configured mix."""
+    chats = [-1001000000000 - i for i in range(args.chats)]
+    while True:
+        chat_id = rng.choice(chats)
+        user_id = 10_000 + rng.randrange(args.users)
+        roll = rng.random()
+        if roll < args.price_ratio * args.mention_ratio:
+            yield factory.message(chat_id, user_id, rng.choice(PRICE_QUESTIONS), mention=True)
+        elif roll < args.mention_ratio:
+            yield factory.message(chat_id, user_id, rng.choice(LORE_QUESTIONS), mention=True)
+        else:
+            yield factory.message(chat_id, user_id, rng.choice(CHATTER))
+
+
+def replayed(payloads):
+    """Loop over recorded payloads, renumbering update_ids so repeats aren't dropped as duplicates."""
+    next_id = 1
+    while True:
+        for payload in payloads:
+            yield dict(payload, update_id=next_id)
+            next_id += 1
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+async def run_load(args):
+    openai_stub = StubOpenAI(Faults(args.openai_latency_ms, args.openai_latency_ms / 4, 0, args.seed)).start()
+    coingecko_stub = StubCoinGecko(Faults(args.coingecko_latency_ms, 0, 0, args.seed + 1)).start()
+
+    workdir = tempfile.mkdtemp(prefix="spore-load-")
+    os.symlink(os.path.join(ROOT, "knowledge"), os.path.join(workdir, "knowledge"))
+    env = {
+        "TELEGRAM_BOT_TOKEN": "123456:load",
+        "OPENAI_API_KEY": "sk-load",
+        "OPENAI_BASE_URL": f"{openai_stub.base_url}/v1",
+        "COINGECKO_URL": f"{coingecko_stub.base_url}/api/v3/simple/price",
+        "COINGECKO_FX_URL": f"{coingecko_stub.base_url}/api/v3/exchange_rates",
+        "BOT_USERNAME": BOT_USERNAME,
+        "BOT_MODE": "webhook",  # bounded update_queue, fed directly below
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        # The generated stream reuses a few dozen texts, which the flood
+        # guard would mostly shed; measure the full pipeline unless asked
+        "FLOOD_GUARD": "1" if args.flood_guard else "0",
+    }
+    if args.shared_store:
+        env["SHARED_STORE_PATH"] = os.path.join(workdir, "shared.db")
+    if args.no_send_limits:
+        env.update(SEND_GLOBAL_PER_SEC="100000", SEND_GROUP_PER_MIN="1000000", SEND_PRIVATE_PER_SEC="100000")
+    os.environ.update(env)
+    os.chdir(workdir)
+
+    # spore reads its settings at import time
+    from telegram import Update
+    from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+    from spore.app import build_application, load_configuration, load_knowledge_base, on_shutdown, register_handlers
+    from spore.llm import get_client
+    from spore.logs import setup_logging, stop_logging
+    from spore.sender import SENDER
+    from spore.tracing import TRACER, format_stats
+
+    setup_logging(stream=sys.stderr)
+    load_configuration()
+    load_knowledge_base()
+    get_client()
+
+    transport = FakeTelegramRequest(username=BOT_USERNAME, faults=Faults(args.telegram_latency_ms, 0, 0, args.seed + 2))
+    app = build_application(request=transport)
+    register_handlers(app)
+
+    # Observers around the real handler groups: first and last to see each update
+    enqueued = {}
+    queue_lag = []
+    end_to_end = []
+    done_at = []
+
+    async def mark_start(update, context):
+        put_at = enqueued.get(update.update_id)
+        if put_at is not None:
+            queue_lag.append(time.perf_counter() - put_at)
+
+    async def mark_done(update, context):
+        put_at = enqueued.pop(update.update_id, None)
+        now = time.perf_counter()
+        if put_at is not None:
+            end_to_end.append(now - put_at)
+        done_at.append(now)
+
+    app.add_handler(TypeHandler(Update, mark_start), group=-100)
+    app.add_handler(TypeHandler(Update, mark_done), group=100)
+
+    # Updates stopped early (redelivered, or shed by the flood guard) never
+    # reach group 100; they are finished when the stopping handler returns
+    def done_on_stop(callback):
+        async def wrapped(update, context):
+            try:
+                return await callback(update, context)
+            except ApplicationHandlerStop:
+                await mark_done(update, context)
+                raise
+
+        return wrapped
+
+    for group, handlers in app.handlers.items():
+        if group < 0:
+            for handler in handlers:
+                handler.callback = done_on_stop(handler.callback)
+
+    rng = random.Random(args.seed)
+    factory = UpdateFactory(BOT_USERNAME, transport.api.bot_id)
+    source = replayed(load_payloads(args.replay)) if args.replay else generate(args, factory, rng)
+
+    await app.initialize()
+    await app.start()
+
+    # Warm-up burst: lazy imports, thread pool, price cache and client pools
+    # would otherwise count as memory growth and first-quarter lag
+    for _ in range(args.warmup):
+        await app.update_queue.put(Update.de_json(next(source), app.bot))
+    warm_deadline = time.perf_counter() + args.drain_timeout
+    while len(done_at) < args.warmup and time.perf_counter() < warm_deadline:
+        await asyncio.sleep(0.05)
+    done_at.clear()
+
+    TRACER.reset()
+    gc.collect()
+    rss_start = rss_bytes()
+    if args.tracemalloc:
+        tracemalloc.start(10)
+        heap_start = tracemalloc.take_snapshot()
+
+    samples = []  # (t, queue depth, pending asyncio tasks, rss)
+    rejected = 0
+    offered = 0
+    stalled = False
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else None
+    next_sample = start
+
+    while True:
+        now = time.perf_counter()
+        if args.messages and offered >= args.messages:
+            break
+        if deadline is not None and now >= deadline:
+            break
+        if now >= next_sample:
+            samples.append((now - start, app.update_queue.qsize(), len(asyncio.all_tasks()), rss_bytes()))
+            next_sample += args.sample_interval
+
+        if args.rate:
+            # Open loop: offer at a fixed rate; a full queue is a rejected update (webhook 503)
+            due = start + offered / args.rate
+            if due > now:
+                await asyncio.sleep(due - now)
+            update = Update.de_json(next(source), app.bot)
+            enqueued[update.update_id] = time.perf_counter()
+            try:
+                app.update_queue.put_nowait(update)
+            except asyncio.QueueFull:
+                enqueued.pop(update.update_id, None)
+                rejected += 1
+        else:
+            # Closed loop: as fast as the queue accepts; a queue that stays
+            # full for --stall-timeout means processing has stopped moving
+            update = Update.de_json(next(source), app.bot)
+            enqueued[update.update_id] = time.perf_counter()
+            try:
+                await asyncio.wait_for(app.update_queue.put(update), args.stall_timeout)
+            except asyncio.TimeoutError:
+                enqueued.pop(update.update_id, None)
+                stalled = True
+                break
+            if offered % 64 == 0:
+                await asyncio.sleep(0)
+        offered += 1
+
+    offered_wall = time.perf_counter() - start
+    # Drain: everything accepted must make it through before we stop the clock
+    drain_deadline = time.perf_counter() + args.drain_timeout
+    while enqueued and time.perf_counter() < drain_deadline:
+        await asyncio.sleep(0.05)
+    wall = (done_at[-1] if done_at and not enqueued else time.perf_counter()) - start
+    samples.append((time.perf_counter() - start, app.update_queue.qsize(), len(asyncio.all_tasks()), rss_bytes()))
+
+    stage_snapshot = TRACER.snapshot()
+    send_stats = SENDER.snapshot_stats()
+    try:
+        # stop() waits for in-flight updates, which may sit behind paced sends
+        await asyncio.wait_for(app.stop(), args.drain_timeout)
+        await on_shutdown(app)
+        await app.shutdown()
+    except asyncio.TimeoutError:
+        print("application did not stop in time (updates still waiting on sends)", file=sys.stderr)
+    openai_stub.stop()
+    coingecko_stub.stop()
+
+    gc.collect()
+    rss_end = rss_bytes()
+    processed = len(end_to_end)
+    growth_sites = []
+    if args.tracemalloc:
+        diff = tracemalloc.take_snapshot().compare_to(heap_start, "traceback")
+        tracemalloc.stop()
+        for stat in diff[:10]:
+            frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback if "/spore/" in frame.filename]
+            growth_sites.append({
+                "kb": round(stat.size_diff / 1024, 1),
+                "blocks": stat.count_diff,
+                "at": frames[-1] if frames else str(stat.traceback[-1]),
+            })
+
+    # Falling behind = queue lag at the end over --max-lag-ms, or far above
+    # where it started
+    quarter = max(1, len(queue_lag) // 4)
+    lag_first = summarize(queue_lag[:quarter]).get("p50_ms", 0.0)
+    lag_last = summarize(queue_lag[-quarter:]).get("p50_ms", 0.0)
+    falling_behind = (
+        stalled
+        or bool(enqueued)
+        or rejected > 0
+        or lag_last > args.max_lag_ms
+        or (lag_last > 100 and lag_last > 4 * max(lag_first, 1))
+    )
+
+    results = {
+        "meta": {
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "warmup": args.warmup,
+            "source": args.replay or "generated",
+            "chats": args.chats,
+            "users": args.users,
+            "mention_ratio": args.mention_ratio,
+            "price_ratio": args.price_ratio,
+            "shared_store": args.shared_store,
+            "send_limits": not args.no_send_limits,
+            "latency_ms": {
+                "openai": args.openai_latency_ms,
+                "coingecko": args.coingecko_latency_ms,
+                "telegram": args.telegram_latency_ms,
+            },
+        },
+        "throughput": {
+            "offered": offered,
+            "offered_per_s": round(offered / offered_wall, 1) if offered_wall else 0.0,
+            "target_per_s": args.rate or None,
+            "rejected_queue_full": rejected,
+            "processed": processed,
+            "unfinished": len(enqueued),
+            "stalled": stalled,
+            "sustained_per_s": round(processed / wall, 1) if wall > 0 else 0.0,
+            "wall_s": round(wall, 3),
+        },
+        "queue_lag": {**summarize(queue_lag), "first_quarter_p50_ms": lag_first, "last_quarter_p50_ms": lag_last},
+        "end_to_end": summarize(end_to_end),
+        "falling_behind": falling_behind,
+        "queue_depth_max": max(depth for _, depth, _, _ in samples),
+        # PTB takes updates off update_queue right away and parks one task per
+        # update until the processor has a slot, so backlog shows up here
+        "pending_tasks_max": max(tasks for _, _, tasks, _ in samples),
+        "memory": {
+            "rss_start_mb": round(rss_start / 2**20, 1),
+            "rss_end_mb": round(rss_end / 2**20, 1),
+            "rss_peak_mb": round(max(rss for _, _, _, rss in samples) / 2**20, 1),
+            "growth_kb_per_1k_msgs": round((rss_end - rss_start) / 1024 / max(offered, 1) * 1000, 1),
+        },
+        "samples": [
+            {"t_s": round(t, 2), "queue_depth": depth, "pending_tasks": tasks, "rss_mb": round(rss / 2**20, 1)}
+            for t, depth, tasks, rss in samples
+        ],
+        "growth_sites": growth_sites,
+        "stages": stage_snapshot,
+        "sender": send_stats,
+    }
+    results["stages_table"] = format_stats(stage_snapshot)
+    stop_logging()
+    return results
+
+
+def print_report(results):
+    t = results["throughput"]
+    lag = results["queue_lag"]
+    e2e = results["end_to_end"]
+    mem = results["memory"]
+    target = f" (target {t['target_per_s']}/s)" if t["target_per_s"] else ""
+    print(f"\noffered    {t['offered']} msgs at {t['offered_per_s']}/s{target}, {t['rejected_queue_full']} rejected (queue full)")
+    print(f"sustained  {t['processed']} processed in {t['wall_s']}s = {t['sustained_per_s']} msgs/s, {t['unfinished']} unfinished")
+    if t["stalled"]:
+        print("stalled    update_queue stayed full; stopped offering early")
+    print(
+        f"queue lag  p50 {lag.get('p50_ms', 0)} p95 {lag.get('p95_ms', 0)} p99 {lag.get('p99_ms', 0)} "
+        f"max {lag.get('max_ms', 0)} ms (first quarter p50 {lag['first_quarter_p50_ms']}, "
+        f"last quarter p50 {lag['last_quarter_p50_ms']})"
+    )
+    print(f"end-to-end p50 {e2e.get('p50_ms', 0)} p95 {e2e.get('p95_ms', 0)} p99 {e2e.get('p99_ms', 0)} ms")
+    print(f"backlog    update_queue depth max {results['queue_depth_max']}, pending update tasks max {results['pending_tasks_max']}")
+    print(
+        f"memory     rss {mem['rss_start_mb']} -> {mem['rss_end_mb']} MB (peak {mem['rss_peak_mb']}), "
+        f"{mem['growth_kb_per_1k_msgs']} KB per 1k msgs offered"
+    )
+    for site in results["growth_sites"]:
+        print(f"  +{site['kb']} KB in {site['blocks']} blocks at {site['at']}")
+    print(f"verdict    {'FALLING BEHIND' if results['falling_behind'] else 'keeping up'}")
+    s = results["sender"]
+    print(f"sender     sent {s['sent']}, merged {s['merged']}, max depth {s['max_depth']}, wait max {s['wait_max_s']:.2f}s")
+    print()
+    print(results["stages_table"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=200, help="offered msgs/sec (0 = as fast as the queue accepts)")
+    parser.add_argument("--duration", type=float, help="seconds to offer load (default 10 unless --messages)")
+    parser.add_argument("--messages", type=int, default=0, help="stop after this many messages")
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--mention-ratio", type=float, default=0.05, help="share of messages that @mention the bot")
+    parser.add_argument("--price-ratio", type=float, default=0.3, help="share of mentions that ask for prices")
+    parser.add_argument("--replay", help="JSON array / JSONL of recorded updates to loop over instead")
+    parser.add_argument("--shared-store", action="store_true", help="run with a SHARED_STORE_PATH database")
+    parser.add_argument("--flood-guard", action="store_true", help="keep the ingress flood guard on")
+    parser.add_argument("--no-send-limits", action="store_true", help="lift the SEND_* rate limits")
+    parser.add_argument("--openai-latency-ms", type=float, default=0)
+    parser.add_argument("--coingecko-latency-ms", type=float, default=0)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0)
+    parser.add_argument("--max-lag-ms", type=float, default=1000, help="queue lag that counts as falling behind")
+    parser.add_argument("--warmup", type=int, default=200, help="messages processed before measuring")
+    parser.add_argument("--tracemalloc", action="store_true", help="list the top heap growth sites (slow)")
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--drain-timeout", type=float, default=30)
+    parser.add_argument("--stall-timeout", type=float, default=10, help="closed loop: give up when the queue stays full this long")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+    if args.duration is None:
+        args.duration = 0 if args.messages else 10
+    if args.replay:
+        args.replay = os.path.abspath(args.replay)
+    out = os.path.abspath(args.out) if args.out else None
+
+    results = asyncio.run(run_load(args))
+    print_report(results)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if results["falling_behind"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Microbenchmarks for the pure functions on the per-message / per-request path.
+
+Each case runs a realistic input (long messages, many entities, a big
+alias table, a large activity file) and records:
+
+  - ops/sec and ns/op (best of --repeat timed runs)
+  - peak_bytes: extra memory allocated during one call (tracemalloc peak)
+  - retained_bytes_per_op: memory still held after --alloc-ops calls
+
+Results are JSON keyed by case name, so runs can be compared:
+
+    python bench/micro_bench.py --out micro.json
+    python bench/micro_bench.py --compare micro.json            # exit 1 on regressions
+    python bench/micro_bench.py --filter extract --repeat 7
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fakes import UpdateFactory  # noqa: E402
+from handlers_bench import git_revision  # noqa: E402
+
+BOT_USERNAME = "SporeLoreBot"
+CHAT_ID = -1001234567890
+PRICES = {
+    "BTC": {"label": "Bitcoin", "price": 97123.45, "change": 1.25},
+    "ETH": {"label": "Ethereum", "price": 3456.78, "change": -0.75},
+    "FUNGI": {"label": "Fungi", "price": 0.000123, "change": -1.23},
+    "FROGGI": {"label": "Froggi", "price": 0.002077, "change": 3.45},
+    "PEPI": {"label": "Pepi", "price": 0.000456, "change": 0.0},
+    "JELLI": {"label": "Jelli", "price": 0.000789, "change": None},
+}
+FILLER = "the mycelium network keeps growing and everyone in here is early fr "
+
+
+def write_large_activity_file(path, weeks=52, users=2000):
+    """A year of weekly buckets for one chat, plus lifetime wins."""
+    today = datetime.date.today()
+    chat = {}
+    for w in range(weeks):
+        year, week, _ = (today - datetime.timedelta(weeks=w + 1)).isocalendar()
+        chat[f"{year}-W{week:02d}"] = {
+            str(10_000 + u): {"count": (u * 7 + w) % 300 + 1, "handle": f"@user{u}"} for u in range(users)
+        }
+    chat["_wins"] = {str(10_000 + u): {"count": 1, "handle": f"@user{u}"} for u in range(weeks)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({str(CHAT_ID): chat}, f)
+
+
+def build_cases():
+    """name -> (callable, setup, teardown); imported lazily after env setup."""
+    from telegram import Message, MessageEntity
+
+    from spore import prices as prices_module
+    from spore.activity import ACTIVITY_STORE, increment_activity_for_message
+    from spore.chats import CHAT_CONFIGS, ChatConfig
+    from spore.handlers import message_mentions_bot
+    from spore.intents import route_question
+    from spore.knowledge import KNOWLEDGE_STORE
+    from spore.prices import (
+        TOKEN_ALIASES,
+        TOKEN_CONFIG,
+        build_price_line,
+        extract_price_request_tokens,
+        format_prices_message,
+    )
+    from spore.scheduling import get_next_gm_datetime_utc
+
+    CHAT_CONFIGS[CHAT_ID] = ChatConfig(CHAT_ID, name="bench")
+    ny_chat = ChatConfig(CHAT_ID - 1, name="ny", gm_start_minute=8 * 60 + 30, gm_end_minute=10 * 60, timezone="America/New_York")
+
+    # -- message_mentions_bot inputs --
+    short_text = f"@{BOT_USERNAME} what's the story behind the spores?"
+    short_entities = [MessageEntity("mention", 0, len(BOT_USERNAME) + 1)]
+
+    # ~4 KB message tagging 60 other people, bot mentioned last
+    parts, entities, offset = [], [], 0
+    for i in range(60):
+        handle = f"@friend_{i:02d}"
+        parts.append(f"{handle} {FILLER[:40]}")
+        entities.append(MessageEntity("mention", offset, len(handle)))
+        entities.append(MessageEntity("bold", offset + len(handle) + 1, 10))
+        offset += len(parts[-1]) + 1
+    long_text = " ".join(parts) + f" @{BOT_USERNAME}"
+    entities.append(MessageEntity("mention", len(long_text) - len(BOT_USERNAME) - 1, len(BOT_USERNAME) + 1))
+    long_miss_entities = entities[:-1]
+
+    # -- extract_price_request_tokens inputs --
+    chatter_long = FILLER * 30  # ~2 KB, no price keyword (the common case)
+    question_long = FILLER * 20 + "how much is $fungi and froggi trading at vs bitcoin and eth? " + FILLER * 10
+    many_aliases = {f"TKN{i}": [f"tkn{i}", f"$tkn{i}", f"token number {i}"] for i in range(200)}
+    original_aliases = dict(TOKEN_ALIASES)
+
+    def use_many_aliases():
+        TOKEN_ALIASES.update(many_aliases)
+
+    def restore_aliases():
+        TOKEN_ALIASES.clear()
+        TOKEN_ALIASES.update(original_aliases)
+
+    # -- prices: serve from a warm cache so nothing touches the network --
+    def warm_price_cache():
+        prices_module._price_cache.update(at=time.time() + 3600, data=PRICES)
+
+    # -- activity: real Message objects against the large activity file --
+    factory = UpdateFactory(BOT_USERNAME)
+    messages = [
+        Message.de_json(factory.message(CHAT_ID, 10_000 + u, "gm")["message"], None) for u in range(500)
+    ]
+    counter = iter(range(10**12))
+
+    def increment_one():
+        increment_activity_for_message(messages[next(counter) % len(messages)])
+
+    def increment_and_flush():
+        increment_one()
+        ACTIVITY_STORE.flush()
+
+    # -- intent router: the repo's knowledge files (we run from a temp dir) --
+    KNOWLEDGE_STORE.knowledge_dir = os.path.join(ROOT, "knowledge")
+    KNOWLEDGE_STORE.index_path = None
+    assert route_question("fungi twitter"), "intent router found no links.md"
+
+    fixed_now = datetime.datetime(2026, 3, 29, 6, 15, tzinfo=datetime.timezone.utc)  # around the DST switch
+
+    return {
+        "mentions_short_hit": (lambda: message_mentions_bot(short_text, short_entities, BOT_USERNAME), None, None),
+        "mentions_long_60_entities_hit": (lambda: message_mentions_bot(long_text, entities, BOT_USERNAME), None, None),
+        "mentions_long_60_entities_miss": (
+            lambda: message_mentions_bot(long_text, long_miss_entities, BOT_USERNAME), None, None,
+        ),
+        "extract_tokens_chatter_2kb": (lambda: extract_price_request_tokens(chatter_long), None, None),
+        "extract_tokens_question_2kb": (lambda: extract_price_request_tokens(question_long), None, None),
+        "extract_tokens_question_chat_symbols": (
+            lambda: extract_price_request_tokens(question_long, ("FUNGI", "FROGGI")), None, None,
+        ),
+        "extract_tokens_200_aliases": (
+            lambda: extract_price_request_tokens(question_long), use_many_aliases, restore_aliases,
+        ),
+        "build_price_line_4_tokens": (
+            lambda: build_price_line(["FUNGI", "FROGGI", "BTC", "ETH"]), warm_price_cache, None,
+        ),
+        "intent_route_link": (lambda: route_question("gm fam where's the fungi twitter?"), None, None),
+        "intent_route_open_ended": (lambda: route_question(question_long), None, None),
+        "format_prices_message_all": (lambda: format_prices_message(PRICES, tuple(TOKEN_CONFIG)), None, None),
+        "next_gm_utc": (lambda: get_next_gm_datetime_utc(None, fixed_now), None, None),
+        "next_gm_new_york": (lambda: get_next_gm_datetime_utc(ny_chat, fixed_now), None, None),
+        "increment_activity_large_file": (increment_one, None, None),
+        "flush_activity_large_file": (increment_and_flush, None, None),
+    }
+
+
+def time_case(fn, min_time, repeat):
+    """Best-of-`repeat` seconds per call, each run long enough to time reliably."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best, number
+
+
+def measure_allocations(fn, ops):
+    gc.collect()
+    tracemalloc.start()
+    fn()  # first-call caches don't count
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    gc.collect()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(ops):
+        fn()
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return max(0, peak - base), (after - before) / ops
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="spore-micro-")
+    write_large_activity_file(os.path.join(workdir, "activity.json"), args.weeks, args.users)
+    os.environ.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:micro",
+            "OPENAI_API_KEY": "sk-micro",
+            "BOT_USERNAME": BOT_USERNAME,
+            "PRICE_CACHE_SECONDS": "3600",
+        }
+    )
+    os.chdir(workdir)
+
+    cases = build_cases()
+    results = {}
+    for name, (fn, setup, teardown) in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        if setup:
+            setup()
+        try:
+            fn()
+            seconds, number = time_case(fn, args.min_time, args.repeat)
+            peak, retained = measure_allocations(fn, args.alloc_ops)
+        finally:
+            if teardown:
+                teardown()
+        results[name] = {
+            "ops_per_sec": round(1 / seconds, 1),
+            "ns_per_op": round(seconds * 1e9, 1),
+            "loops": number,
+            "peak_bytes": peak,
+            "retained_bytes_per_op": round(retained, 1),
+        }
+        print(f"  {name:<40} {results[name]['ns_per_op']:>12.1f} ns/op", file=sys.stderr)
+
+    return {
+        "meta": {
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "min_time_s": args.min_time,
+            "activity_file": {"weeks": args.weeks, "users": args.users},
+        },
+        "cases": results,
+    }
+
+
+def print_report(results, baseline=None, threshold=0.25):
+    """Print the table; returns the names of cases slower than baseline by > threshold."""
+    regressions = []
+    header = f"{'case':<40}{'ops/s':>14}{'ns/op':>12}{'peak B':>9}{'kept B/op':>11}"
+    if baseline:
+        header += f"{'Δ ops/s':>10}"
+    print(header)
+    for name, r in results["cases"].items():
+        line = (
+            f"{name:<40}{r['ops_per_sec']:>14,.0f}{r['ns_per_op']:>12.1f}"
+            f"{r['peak_bytes']:>9}{r['retained_bytes_per_op']:>11.1f}"
+        )
+        old = (baseline or {}).get("cases", {}).get(name)
+        if old:
+            change = r["ops_per_sec"] / old["ops_per_sec"] - 1
+            line += f"{change:>+10.1%}"
+            if change < -threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    if baseline:
+        print(f"vs baseline {baseline['meta']['git']} (threshold {threshold:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed run")
+    parser.add_argument("--alloc-ops", type=int, default=1000, help="calls measured for retained memory")
+    parser.add_argument("--weeks", type=int, default=52, help="weeks in the generated activity file")
+    parser.add_argument("--users", type=int, default=2000, help="users per week in the activity file")
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--out", help="write the JSON results here")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --out")
+    parser.add_argument("--threshold", type=float, default=0.25, help="ops/s drop that counts as a regression")
+    args = parser.parse_args()
+    out = os.path.abspath(args.out) if args.out else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run(args)
+    regressions = print_report(results, baseline, args.threshold)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
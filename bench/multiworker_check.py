@@ -0,0 +1,254 @@
+"""
+Multi-worker check: several bot.py workers sharing one SQLite store.
+
+Spins up stub Telegram/OpenAI/CoinGecko servers, starts N workers in
+BOT_MODE=webhook (one port each, same SHARED_STORE_PATH) with a GM window
+that is open right now, then verifies:
+
+  - exactly one GM reaches the chat, although every worker schedules one
+  - chatter POSTed round-robin across workers is counted exactly once
+  - a mention POSTed to two workers (a webhook retry that lands on
+    another worker) is answered once
+  - killing the leader hands the lease to another worker without a second GM
+
+    python bench/multiworker_check.py
+    python bench/multiworker_check.py --workers 4 --messages 200
+"""
+
+import argparse
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from fakes import Faults, StubCoinGecko, StubOpenAI, StubTelegram, UpdateFactory  # noqa: E402
+
+CHAT_ID = -1001234567890
+SECRET = "multiworker-secret"
+LEASE_SECONDS = 3
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def http(method, url, body=None, headers=None, timeout=10):
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def wait_ready(port, proc, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            if http("GET", f"http://127.0.0.1:{port}/readyz", timeout=1) == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def open_gm_window():
+    """A UTC window [now-2min, now+1min): every minute it can pick is already due."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if now.second > 45:
+        # Leave the workers time to boot before the window closes
+        time.sleep(61 - now.second)
+        return open_gm_window()
+    minute = now.hour * 60 + now.minute
+    if minute < 2 or minute > 24 * 60 - 2:
+        wait = 180 - now.second
+        print(f"too close to midnight UTC, waiting {wait}s")
+        time.sleep(wait)
+        return open_gm_window()
+    start, end = minute - 2, minute + 1
+    return [f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"]
+
+
+def gm_messages(telegram):
+    return [
+        sent for sent in telegram.api.sent
+        if str(sent.get("chat_id")) == str(CHAT_ID) and "gm" in sent.get("text", "").lower()
+    ]
+
+
+def lease_holder(db_path):
+    with sqlite3.connect(db_path) as conn:
+        row = conn.execute(
+            "SELECT holder FROM leases WHERE name = 'scheduler' AND expires_at > ?", (time.time(),)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def activity_counts(db_path):
+    week = "{}-W{:02d}".format(*datetime.datetime.now(datetime.timezone.utc).isocalendar()[:2])
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT user_id, count FROM activity WHERE chat_id = ? AND bucket = ?",
+            (str(CHAT_ID), week),
+        ).fetchall()
+    return {int(user_id): count for user_id, count in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--messages", type=int, default=60)
+    args = parser.parse_args()
+
+    telegram = StubTelegram(Faults()).start()
+    openai_stub = StubOpenAI(Faults()).start()
+    coingecko = StubCoinGecko(Faults()).start()
+
+    workdir = tempfile.mkdtemp(prefix="spore-multiworker-")
+    os.symlink(os.path.join(ROOT, "knowledge"), os.path.join(workdir, "knowledge"))
+    db_path = os.path.join(workdir, "shared.db")
+    with open(os.path.join(workdir, "chats.json"), "w", encoding="utf-8") as f:
+        json.dump({"chats": [{"chat_id": CHAT_ID, "name": "main", "gm_window": open_gm_window()}]}, f)
+
+    base_env = dict(os.environ)
+    base_env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:multiworker",
+            "TELEGRAM_BASE_URL": f"{telegram.base_url}/bot",
+            "OPENAI_API_KEY": "sk-multiworker",
+            "OPENAI_BASE_URL": f"{openai_stub.base_url}/v1",
+            "COINGECKO_URL": f"{coingecko.base_url}/api/v3/simple/price",
+            "COINGECKO_FX_URL": f"{coingecko.base_url}/api/v3/exchange_rates",
+            "BOT_USERNAME": "SporeLoreBot",
+            "BOT_MODE": "webhook",
+            "WEBHOOK_LISTEN": "127.0.0.1",
+            "WEBHOOK_SECRET": SECRET,
+            "WEBHOOK_URL": "",
+            "SHARED_STORE_PATH": db_path,
+            "LEADER_LEASE_SECONDS": str(LEASE_SECONDS),
+            "TIMER_TICK_SECONDS": "1",
+            "ACTIVITY_FLUSH_SECONDS": "1",
+            # Rapid chatter from a few users must all be counted
+            "FLOOD_GUARD": "0",
+        }
+    )
+
+    workers = {}
+    failures = []
+    try:
+        for i in range(args.workers):
+            worker_id = f"worker-{i}"
+            port = free_port()
+            log = open(os.path.join(workdir, f"{worker_id}.log"), "w")
+            env = dict(base_env, WORKER_ID=worker_id, WEBHOOK_PORT=str(port))
+            proc = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "bot.py")],
+                cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            workers[worker_id] = (proc, port, log)
+        for worker_id, (proc, port, _) in workers.items():
+            if not wait_ready(port, proc):
+                failures.append(f"{worker_id} did not become ready")
+        if failures:
+            return 1
+
+        # GM: every worker has one due on its wheel; only one may send it
+        time.sleep(3)
+        sent_gms = gm_messages(telegram)
+        print(f"GM messages after start: {len(sent_gms)}")
+        if len(sent_gms) != 1:
+            failures.append(f"expected exactly 1 GM, got {len(sent_gms)}")
+
+        # Activity: round-robin chatter across workers, counted once in total
+        factory = UpdateFactory()
+        expected = Counter()
+        ports = [port for _, port, _ in workers.values()]
+        for n in range(args.messages):
+            user_id = 100 + n % 3
+            payload = factory.message(CHAT_ID, user_id, f"just chatting {n}")
+            status = http(
+                "POST",
+                f"http://127.0.0.1:{ports[n % len(ports)]}/telegram",
+                json.dumps(payload).encode("utf-8"),
+                {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET},
+            )
+            if status == 200:
+                expected[user_id] += 1
+        time.sleep(3)
+        counts = activity_counts(db_path)
+        print(f"activity: expected {dict(expected)}, stored {counts}")
+        if counts != dict(expected):
+            failures.append("shared activity counts don't match the messages sent")
+
+        # Webhook retry on another worker: the mention is answered once
+        retry_chat = CHAT_ID - 7
+        payload = factory.message(retry_chat, 500, "what is spore?", mention=True)
+        for port in ports[:2]:
+            http(
+                "POST",
+                f"http://127.0.0.1:{port}/telegram",
+                json.dumps(payload).encode("utf-8"),
+                {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET},
+            )
+        time.sleep(2)
+        answers = [sent for sent in telegram.api.sent if str(sent.get("chat_id")) == str(retry_chat)]
+        print(f"replies to a mention POSTed to {len(ports[:2])} workers: {len(answers)}")
+        if len(answers) != 1:
+            failures.append(f"expected 1 reply to the retried mention, got {len(answers)}")
+
+        # Failover: kill the leader hard, a follower must take the lease over
+        leader = lease_holder(db_path)
+        print(f"leader: {leader}")
+        if leader not in workers:
+            failures.append(f"no live leader lease (holder {leader!r})")
+        else:
+            workers[leader][0].kill()
+            time.sleep(LEASE_SECONDS * 2 + 1)
+            new_leader = lease_holder(db_path)
+            print(f"leader after killing {leader}: {new_leader}")
+            if new_leader in (None, leader):
+                failures.append("leadership was not handed over")
+            sent_gms = gm_messages(telegram)
+            if len(sent_gms) != 1:
+                failures.append(f"expected 1 GM after failover, got {len(sent_gms)}")
+    finally:
+        for proc, _, log in workers.values():
+            if proc.poll() is None:
+                proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+        telegram.stop()
+        openai_stub.stop()
+        coingecko.stop()
+
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        print(f"worker logs: {workdir}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Restart check: crash a single bot.py worker and verify nothing doubles.
+
+Starts one webhook worker (no shared store: schedule.json + activity.bin)
+with a GM window open right now, waits for the GM, POSTs chatter, then
+SIGKILLs it, restarts it in the same directory and verifies:
+
+  - no second GM after the restart (the claimed run is in schedule.json)
+  - re-delivered updates are dropped, so activity counts don't change
+
+Before that, a legacy-layout activity.json (weeks and "_wins" at the top
+level) is converted with --convert-activity and read back: every count
+must land under GM_CHAT_ID.
+
+    python bench/restart_check.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from spore.activity_table import read_activity_file  # noqa: E402
+from fakes import Faults, StubCoinGecko, StubOpenAI, StubTelegram, UpdateFactory  # noqa: E402
+from multiworker_check import CHAT_ID, SECRET, free_port, gm_messages, http, open_gm_window, wait_ready  # noqa: E402
+
+
+def week_counts(workdir):
+    data = read_activity_file(os.path.join(workdir, "activity.bin"))
+    weeks = {k: v for k, v in data.get(str(CHAT_ID), {}).items() if not k.startswith("_")}
+    return {user_id: entry["count"] for week in weeks.values() for user_id, entry in week.items()}
+
+
+def check_legacy_conversion(workdir, env) -> list[str]:
+    """Convert a legacy activity.json to .bin and back; returns failures."""
+    legacy = {
+        "2026-W41": {"111": {"count": 7, "handle": "@alice"}, "222": {"count": 3, "handle": "@bob"}},
+        "_wins": {"111": {"count": 2, "handle": "@alice"}},
+    }
+    convert_dir = os.path.join(workdir, "convert")
+    os.mkdir(convert_dir)
+    with open(os.path.join(convert_dir, "legacy.json"), "w", encoding="utf-8") as f:
+        json.dump(legacy, f)
+    for source, dest in (("legacy.json", "activity.bin"), ("activity.bin", "roundtrip.json")):
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "bot.py"), "--convert-activity", source, dest],
+            cwd=convert_dir, env={**env, "GM_CHAT_ID": str(CHAT_ID)}, check=True, stdout=subprocess.DEVNULL,
+        )
+    failures = []
+    for name in ("activity.bin", "roundtrip.json"):
+        data = read_activity_file(os.path.join(convert_dir, name))
+        data.pop("_updates", None)
+        if data != {str(CHAT_ID): legacy}:
+            failures.append(f"legacy conversion lost counts in {name}: {data}")
+    print(f"legacy activity.json conversion: {'ok' if not failures else 'counts lost'}")
+    return failures
+
+
+def post_all(port, payloads):
+    for payload in payloads:
+        http(
+            "POST",
+            f"http://127.0.0.1:{port}/telegram",
+            json.dumps(payload).encode("utf-8"),
+            {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET},
+        )
+
+
+def main():
+    telegram = StubTelegram(Faults()).start()
+    openai_stub = StubOpenAI(Faults()).start()
+    coingecko = StubCoinGecko(Faults()).start()
+
+    workdir = tempfile.mkdtemp(prefix="spore-restart-")
+    os.symlink(os.path.join(ROOT, "knowledge"), os.path.join(workdir, "knowledge"))
+    with open(os.path.join(workdir, "chats.json"), "w", encoding="utf-8") as f:
+        json.dump({"chats": [{"chat_id": CHAT_ID, "name": "main", "gm_window": open_gm_window()}]}, f)
+
+    port = free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:restart",
+            "TELEGRAM_BASE_URL": f"{telegram.base_url}/bot",
+            "OPENAI_API_KEY": "sk-restart",
+            "OPENAI_BASE_URL": f"{openai_stub.base_url}/v1",
+            "COINGECKO_URL": f"{coingecko.base_url}/api/v3/simple/price",
+            "BOT_USERNAME": "SporeLoreBot",
+            "BOT_MODE": "webhook",
+            "WEBHOOK_LISTEN": "127.0.0.1",
+            "WEBHOOK_PORT": str(port),
+            "WEBHOOK_SECRET": SECRET,
+            "WEBHOOK_URL": "",
+            "TIMER_TICK_SECONDS": "1",
+            "ACTIVITY_FLUSH_SECONDS": "1",
+            # Rapid chatter from a few users must all be counted
+            "FLOOD_GUARD": "0",
+        }
+    )
+
+    def start():
+        log = open(os.path.join(workdir, "bot.log"), "a")
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "bot.py")],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        return proc, log
+
+    factory = UpdateFactory()
+    payloads = [factory.message(CHAT_ID, 100 + n % 2, f"chatter {n}") for n in range(20)]
+    failures = check_legacy_conversion(workdir, env)
+    proc, log = start()
+    try:
+        if not wait_ready(port, proc):
+            failures.append("bot did not become ready")
+            return 1
+        time.sleep(3)
+        post_all(port, payloads)
+        time.sleep(2)
+        before = week_counts(workdir)
+        print(f"GMs before crash: {len(gm_messages(telegram))}, activity: {before}")
+
+        proc.kill()
+        proc.wait()
+        log.close()
+        proc, log = start()
+        if not wait_ready(port, proc):
+            failures.append("bot did not come back after restart")
+            return 1
+
+        # Telegram re-delivers what it never saw acknowledged
+        post_all(port, payloads)
+        time.sleep(3)
+        after = week_counts(workdir)
+        gms = len(gm_messages(telegram))
+        print(f"GMs after restart: {gms}, activity: {after}")
+
+        if gms != 1:
+            failures.append(f"expected exactly 1 GM across the restart, got {gms}")
+        if before != after or sum(after.values()) != len(payloads):
+            failures.append("re-delivered updates changed the activity counts")
+    finally:
+        if proc.poll() is None:
+            proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+        telegram.stop()
+        openai_stub.stop()
+        coingecko.stop()
+
+        for failure in failures:
+            print("FAIL:", failure)
+        if failures:
+            print(f"bot log: {os.path.join(workdir, 'bot.log')}")
+        else:
+            print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark with a regression budget.
+
+Runs `python bot.py --profile-startup` several times, each in a fresh
+directory (so the knowledge index is rebuilt, like a fresh deploy) against
+a stub Telegram server, takes the per-phase median and checks it against
+startup_budget.json. Exits 1 when any phase or the total is over budget.
+
+    python bench/startup_bench.py
+    python bench/startup_bench.py --runs 9 --out startup_results.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, ROOT)
+
+from fakes import Faults, StubTelegram  # noqa: E402
+from spore.startup import PHASES, check_budget, load_budget  # noqa: E402
+
+
+def run_once(env):
+    workdir = tempfile.mkdtemp(prefix="spore-startup-")
+    os.symlink(os.path.join(ROOT, "knowledge"), os.path.join(workdir, "knowledge"))
+    report_path = os.path.join(workdir, "report.json")
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "bot.py"), "--profile-startup",
+         "--budget", "", "--no-hot-spots", "--json", report_path],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0 or not os.path.exists(report_path):
+        print(proc.stdout, proc.stderr)
+        raise SystemExit("profile run failed")
+    with open(report_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", default=os.path.join(ROOT, "startup_budget.json"))
+    parser.add_argument("--out", help="write medians + raw runs as JSON")
+    args = parser.parse_args()
+
+    telegram = StubTelegram(Faults()).start()
+    env = dict(os.environ)
+    env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:startup",
+            "TELEGRAM_BASE_URL": f"{telegram.base_url}/bot",
+            "OPENAI_API_KEY": "sk-startup",
+            "BOT_USERNAME": "SporeLoreBot",
+        }
+    )
+    try:
+        runs = [run_once(env) for _ in range(args.runs)]
+    finally:
+        telegram.stop()
+
+    medians = {
+        phase: round(statistics.median(run["phases_ms"][phase] for run in runs), 3)
+        for phase in PHASES
+    }
+    print(f"startup phases, median of {args.runs} cold starts (ms)")
+    for phase in PHASES:
+        print(f"  {phase:<20} {medians[phase]:>9.1f}")
+    print(f"  {'total':<20} {sum(medians.values()):>9.1f}")
+
+    over = check_budget(medians, load_budget(args.budget))
+    print(f"\nbudget {os.path.relpath(args.budget)}: " + ("OK" if not over else "EXCEEDED"))
+    for line in over:
+        print(f"  {line}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"median_ms": medians, "runs": runs, "over_budget": over}, f, indent=2)
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
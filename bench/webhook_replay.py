@@ -0,0 +1,182 @@
+"""
+Replay recorded Telegram update payloads against webhook mode.
+
+Default: spin up stub Telegram/OpenAI/CoinGecko servers, start bot.py in
+BOT_MODE=webhook as a subprocess pointed at them, wait for /readyz, POST
+every payload with the secret token, check that a wrong secret is rejected,
+and print what the bot sent back.
+
+    python bench/webhook_replay.py
+    python bench/webhook_replay.py bench/payloads/sample_updates.jsonl
+
+Against an already running bot (no stubs, no subprocess):
+
+    python bench/webhook_replay.py --target http://127.0.0.1:8443/telegram --secret s3cret
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from fakes import Faults, StubCoinGecko, StubOpenAI, StubTelegram  # noqa: E402
+
+DEFAULT_PAYLOADS = os.path.join(HERE, "payloads", "sample_updates.jsonl")
+
+
+def load_payloads(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def http(method, url, body=None, headers=None, timeout=10):
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def post_update(url, secret, payload):
+    return http(
+        "POST",
+        url,
+        json.dumps(payload).encode("utf-8"),
+        {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+    )
+
+
+def replay(url, secret, payloads):
+    ok = 0
+    for payload in payloads:
+        status, body = post_update(url, secret, payload)
+        print(f"update {payload.get('update_id')}: {status} {body}")
+        ok += status == 200
+    return ok
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base, proc, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            status, _ = http("GET", f"{base}/readyz", timeout=1)
+            if status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def run_spawned(payloads, settle):
+    telegram = StubTelegram(Faults()).start()
+    openai_stub = StubOpenAI(Faults()).start()
+    coingecko = StubCoinGecko(Faults()).start()
+
+    port = free_port()
+    secret = "replay-secret"
+    workdir = tempfile.mkdtemp(prefix="spore-webhook-")
+    os.symlink(os.path.join(ROOT, "knowledge"), os.path.join(workdir, "knowledge"))
+
+    env = dict(os.environ)
+    env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:replay",
+            "TELEGRAM_BASE_URL": f"{telegram.base_url}/bot",
+            "OPENAI_API_KEY": "sk-replay",
+            "OPENAI_BASE_URL": f"{openai_stub.base_url}/v1",
+            "COINGECKO_URL": f"{coingecko.base_url}/api/v3/simple/price",
+            "BOT_USERNAME": "SporeLoreBot",
+            "BOT_MODE": "webhook",
+            "WEBHOOK_LISTEN": "127.0.0.1",
+            "WEBHOOK_PORT": str(port),
+            "WEBHOOK_SECRET": secret,
+            "WEBHOOK_URL": "",
+        }
+    )
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "bot.py")], cwd=workdir, env=env)
+    base = f"http://127.0.0.1:{port}"
+    failures = []
+    try:
+        if not wait_ready(base, proc):
+            print("bot did not become ready")
+            return 1
+
+        status, _ = http("GET", f"{base}/healthz")
+        if status != 200:
+            failures.append(f"/healthz returned {status}")
+
+        status, _ = post_update(f"{base}/telegram", "wrong-secret", payloads[0])
+        if status != 403:
+            failures.append(f"wrong secret returned {status}, expected 403")
+
+        accepted = replay(f"{base}/telegram", secret, payloads)
+        if accepted != len(payloads):
+            failures.append(f"only {accepted}/{len(payloads)} updates accepted")
+
+        time.sleep(settle)
+        status, ready = http("GET", f"{base}/readyz")
+        print(f"readyz: {status} {ready}")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        telegram.stop()
+        openai_stub.stop()
+        coingecko.stop()
+
+    print("\nbot replies:")
+    for sent in telegram.api.sent:
+        print(f"  -> {sent.get('chat_id')}: {sent.get('text')}")
+    for answer in telegram.api.inline_answers:
+        titles = [result.get("title") for result in answer.get("results", [])]
+        print(f"  -> inline {answer.get('inline_query_id')} (cache_time {answer.get('cache_time')}): {titles}")
+    if not telegram.api.sent:
+        failures.append("bot sent no replies")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("payloads", nargs="?", default=DEFAULT_PAYLOADS, help="JSON array or JSONL of updates")
+    parser.add_argument("--target", help="webhook URL of a running bot (skips stubs/subprocess)")
+    parser.add_argument("--secret", default="", help="secret token for --target")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait for replies")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.payloads)
+    if args.target:
+        accepted = replay(args.target, args.secret, payloads)
+        sys.exit(0 if accepted == len(payloads) else 1)
+    sys.exit(run_spawned(payloads, args.settle))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Spore Telegram agent."""
@@ -0,0 +1,463 @@
+"""Weekly activity tracking and the activity heatmap."""
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+
+from telegram.ext import ContextTypes
+
+from .config import GM_CHAT_ID, HEATMAP_WEEKS, UPDATE_DEDUPE_WINDOW
+from .storage import SHARED_STORE, SharedStore, write_file_atomic
+from .chats import ChatConfig, get_chat_config
+from .activity_table import (
+    HOURS_PER_WEEK,
+    ChatActivity,
+    dump_binary,
+    is_binary_file,
+    load_binary,
+    read_activity_file,
+    tables_from_json,
+    tables_to_json,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# --- Activity tracking (weekly prize) ---
+
+ACTIVITY_FILE = "activity.json"
+ACTIVITY_BINARY_FILE = "activity.bin"
+
+# On-disk format: "binary" (default) writes ACTIVITY_BINARY_FILE (see
+# activity_table), "json" writes ACTIVITY_FILE. Whichever file is missing is
+# converted from the other one on first start.
+ACTIVITY_FORMAT = os.getenv("ACTIVITY_FORMAT", "binary").strip().lower()
+if ACTIVITY_FORMAT == "json":
+    ACTIVITY_PATH, ACTIVITY_FALLBACK_PATH = ACTIVITY_FILE, ACTIVITY_BINARY_FILE
+else:
+    ACTIVITY_PATH, ACTIVITY_FALLBACK_PATH = ACTIVITY_BINARY_FILE, ACTIVITY_FILE
+
+# How often (seconds) in-memory activity is written back to ACTIVITY_PATH
+ACTIVITY_FLUSH_SECONDS = int(os.getenv("ACTIVITY_FLUSH_SECONDS", "5"))
+
+
+def load_activity(path=None):
+    """Either file format, in activity.json layout ({} if missing or unreadable)."""
+    try:
+        return read_activity_file(path or ACTIVITY_FILE)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.error("Error reading activity file %s: %s", path or ACTIVITY_FILE, e)
+        return {}
+
+
+def save_activity(data, path=None):
+    try:
+        write_file_atomic(path or ACTIVITY_FILE, json.dumps(data))
+    except Exception as e:
+        logger.error("Error saving activity file: %s", e)
+
+
+WEEK_KEY_RE = re.compile(r"^\d{4}-W\d{2}$")
+
+
+def week_key_for(when: datetime.datetime) -> str:
+    year, week, _ = when.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def hour_of_week(when: datetime.datetime) -> int:
+    """0 = Monday 00:00-01:00 UTC ... 167 = Sunday 23:00-24:00 UTC."""
+    when = when.astimezone(datetime.timezone.utc)
+    return when.weekday() * 24 + when.hour
+
+
+def heatmap_week_keys(now: datetime.datetime = None, weeks: int = HEATMAP_WEEKS) -> list[str]:
+    """The ISO weeks behind the heatmap: this one and the weeks - 1 before it."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return [week_key_for(now - datetime.timedelta(weeks=i)) for i in range(weeks)]
+
+
+def migrate_activity_layout(data: dict) -> dict:
+    """
+    Activity is stored per chat: {"<chat_id>": {"<week>": {...}, "_wins": {...}}}.
+    Older files kept weeks and "_wins" at the top level for the single
+    GM_CHAT_ID chat; move those under that chat.
+    """
+    legacy = [k for k in data if k == "_wins" or WEEK_KEY_RE.match(k)]
+    if legacy:
+        bucket = data.setdefault(str(GM_CHAT_ID), {})
+        for key in legacy:
+            bucket[key] = data.pop(key)
+        logger.info("Migrated %d legacy buckets under chat %s", len(legacy), GM_CHAT_ID)
+    return data
+
+
+class RecentUpdateIds:
+    """
+    Bounded set of the most recently processed update_ids, oldest dropped
+    first. Ids are only compared for membership: Telegram re-seeds
+    update_id (possibly lower) after a week without updates.
+    """
+
+    def __init__(self, size: int, ids=()):
+        self._order = deque(maxlen=size)
+        self._seen = set()
+        self.last = 0
+        for update_id in ids:
+            self.add(update_id)
+
+    def add(self, update_id: int) -> bool:
+        """Remember update_id; False if it was already processed."""
+        if update_id in self._seen:
+            return False
+        if len(self._order) == self._order.maxlen:
+            self._seen.discard(self._order[0])
+        self._order.append(update_id)
+        self._seen.add(update_id)
+        self.last = update_id
+        return True
+
+    def to_dict(self) -> dict:
+        return {"last": self.last, "recent": list(self._order)}
+
+
+class ActivityStore:
+    """
+    Activity data kept in memory and flushed to disk periodically, instead of
+    a full file read + write per message. All mutations go through one lock,
+    so increments from concurrent handlers and the flush thread never race.
+    Data is bucketed per chat id (see migrate_activity_layout), each chat
+    held as a compact activity_table.ChatActivity.
+
+    Processed update_ids are checkpointed in the same file ("_updates"), so
+    after a crash the counts and the dedupe window always agree: an update
+    is either counted and remembered, or neither.
+
+    The file format follows the path's extension (.bin or .json). If `path`
+    doesn't exist yet, `fallback_path` (the other format) is loaded instead
+    and rewritten as `path` on the next flush.
+    """
+
+    def __init__(self, path: str, fallback_path: str = None):
+        self.path = path
+        self.fallback_path = fallback_path
+        self._chats = None
+        self._updates = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._chats is not None:
+            return
+        source = self.path
+        if not os.path.exists(source) and self.fallback_path and os.path.exists(self.fallback_path):
+            source = self.fallback_path
+            logger.info("Converting %s to %s", source, self.path)
+            self._dirty = True
+
+        chats, recent = {}, ()
+        if is_binary_file(source):
+            try:
+                with open(source, "rb") as f:
+                    chats, recent = load_binary(f.read())
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.error("Error reading activity file %s: %s", source, e)
+        else:
+            data = load_activity(source)
+            recent = (data.pop("_updates", None) or {}).get("recent", ())
+            chats = tables_from_json(migrate_activity_layout(data))
+        self._updates = RecentUpdateIds(UPDATE_DEDUPE_WINDOW, recent)
+        self._chats = chats
+
+    def _chat(self, chat_id) -> ChatActivity:
+        key = str(chat_id)
+        chat = self._chats.get(key)
+        if chat is None:
+            chat = self._chats[key] = ChatActivity()
+        return chat
+
+    def mark_update(self, update_id: int) -> bool:
+        """Record an update as processed; False if it was seen before."""
+        with self._lock:
+            self._load()
+            if not self._updates.add(update_id):
+                return False
+            self._dirty = True
+            return True
+
+    async def claim_update(self, update_id: int) -> bool:
+        """mark_update() for the handlers (the shared store claims in SQLite)."""
+        return self.mark_update(update_id)
+
+    def read(self, chat_id, key, default=None):
+        """Return one bucket (a week or "_wins") for a chat in activity.json layout."""
+        with self._lock:
+            self._load()
+            chat = self._chats.get(str(chat_id))
+            value = chat.bucket(key) if chat is not None else None
+            return value if value is not None else default
+
+    def increment(self, chat_id, week_key: str, user_id, handle: str, update_id=None, hour=None):
+        """Count a message for a user (None: heatmap only) and in its hour of week (None: not at all)."""
+        with self._lock:
+            self._load()
+            chat = self._chat(chat_id)
+            if user_id is not None:
+                chat.add(week_key, int(user_id), handle)
+            if hour is not None:
+                chat.add_hour(week_key, hour, keep_weeks=HEATMAP_WEEKS)
+            self._dirty = True
+
+    def heatmap(self, chat_id, week_keys) -> list[int]:
+        """Messages per hour of week (168 values) summed over week_keys."""
+        with self._lock:
+            self._load()
+            chat = self._chats.get(str(chat_id))
+            return chat.heatmap(week_keys) if chat is not None else [0] * HOURS_PER_WEEK
+
+    def read_buckets(self, chat_ids, keys) -> dict:
+        """
+        {chat_id: {key: bucket}} in activity.json layout for many chats at
+        once (empty buckets left out). Only array copies happen under the
+        lock, so message counting isn't held up while the buckets are built.
+        """
+        with self._lock:
+            self._load()
+            copies = {}
+            for chat_id in chat_ids:
+                chat = self._chats.get(str(chat_id))
+                if chat is not None:
+                    copies[str(chat_id)] = chat.copy(keys)
+        result = {}
+        for chat_id, chat in copies.items():
+            buckets = {key: chat.bucket(key) for key in keys}
+            result[chat_id] = {key: bucket for key, bucket in buckets.items() if bucket}
+        return result
+
+    def record_wins(self, marker: str, winners) -> dict:
+        """
+        Count one more lifetime win for each (chat_id, user_id, handle),
+        unless the chat already has a `marker` bucket (an earlier attempt
+        recorded this win): then the winner recorded there is kept.
+        Returns {chat_id: (user_id, handle, lifetime wins)}.
+        """
+        results = {}
+        with self._lock:
+            self._load()
+            for chat_id, user_id, handle in winners:
+                chat = self._chat(chat_id)
+                recorded = chat.bucket(marker)
+                if recorded:
+                    user_id, entry = next(iter(recorded.items()))
+                    handle = entry["handle"]
+                else:
+                    # Handles are per user, so this also picks up a changed username
+                    chat.add(marker, int(user_id), handle)
+                    chat.add("_wins", int(user_id), handle)
+                    self._dirty = True
+                results[str(chat_id)] = (str(user_id), handle, chat.count("_wins", int(user_id)))
+        return results
+
+    def drop_buckets(self, pairs):
+        """Remove (chat_id, key) buckets."""
+        with self._lock:
+            self._load()
+            for chat_id, key in pairs:
+                chat = self._chats.get(str(chat_id))
+                if chat is not None:
+                    chat.drop(key)
+            self._dirty = True
+
+    def flush(self) -> bool:
+        """Write pending changes to disk; returns True if anything was written."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            if is_binary_file(self.path):
+                payload = dump_binary(self._chats, self._updates.to_dict()["recent"])
+            else:
+                payload = json.dumps({**tables_to_json(self._chats), "_updates": self._updates.to_dict()})
+            self._dirty = False
+        try:
+            write_file_atomic(self.path, payload)
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            logger.error("Error saving activity file: %s", e)
+            return False
+        return True
+
+
+class SharedActivityStore:
+    """
+    ActivityStore interface over the shared SQLite store (multi-worker mode).
+    Update ids are claimed in the store before any handler runs, so a
+    re-delivered update is handled once no matter which worker receives
+    it. Messages are buffered per worker and counted in one transaction per
+    flush, so counts from concurrent workers sum instead of overwriting.
+    """
+
+    def __init__(self, store: SharedStore):
+        self.store = store
+        self._pending = []
+        self._updates = None
+        self._lock = threading.Lock()
+
+    def import_file(self, path: str, fallback_path: str = None):
+        """One-time import of an existing activity file (the first worker wins)."""
+        if not os.path.exists(path):
+            if not fallback_path or not os.path.exists(fallback_path):
+                return
+            path = fallback_path
+        data = load_activity(path)
+        data.pop("_updates", None)
+        data = migrate_activity_layout(data)
+        rows = [
+            (chat_id, bucket, user_id, entry.get("count", 0), entry.get("handle"))
+            for chat_id, buckets in data.items()
+            for bucket, users in buckets.items()
+            for user_id, entry in users.items()
+        ]
+        if self.store.add_activity(rows, marker=f"import:{os.path.abspath(path)}"):
+            logger.info("Imported %d rows from %s into the shared store", len(rows), path)
+
+    def mark_update(self, update_id: int) -> bool:
+        """This worker's ids only; claim_update() is what dedupes across workers."""
+        with self._lock:
+            if self._updates is None:
+                self._updates = RecentUpdateIds(
+                    UPDATE_DEDUPE_WINDOW, self.store.recent_update_ids(UPDATE_DEDUPE_WINDOW)
+                )
+            return self._updates.add(update_id)
+
+    async def claim_update(self, update_id: int) -> bool:
+        """Record an update as handled by this worker; False if any worker saw it before."""
+        if not self.mark_update(update_id):
+            return False
+        try:
+            return await asyncio.to_thread(self.store.claim_update, update_id, UPDATE_DEDUPE_WINDOW)
+        except sqlite3.Error as e:
+            # Better a possible duplicate reply than dropping the update
+            logger.error("Could not claim update %s in the shared store: %s", update_id, e)
+            return True
+
+    def read(self, chat_id, key, default=None):
+        return self.store.activity_bucket(str(chat_id), key) or default
+
+    def increment(self, chat_id, week_key: str, user_id, handle: str, update_id=None, hour=None):
+        with self._lock:
+            self._pending.append((str(chat_id), week_key, user_id, handle, hour))
+
+    def heatmap(self, chat_id, week_keys) -> list[int]:
+        heatmap = [0] * HOURS_PER_WEEK
+        for hour, count in self.store.hour_counts(str(chat_id), week_keys).items():
+            heatmap[hour % HOURS_PER_WEEK] += count
+        return heatmap
+
+    def read_buckets(self, chat_ids, keys) -> dict:
+        wanted = {str(chat_id) for chat_id in chat_ids}
+        return {chat_id: buckets for chat_id, buckets in self.store.activity_buckets(keys).items() if chat_id in wanted}
+
+    def record_wins(self, marker: str, winners) -> dict:
+        return self.store.record_wins(marker, [(str(c), str(u), handle) for c, u, handle in winners])
+
+    def drop_buckets(self, pairs):
+        self.store.clear_buckets([(str(chat_id), key) for chat_id, key in pairs])
+
+    def flush(self) -> bool:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return False
+        try:
+            self.store.add_message_activity(pending, HEATMAP_WEEKS)
+        except sqlite3.Error as e:
+            # Put the messages back so the next flush retries them
+            with self._lock:
+                self._pending[:0] = pending
+            logger.error("Error flushing activity to the shared store: %s", e)
+            return False
+        return True
+
+
+ACTIVITY_STORE = (
+    SharedActivityStore(SHARED_STORE) if SHARED_STORE else ActivityStore(ACTIVITY_PATH, ACTIVITY_FALLBACK_PATH)
+)
+
+
+async def flush_activity(context: ContextTypes.DEFAULT_TYPE):
+    """Job that writes buffered activity counts to disk."""
+    await asyncio.to_thread(ACTIVITY_STORE.flush)
+
+
+def increment_activity_for_message(msg, update_id: int = None):
+    """Increment weekly activity counter for a given message's user."""
+    if msg is None or msg.from_user is None:
+        return
+
+    user = msg.from_user
+    if getattr(user, "is_bot", False):
+        return
+
+    # Only chats with a weekly prize need per-user counts; the hour-of-week
+    # heatmap (/activity, peak GM timing) is kept for every scheduled chat
+    chat = get_chat_config(msg.chat_id)
+    if not (chat.weekly_winner or chat.gm_enabled):
+        return
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    handle = f"@{user.username}" if user.username else user.first_name
+    user_id = str(user.id) if chat.weekly_winner else None
+    ACTIVITY_STORE.increment(chat.chat_id, week_key_for(now), user_id, handle, update_id, hour_of_week(now))
+
+
+# --- Activity heatmap ---
+
+_SHADES = "░▒▓█"
+_DAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def local_heatmap(heatmap, tz, now: datetime.datetime = None) -> list[list[int]]:
+    """168 UTC hour-of-week counts -> 7 x 24 rows (Monday first) in the chat's timezone."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    monday = now.astimezone(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    monday -= datetime.timedelta(days=monday.weekday())
+    rows = [[0] * 24 for _ in range(7)]
+    for hour, count in enumerate(heatmap):
+        if count:
+            local = (monday + datetime.timedelta(hours=hour)).astimezone(tz)
+            rows[local.weekday()][local.hour] += count
+    return rows
+
+
+def chat_heatmap(chat: ChatConfig, now: datetime.datetime = None) -> list[list[int]]:
+    """The chat's local 7 x 24 heatmap over the last HEATMAP_WEEKS weeks."""
+    return local_heatmap(ACTIVITY_STORE.heatmap(chat.chat_id, heatmap_week_keys(now)), chat.timezone, now)
+
+
+def format_heatmap(rows, tz_name: str) -> str:
+    """Monospace day x hour grid, one shaded cell per hour (for /activity)."""
+    peak = max(max(row) for row in rows)
+    total = sum(map(sum, rows))
+    lines = [
+        f"Messages per hour, last {HEATMAP_WEEKS} weeks ({tz_name}): {total}",
+        "",
+        f"    {'0':<6}{'6':<6}{'12':<6}{'18':<6}",
+    ]
+    for name, row in zip(_DAY_NAMES, rows):
+        cells = "".join(_SHADES[min(3, 4 * n // peak)] if n else "·" for n in row)
+        lines.append(f"{name} {cells}")
+    if peak:
+        day, hour = max(((d, h) for d in range(7) for h in range(24)), key=lambda dh: rows[dh[0]][dh[1]])
+        lines += ["", f"busiest: {_DAY_NAMES[day]} {hour:02d}:00 ({peak} msgs)"]
+    return "\n".join(lines)
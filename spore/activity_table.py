@@ -0,0 +1,338 @@
+"""
+Compact activity tables: per-chat user tables with typed per-bucket counts,
+the binary activity file format, and conversion to / from activity.json.
+
+    python bot.py --convert-activity activity.json activity.bin
+    python bot.py --convert-activity activity.bin activity.json
+"""
+
+import argparse
+import array
+import json
+import logging
+import operator
+import struct
+import sys
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 168
+
+# Hour-of-week counters are kept per ISO week; in activity.json layout they
+# are buckets "_hours:<week>" of {"<hour>": {"count": n}} (hour 0 = Monday 00 UTC)
+HOURS_BUCKET_PREFIX = "_hours:"
+
+
+# --- In-memory tables ---
+
+
+class UserTable:
+    """
+    Interns one chat's users to dense indexes 0..n-1: Telegram ids in an
+    int64 array, each user's latest handle as an index into a table of
+    distinct handle strings.
+    """
+
+    __slots__ = ("ids", "handle_ids", "handles", "_index", "_handle_index")
+
+    def __init__(self):
+        self.ids = array.array("q")
+        self.handle_ids = array.array("I")
+        self.handles = []
+        self._index = {}
+        self._handle_index = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _intern(self, handle: str) -> int:
+        i = self._handle_index.get(handle)
+        if i is None:
+            i = self._handle_index[handle] = len(self.handles)
+            self.handles.append(handle)
+        return i
+
+    def find(self, user_id: int):
+        return self._index.get(user_id)
+
+    def index_of(self, user_id: int, handle: str = None) -> int:
+        """Index for user_id (added if new); a given handle replaces the stored one."""
+        i = self._index.get(user_id)
+        if i is None:
+            i = self._index[user_id] = len(self.ids)
+            self.ids.append(user_id)
+            self.handle_ids.append(self._intern(handle or ""))
+        elif handle is not None and self.handles[self.handle_ids[i]] != handle:
+            self.handle_ids[i] = self._intern(handle)
+        return i
+
+    def handle(self, i: int) -> str:
+        return self.handles[self.handle_ids[i]]
+
+
+class ChatActivity:
+    """
+    One chat's buckets (ISO weeks and "_wins") as uint32 arrays indexed by
+    UserTable position, instead of a {"count", "handle"} dict per user per
+    week. Arrays only grow as far as the highest user index counted in them.
+
+    `hours` holds the chat's messages per hour of week (168 uint32) for the
+    most recent ISO weeks, for the activity heatmap.
+    """
+
+    __slots__ = ("users", "buckets", "hours")
+
+    def __init__(self):
+        self.users = UserTable()
+        self.buckets = {}
+        self.hours = {}
+
+    def add(self, key: str, user_id: int, handle: str = None, n: int = 1) -> int:
+        """Add n to a user's count in a bucket; returns the new count."""
+        i = self.users.index_of(user_id, handle)
+        counts = self.buckets.get(key)
+        if counts is None:
+            counts = self.buckets[key] = array.array("I")
+        if len(counts) <= i:
+            counts.frombytes(bytes(counts.itemsize * (i + 1 - len(counts))))
+        counts[i] += n
+        return counts[i]
+
+    def bucket(self, key: str):
+        """The bucket in activity.json layout ({user_id: {"count", "handle"}}), or None."""
+        counts = self.buckets.get(key)
+        if counts is None:
+            return None
+        ids, users = self.users.ids, self.users
+        return {str(ids[i]): {"count": c, "handle": users.handle(i)} for i, c in enumerate(counts) if c}
+
+    def count(self, key: str, user_id: int) -> int:
+        counts = self.buckets.get(key)
+        i = self.users.find(user_id)
+        return counts[i] if counts is not None and i is not None and i < len(counts) else 0
+
+    def drop(self, key: str):
+        self.buckets.pop(key, None)
+
+    def copy(self, keys) -> "ChatActivity":
+        """Detached copy of just the given buckets (array copies, no per-user objects)."""
+        chat = ChatActivity()
+        users = chat.users
+        users.ids = array.array("q", self.users.ids)
+        users.handle_ids = array.array("I", self.users.handle_ids)
+        users.handles = list(self.users.handles)
+        users._index = dict(self.users._index)
+        users._handle_index = dict(self.users._handle_index)
+        for key in keys:
+            counts = self.buckets.get(key)
+            if counts is not None:
+                chat.buckets[key] = array.array("I", counts)
+        return chat
+
+    def add_hour(self, week_key: str, hour: int, n: int = 1, keep_weeks: int = None):
+        """Count n messages in an hour of week; only the newest keep_weeks weeks are kept."""
+        counts = self.hours.get(week_key)
+        if counts is None:
+            counts = self.hours[week_key] = array.array("I", bytes(4 * HOURS_PER_WEEK))
+            if keep_weeks:
+                for old in sorted(self.hours)[:-keep_weeks]:
+                    del self.hours[old]
+        counts[hour] += n
+
+    def heatmap(self, week_keys) -> list:
+        """Messages per hour of week, summed over the given ISO weeks."""
+        total = [0] * HOURS_PER_WEEK
+        for week_key in week_keys:
+            counts = self.hours.get(week_key)
+            if counts is not None:
+                total = list(map(operator.add, total, counts))
+        return total
+
+    def to_json(self) -> dict:
+        data = {key: self.bucket(key) for key in self.buckets}
+        for week_key, counts in self.hours.items():
+            data[HOURS_BUCKET_PREFIX + week_key] = {str(h): {"count": c} for h, c in enumerate(counts) if c}
+        return data
+
+    @classmethod
+    def from_json(cls, buckets: dict) -> "ChatActivity":
+        chat = cls()
+        for key, users in buckets.items():
+            if key.startswith(HOURS_BUCKET_PREFIX):
+                week_key = key[len(HOURS_BUCKET_PREFIX):]
+                for hour, entry in users.items():
+                    chat.add_hour(week_key, int(hour) % HOURS_PER_WEEK, int(entry.get("count", 0)))
+                continue
+            chat.buckets.setdefault(key, array.array("I"))
+            for user_key, entry in users.items():
+                try:
+                    user_id = int(user_key)
+                except ValueError:
+                    logger.warning("Skipping non-numeric user id %r in bucket %s", user_key, key)
+                    continue
+                chat.add(key, user_id, entry.get("handle"), int(entry.get("count", 0)))
+        return chat
+
+
+def tables_from_json(data: dict) -> dict:
+    """activity.json layout ({chat_id: {bucket: {user_id: entry}}}) -> {chat_id: ChatActivity}."""
+    return {chat_key: ChatActivity.from_json(buckets) for chat_key, buckets in data.items()}
+
+
+def tables_to_json(chats: dict) -> dict:
+    return {chat_key: chat.to_json() for chat_key, chat in chats.items()}
+
+
+# --- Binary format ---
+#
+# Little-endian throughout; strings are u32 length + UTF-8 bytes:
+#
+#   b"SPOREACT" u16 version  u32 chat count
+#   per chat:   str chat_id
+#               u32 handle count, str handles...
+#               u32 user count, i64 ids[n], u32 handle index[n]
+#               u32 bucket count, per bucket: str key, u32 length, u32 counts[length]
+#               u32 week count, per week: str week, u32 hour counts[168]   (version 2+)
+#   u32 update count, i64 recent update_ids[n]
+
+_MAGIC = b"SPOREACT"
+_VERSION = 2
+_HEADER = struct.Struct("<8sHI")
+_U32 = struct.Struct("<I")
+
+
+def _put_str(out: bytearray, value: str):
+    raw = value.encode("utf-8")
+    out += _U32.pack(len(raw))
+    out += raw
+
+
+def _put_array(out: bytearray, values: array.array):
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    out += values.tobytes()
+
+
+class _Reader:
+    def __init__(self, raw: bytes):
+        self.raw = memoryview(raw)
+        self.pos = 0
+
+    def take(self, size: int) -> memoryview:
+        if self.pos + size > len(self.raw):
+            raise ValueError("truncated activity file")
+        chunk = self.raw[self.pos : self.pos + size]
+        self.pos += size
+        return chunk
+
+    def u32(self) -> int:
+        return _U32.unpack(self.take(4))[0]
+
+    def text(self) -> str:
+        return str(self.take(self.u32()), "utf-8")
+
+    def values(self, typecode: str, n: int) -> array.array:
+        values = array.array(typecode)
+        values.frombytes(self.take(values.itemsize * n))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+
+def dump_binary(chats: dict, update_ids=()) -> bytes:
+    out = bytearray(_HEADER.pack(_MAGIC, _VERSION, len(chats)))
+    for chat_key, chat in chats.items():
+        users = chat.users
+        _put_str(out, chat_key)
+        out += _U32.pack(len(users.handles))
+        for handle in users.handles:
+            _put_str(out, handle)
+        out += _U32.pack(len(users))
+        _put_array(out, users.ids)
+        _put_array(out, users.handle_ids)
+        out += _U32.pack(len(chat.buckets))
+        for key, counts in chat.buckets.items():
+            _put_str(out, key)
+            out += _U32.pack(len(counts))
+            _put_array(out, counts)
+        out += _U32.pack(len(chat.hours))
+        for week_key, counts in chat.hours.items():
+            _put_str(out, week_key)
+            _put_array(out, counts)
+    update_ids = array.array("q", update_ids)
+    out += _U32.pack(len(update_ids))
+    _put_array(out, update_ids)
+    return bytes(out)
+
+
+def load_binary(raw: bytes):
+    """Returns ({chat_id: ChatActivity}, [recent update_ids]); ValueError if malformed."""
+    reader = _Reader(raw)
+    magic, version, chat_count = _HEADER.unpack(reader.take(_HEADER.size))
+    if magic != _MAGIC:
+        raise ValueError("not a binary activity file")
+    if not 1 <= version <= _VERSION:
+        raise ValueError(f"unsupported activity file version {version}")
+
+    chats = {}
+    for _ in range(chat_count):
+        chat_key = reader.text()
+        chat = ChatActivity()
+        users = chat.users
+        users.handles = [reader.text() for _ in range(reader.u32())]
+        users._handle_index = {handle: i for i, handle in enumerate(users.handles)}
+        n = reader.u32()
+        users.ids = reader.values("q", n)
+        users.handle_ids = reader.values("I", n)
+        users._index = {user_id: i for i, user_id in enumerate(users.ids)}
+        for _ in range(reader.u32()):
+            key = reader.text()
+            chat.buckets[key] = reader.values("I", reader.u32())
+        if version >= 2:
+            for _ in range(reader.u32()):
+                week_key = reader.text()
+                chat.hours[week_key] = reader.values("I", HOURS_PER_WEEK)
+        chats[chat_key] = chat
+    update_ids = list(reader.values("q", reader.u32()))
+    return chats, update_ids
+
+
+def is_binary_file(path: str) -> bool:
+    return path.endswith(".bin")
+
+
+def read_activity_file(path: str) -> dict:
+    """Either format as activity.json layout (recent update_ids under "_updates")."""
+    if is_binary_file(path):
+        with open(path, "rb") as f:
+            chats, update_ids = load_binary(f.read())
+        data = tables_to_json(chats)
+        data["_updates"] = {"last": max(update_ids, default=0), "recent": update_ids}
+        return data
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def convert_activity(argv=None) -> int:
+    """`python bot.py --convert-activity SRC DST`: the format of each side follows its extension (.bin or .json)."""
+    parser = argparse.ArgumentParser(prog="bot.py --convert-activity")
+    parser.add_argument("--convert-activity", action="store_true")
+    parser.add_argument("source")
+    parser.add_argument("dest")
+    args = parser.parse_args(argv)
+
+    # Needs the chat config, which imports this module
+    from .activity import migrate_activity_layout
+
+    data = migrate_activity_layout(read_activity_file(args.source))
+    if is_binary_file(args.dest):
+        checkpoint = data.pop("_updates", None) or {}
+        payload = dump_binary(tables_from_json(data), checkpoint.get("recent", ()))
+        with open(args.dest, "wb") as f:
+            f.write(payload)
+    else:
+        with open(args.dest, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    print(f"Wrote {args.dest}")
+    return 0
@@ -0,0 +1,248 @@
+"""Application wiring and the main() entry point."""
+
+import asyncio
+import logging
+import os
+
+from telegram import Update
+from telegram.ext import (
+    ApplicationBuilder,
+    CommandHandler,
+    InlineQueryHandler,
+    MessageHandler,
+    TypeHandler,
+    filters,
+)
+
+from .config import (
+    BOT_MODE,
+    CHART_HISTORY_FILE,
+    CHART_SAMPLE_SECONDS,
+    LEADER_LEASE_SECONDS,
+    SHARED_STORE_PATH,
+    TELEGRAM_BASE_URL,
+    TELEGRAM_TOKEN,
+    TIMER_TICK_SECONDS,
+    UPDATE_CONCURRENCY,
+    WEBHOOK_QUEUE_SIZE,
+    WORKER_ID,
+    check_config,
+)
+from .logs import setup_logging, stop_logging
+from .llm import warm_up
+from .storage import SHARED_STORE
+from .cluster import COORDINATOR, renew_leadership
+from .knowledge import KNOWLEDGE_POLL_SECONDS, KNOWLEDGE_STORE, refresh_knowledge
+from .chats import CHAT_CONFIGS, load_chat_configs
+from .activity import (
+    ACTIVITY_FALLBACK_PATH,
+    ACTIVITY_FLUSH_SECONDS,
+    ACTIVITY_PATH,
+    ACTIVITY_STORE,
+    flush_activity,
+)
+from .scheduling import TIMER_WHEEL, schedule_chat_tasks, timer_tick
+from .handlers import (
+    activity_heatmap,
+    chatid,
+    drop_duplicate_updates,
+    guard_ingress,
+    handle_chat,
+    on_handler_error,
+    prices,
+    stats,
+    track_activity,
+    whoami,
+)
+from .inline import inline_query
+from .prompts import chat_prefix
+from .charts import CHART_RENDERER, PRICE_HISTORY, chart, sample_prices
+from .processing import ChatOrderedUpdateProcessor
+from .lifecycle import run_polling
+from .webhook import run_webhook
+
+logger = logging.getLogger(__name__)
+
+
+async def on_shutdown(app):
+    """
+    Flush buffered state and hand off leadership once the application has
+    stopped (after the drain). Timer due times and claims are written as
+    they change, so the schedule needs no flush of its own.
+    """
+    flushed = []
+    try:
+        if ACTIVITY_STORE.flush():
+            flushed.append("activity")
+    except Exception as e:
+        logger.error("Could not flush activity on shutdown: %s", e)
+    try:
+        if PRICE_HISTORY.save(CHART_HISTORY_FILE):
+            flushed.append("price history")
+    except OSError as e:
+        logger.error("Could not save price history on shutdown: %s", e)
+    CHART_RENDERER.shutdown()
+    COORDINATOR.release()
+    if SHARED_STORE is not None:
+        SHARED_STORE.close()
+    logger.info("Shutdown complete, flushed: %s", ", ".join(flushed) or "nothing pending")
+
+
+def load_configuration():
+    """Per-chat config table, plus the shared store / leader lease in multi-worker mode."""
+    if SHARED_STORE is not None and BOT_MODE == "polling":
+        logger.warning("Only one worker may poll getUpdates; use BOT_MODE=webhook for several workers.")
+
+    CHAT_CONFIGS.update(load_chat_configs())
+    logger.info("%d configured chats", len(CHAT_CONFIGS))
+    PRICE_HISTORY.load(CHART_HISTORY_FILE)
+
+    # Multi-worker mode: pull in an existing activity file once, then find
+    # out whether this worker leads before the first timer tick
+    if SHARED_STORE is not None:
+        ACTIVITY_STORE.import_file(ACTIVITY_PATH, ACTIVITY_FALLBACK_PATH)
+        COORDINATOR.renew()
+        logger.info("Worker %s using shared store %s", WORKER_ID, SHARED_STORE_PATH)
+
+
+def load_knowledge_base():
+    """Initial knowledge load (the refresh job polls for changes while running)."""
+    KNOWLEDGE_STORE.refresh()
+    snap = KNOWLEDGE_STORE.snapshot
+    logger.info("Loaded %d knowledge files (hash %s)", len(snap.files), snap.content_hash[:12])
+    if snap.index is not None:
+        logger.info("Knowledge index ready: %d chunks", snap.index.chunk_count)
+    # Prompt prefixes for every configured knowledge subset, before the first mention
+    for knowledge in {chat.knowledge for chat in CHAT_CONFIGS.values()} | {None}:
+        logger.info("Prompt prefix %s (%s)", chat_prefix(knowledge).version, ", ".join(knowledge or ["all knowledge"]))
+
+
+def build_application(request=None):
+    """`request` swaps the Bot API transport (bench/load_replay.py passes a fake)."""
+    builder = ApplicationBuilder().token(TELEGRAM_TOKEN).base_url(TELEGRAM_BASE_URL)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    if UPDATE_CONCURRENCY > 1:
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(UPDATE_CONCURRENCY))
+    if BOT_MODE == "webhook":
+        # Bounded intake: the webhook answers 503 instead of queueing forever
+        builder = builder.update_queue(asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE))
+    return builder.build()
+
+
+def register_handlers(app):
+    """Handlers plus the repeating jobs (timer wheel, lease, flushes, reloads)."""
+    # Drop re-delivered updates before any other handler sees them
+    app.add_handler(TypeHandler(Update, drop_duplicate_updates), group=-2)
+
+    # Shed copy-paste floods and message bursts before activity / LLM work
+    app.add_handler(MessageHandler(filters.TEXT, guard_ingress), group=-1)
+
+    # Global activity tracker (runs on ALL text messages)
+    app.add_handler(MessageHandler(filters.TEXT, track_activity), group=0)
+
+    # Lore / reply handler (only when mentioned or replied to)
+    app.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND, handle_chat),
+        group=1,
+    )
+
+    # Commands live in group 1 too: group 0's activity tracker also matches
+    # command text, and only one handler per group runs.
+    # /prices command
+    app.add_handler(CommandHandler("prices", prices), group=1)
+
+    # /chatid command
+    app.add_handler(CommandHandler("chatid", chatid), group=1)
+
+    # /whoami command
+    app.add_handler(CommandHandler("whoami", whoami), group=1)
+
+    # /activity command (hour-of-week heatmap)
+    app.add_handler(CommandHandler("activity", activity_heatmap), group=1)
+
+    # /chart command (PNG price chart, drawn in worker processes)
+    app.add_handler(CommandHandler("chart", chart), group=1)
+
+    # /stats command (owner only)
+    app.add_handler(CommandHandler("stats", stats), group=1)
+
+    # Inline mode: `@SporeLoreBot fungi` price cards and lore snippets
+    app.add_handler(InlineQueryHandler(inline_query), group=1)
+
+    # Count and log exceptions escaping any handler (shown in /stats)
+    app.add_error_handler(on_handler_error)
+
+    # Daily GM for every configured chat + one weekly digest (Sunday 23:59 UTC)
+    # announcing every chat's winner, all driven by one timer wheel and one
+    # repeating job
+    schedule_chat_tasks(TIMER_WHEEL, CHAT_CONFIGS.values())
+    app.job_queue.run_repeating(
+        timer_tick,
+        interval=TIMER_TICK_SECONDS,
+        first=1,
+        name="timer_wheel",
+    )
+
+    # Keep / take over the scheduler lease (multi-worker mode only)
+    if SHARED_STORE is not None:
+        app.job_queue.run_repeating(
+            renew_leadership,
+            interval=max(1.0, LEADER_LEASE_SECONDS / 3),
+            first=max(1.0, LEADER_LEASE_SECONDS / 3),
+            name="leader_lease",
+        )
+
+    # Write buffered activity counts to disk
+    app.job_queue.run_repeating(
+        flush_activity,
+        interval=ACTIVITY_FLUSH_SECONDS,
+        first=ACTIVITY_FLUSH_SECONDS,
+        name="activity_flush",
+    )
+
+    # Record prices for /chart
+    if CHART_SAMPLE_SECONDS > 0:
+        app.job_queue.run_repeating(
+            sample_prices,
+            interval=CHART_SAMPLE_SECONDS,
+            first=1,
+            name="price_samples",
+        )
+
+    # Hot-reload knowledge files
+    app.job_queue.run_repeating(
+        refresh_knowledge,
+        interval=KNOWLEDGE_POLL_SECONDS,
+        first=KNOWLEDGE_POLL_SECONDS,
+        name="knowledge_refresh",
+    )
+
+
+def main():
+    # Create and set an explicit event loop (needed for Python 3.14)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    setup_logging()
+    if not check_config():
+        logger.error("Missing or invalid configuration. Exiting.")
+        return
+
+    load_configuration()
+    load_knowledge_base()
+
+    # openai loads in the background while we connect to Telegram
+    warm_up()
+
+    app = build_application()
+    register_handlers(app)
+
+    logger.info("Spore Telegram agent is running (%s)...", BOT_MODE)
+    report = loop.run_until_complete(run_webhook(app) if BOT_MODE == "webhook" else run_polling(app))
+    loop.run_until_complete(on_shutdown(app))
+    if report["abandoned"]:
+        # Threads still blocked in abandoned LLM / HTTP calls can't be
+        # interrupted and would hold up interpreter exit; state is saved
+        stop_logging()
+        os._exit(0)
@@ -0,0 +1,100 @@
+"""
+PNG price charts drawn with the standard library only.
+
+render_chart_png() runs in /chart's worker processes, so this module must
+stay importable on its own (no telegram, config or store imports).
+"""
+
+import struct
+import zlib
+
+BACKGROUND = (22, 24, 31)
+GRID = (48, 52, 64)
+UP = (38, 194, 129)
+DOWN = (234, 57, 67)
+
+_PAD = 12
+_GRID_LINES = 4
+
+
+def _png(width: int, height: int, rgb: bytearray) -> bytes:
+    """8-bit RGB PNG from a row-major pixel buffer (filter type 0 on every row)."""
+    stride = width * 3
+    raw = bytearray()
+    for y in range(height):
+        raw.append(0)
+        raw += rgb[y * stride : (y + 1) * stride]
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(bytes(raw), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _mix(color, base, alpha: float):
+    return tuple(round(c * alpha + b * (1 - alpha)) for c, b in zip(color, base))
+
+
+def render_chart_png(times, prices, width: int = 640, height: int = 320) -> bytes:
+    """
+    Line chart with a shaded area under it: green if the last price is at
+    or above the first, red otherwise. Samples must be in time order.
+    """
+    canvas = bytearray(bytes(BACKGROUND) * (width * height))
+    stride = width * 3
+    x0, x1 = _PAD, width - _PAD - 1
+    y0, y1 = _PAD, height - _PAD - 1
+
+    def hline(y, color):
+        canvas[y * stride + x0 * 3 : y * stride + (x1 + 1) * 3] = bytes(color) * (x1 - x0 + 1)
+
+    for i in range(_GRID_LINES + 1):
+        hline(y0 + (y1 - y0) * i // _GRID_LINES, GRID)
+
+    color = UP if prices[-1] >= prices[0] else DOWN
+    fill = bytes(_mix(color, BACKGROUND, 0.22))
+    line = bytes(color)
+
+    t_min, t_span = times[0], (times[-1] - times[0]) or 1.0
+    p_min, p_span = min(prices), max(prices) - min(prices)
+
+    def to_y(price):
+        if not p_span:
+            return (y0 + y1) // 2
+        return round(y1 - (price - p_min) / p_span * (y1 - y0))
+
+    # Line height at every column, interpolated between samples
+    column_y = [None] * width
+    points = [(round(x0 + (t - t_min) / t_span * (x1 - x0)), to_y(p)) for t, p in zip(times, prices)]
+    for (xa, ya), (xb, yb) in zip(points, points[1:]):
+        for x in range(xa, xb + 1):
+            column_y[x] = ya if xb == xa else round(ya + (yb - ya) * (x - xa) / (xb - xa))
+
+    prev = None
+    for x in range(x0, x1 + 1):
+        y = column_y[x]
+        if y is None:
+            continue
+        for row in range(y + 1, y1 + 1):
+            offset = row * stride + x * 3
+            canvas[offset : offset + 3] = fill
+        # Cover the whole vertical step from the previous column, 2px thick
+        top, bottom = (y, y) if prev is None else (min(prev, y), max(prev, y))
+        for row in range(max(y0, top - 1), min(y1, bottom + 1) + 1):
+            offset = row * stride + x * 3
+            canvas[offset : offset + 3] = line
+        prev = y
+
+    # Dot on the latest price
+    last_x, last_y = points[-1]
+    for row in range(max(0, last_y - 3), min(height, last_y + 4)):
+        offset = row * stride + max(0, last_x - 3) * 3
+        end = row * stride + min(width, last_x + 4) * 3
+        canvas[offset:end] = line * ((end - offset) // 3)
+
+    return _png(width, height, canvas)
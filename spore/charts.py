@@ -0,0 +1,242 @@
+"""/chart: PNG price charts from locally recorded price samples, rendered in a process pool."""
+
+import array
+import asyncio
+import bisect
+import json
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from .config import CHART_HISTORY_FILE, CHART_QUEUE_SIZE, CHART_SAMPLE_SECONDS, CHART_WORKERS
+from .chart_render import render_chart_png
+from .prices import format_change, format_price, get_prices, match_price_tokens
+from .sender import SENDER
+from .storage import write_file_atomic
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+CHART_RANGES = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600, "30d": 30 * 24 * 3600}
+DEFAULT_RANGE = "24h"
+
+# Telegram file_ids remembered for charts already uploaded
+CHART_FILE_ID_CACHE_SIZE = 256
+
+
+# --- Price samples ---
+
+
+class PriceHistory:
+    """
+    (time, USD price) samples per symbol, at most one per sample_seconds,
+    kept for the longest chart range. `version` changes with every recorded
+    sample, so (symbol, range, version) names one exact chart.
+    """
+
+    def __init__(self, sample_seconds: float = CHART_SAMPLE_SECONDS, keep_seconds: float = max(CHART_RANGES.values())):
+        self.sample_seconds = sample_seconds
+        self.keep_seconds = keep_seconds
+        self.version = 0
+        self.dirty = False
+        self._series = {}  # symbol -> (times, prices) as array("d")
+
+    def record(self, prices: dict, now: float = None) -> bool:
+        """Add a sample from a get_prices() snapshot; False if it came too soon after the last one."""
+        now = time.time() if now is None else now
+        recorded = False
+        for symbol, info in prices.items():
+            if info.get("price") is None:
+                continue
+            times, values = self._series.setdefault(symbol, (array.array("d"), array.array("d")))
+            # A little slack so a job tick landing early still records
+            if times and now - times[-1] < self.sample_seconds * 0.9:
+                continue
+            times.append(now)
+            values.append(info["price"])
+            cut = bisect.bisect_left(times, now - self.keep_seconds)
+            if cut:
+                del times[:cut]
+                del values[:cut]
+            recorded = True
+        if recorded:
+            self.version += 1
+            self.dirty = True
+        return recorded
+
+    def series(self, symbol: str, seconds: float, now: float = None):
+        """(times, prices) lists for the last `seconds`, oldest first."""
+        times, values = self._series.get(symbol, ((), ()))
+        now = time.time() if now is None else now
+        start = bisect.bisect_left(times, now - seconds)
+        return list(times[start:]), list(values[start:])
+
+    def dumps(self) -> str:
+        return json.dumps({symbol: {"t": list(t), "p": list(p)} for symbol, (t, p) in self._series.items()})
+
+    def load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error("Error reading price history %s: %s", path, e)
+            return
+        for symbol, entry in data.items():
+            self._series[symbol] = (array.array("d", entry["t"]), array.array("d", entry["p"]))
+        self.version += 1
+
+    def save(self, path: str) -> bool:
+        """Write the samples if anything changed since the last save."""
+        if not self.dirty:
+            return False
+        write_file_atomic(path, self.dumps())
+        self.dirty = False
+        return True
+
+
+PRICE_HISTORY = PriceHistory()
+
+
+async def sample_prices(context: ContextTypes.DEFAULT_TYPE):
+    """Repeating job: record the current prices for /chart and save the history."""
+    data = await asyncio.to_thread(get_prices)
+    if data and PRICE_HISTORY.record(data):
+        payload = PRICE_HISTORY.dumps()
+        PRICE_HISTORY.dirty = False
+        try:
+            await asyncio.to_thread(write_file_atomic, CHART_HISTORY_FILE, payload)
+        except OSError as e:
+            PRICE_HISTORY.dirty = True
+            logger.error("Error saving price history: %s", e)
+
+
+# --- Rendering ---
+
+
+class ChartBusy(Exception):
+    """CHART_QUEUE_SIZE renders are already queued or running."""
+
+
+class ChartRenderer:
+    """
+    Renders charts in a process pool (started on first use) so drawing
+    never blocks the event loop. At most queue_size renders are queued or
+    running; a request for a chart that's already being drawn waits on
+    that render instead of starting another. Uploaded charts are
+    remembered by Telegram file_id, so repeats re-send without uploading.
+    """
+
+    def __init__(self, workers: int = CHART_WORKERS, queue_size: int = CHART_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self._pool = None
+        self._pending = {}  # key -> future
+        self._file_ids = OrderedDict()
+
+    def file_id(self, key):
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            self._file_ids.move_to_end(key)
+        return file_id
+
+    def remember(self, key, file_id: str):
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > CHART_FILE_ID_CACHE_SIZE:
+            self._file_ids.popitem(last=False)
+
+    async def render(self, key, times, prices) -> bytes:
+        try:
+            future = self._pending.get(key)
+            if future is None:
+                if len(self._pending) >= self.queue_size:
+                    raise ChartBusy()
+                if self._pool is None:
+                    # Spawned, not forked: this process has threads (logging,
+                    # to_thread workers) whose held locks a fork would copy
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                future = asyncio.get_running_loop().run_in_executor(self._pool, render_chart_png, times, prices)
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._pending.pop(key, None))
+            # Shielded: one requester giving up doesn't cancel the others' render
+            return await asyncio.shield(future)
+        except BrokenProcessPool:
+            # A worker died (while rendering or idle); start a fresh pool next time
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+CHART_RENDERER = ChartRenderer()
+
+
+# --- /chart command ---
+
+
+def chart_caption(symbol: str, range_name: str, prices) -> str:
+    first, last = prices[0], prices[-1]
+    _, change_str = format_change((last / first - 1) * 100 if first else None)
+    return (
+        f"{symbol} {range_name}: {format_price(last)} ({change_str})\n"
+        f"low {format_price(min(prices))} · high {format_price(max(prices))}"
+    )
+
+
+async def chart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/chart <symbol> [1h|24h|7d|30d]: price chart from the locally recorded samples."""
+    msg = update.effective_message
+    if msg is None:
+        return
+
+    args = [arg.lower() for arg in context.args or []]
+    range_name = next((arg for arg in args if arg in CHART_RANGES), DEFAULT_RANGE)
+    words = " ".join(arg for arg in args if arg not in CHART_RANGES)
+    symbols = match_price_tokens(words) if words else []
+    if not symbols:
+        await SENDER.reply(msg, f"Usage: /chart <token> [{'|'.join(CHART_RANGES)}], e.g. /chart fungi 7d")
+        return
+    symbol = symbols[0]
+
+    times, prices = PRICE_HISTORY.series(symbol, CHART_RANGES[range_name])
+    if len(prices) < 2:
+        await SENDER.reply(
+            msg,
+            f"Not enough {symbol} price history for a {range_name} chart yet "
+            f"(I sample every {max(1, CHART_SAMPLE_SECONDS // 60)} min).",
+        )
+        return
+    caption = chart_caption(symbol, range_name, prices)
+
+    key = (symbol, range_name, PRICE_HISTORY.version)
+    file_id = CHART_RENDERER.file_id(key)
+    if file_id is not None:
+        TRACER.count("chart_cache_hit")
+        await SENDER.reply_photo(msg, file_id, caption)
+        return
+
+    TRACER.count("chart_cache_miss")
+    try:
+        with TRACER.stage("chart_render"):
+            png = await CHART_RENDERER.render(key, times, prices)
+    except ChartBusy:
+        TRACER.count("shed_chart_busy")
+        await SENDER.reply(msg, "Busy drawing other charts rn, try again in a few seconds.")
+        return
+
+    sent = await SENDER.reply_photo(msg, png, caption)
+    if sent is not None and sent.photo:
+        CHART_RENDERER.remember(key, sent.photo[-1].file_id)
@@ -0,0 +1,151 @@
+"""Per-chat configuration (multi-chat tenancy)."""
+
+import datetime
+import json
+import logging
+import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .config import (
+    CHATS_CONFIG_FILE,
+    GM_CHAT_ID,
+    GM_MODE,
+    GM_WINDOW_END_HOUR_UTC,
+    GM_WINDOW_START_HOUR_UTC,
+    OWNER_USER_ID,
+)
+from .prices import TOKEN_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+# --- Per-chat configuration (multi-chat tenancy) ---
+
+
+def parse_window_bound(value) -> int:
+    """GM window bound as minutes after midnight: 14 -> 840, "14:30" -> 870."""
+    if isinstance(value, str) and ":" in value:
+        hours, minutes = value.split(":", 1)
+        return int(hours) * 60 + int(minutes)
+    return int(value) * 60
+
+
+class ChatConfig:
+    """Settings for one community chat."""
+
+    __slots__ = (
+        "chat_id",
+        "name",
+        "gm_enabled",
+        "gm_start_minute",
+        "gm_end_minute",
+        "gm_mode",
+        "timezone",
+        "knowledge",
+        "tokens",
+        "excluded_user_ids",
+        "weekly_winner",
+    )
+
+    def __init__(
+        self,
+        chat_id: int,
+        name: str = "",
+        gm_enabled: bool = True,
+        gm_start_minute: int = GM_WINDOW_START_HOUR_UTC * 60,
+        gm_end_minute: int = GM_WINDOW_END_HOUR_UTC * 60,
+        timezone: str = "UTC",
+        knowledge=None,
+        tokens=None,
+        excluded_user_ids=(),
+        weekly_winner: bool = True,
+        gm_mode: str = GM_MODE,
+    ):
+        self.chat_id = chat_id
+        self.name = name or str(chat_id)
+        self.gm_enabled = gm_enabled
+        self.gm_start_minute = gm_start_minute
+        self.gm_end_minute = gm_end_minute
+        if gm_mode not in ("window", "peak"):
+            logger.warning("Unknown gm_mode %r for chat %s, using window.", gm_mode, chat_id)
+            gm_mode = "window"
+        self.gm_mode = gm_mode
+        try:
+            self.timezone = ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("Unknown timezone %r for chat %s, using UTC.", timezone, chat_id)
+            self.timezone = datetime.timezone.utc
+        # None = all knowledge files / all configured tokens
+        self.knowledge = tuple(knowledge) if knowledge else None
+        self.tokens = (
+            tuple(t.upper() for t in tokens if t.upper() in TOKEN_CONFIG) if tokens else None
+        )
+        excluded = {int(uid) for uid in excluded_user_ids}
+        if OWNER_USER_ID:
+            excluded.add(OWNER_USER_ID)
+        self.excluded_user_ids = frozenset(str(uid) for uid in excluded)
+        self.weekly_winner = weekly_winner
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "ChatConfig":
+        window = raw.get("gm_window") or [GM_WINDOW_START_HOUR_UTC, GM_WINDOW_END_HOUR_UTC]
+        return cls(
+            chat_id=int(raw["chat_id"]),
+            name=raw.get("name", ""),
+            gm_enabled=raw.get("gm", True),
+            gm_start_minute=parse_window_bound(window[0]),
+            gm_end_minute=parse_window_bound(window[1]),
+            timezone=raw.get("timezone", "UTC"),
+            knowledge=raw.get("knowledge"),
+            tokens=raw.get("tokens"),
+            excluded_user_ids=raw.get("excluded_user_ids", ()),
+            weekly_winner=raw.get("weekly_winner", True),
+            gm_mode=raw.get("gm_mode", GM_MODE),
+        )
+
+    def token_symbols(self) -> tuple:
+        return self.tokens if self.tokens is not None else tuple(TOKEN_CONFIG)
+
+
+# Used for chats that aren't in the config table: everything, no scheduled tasks
+DEFAULT_CHAT_CONFIG = ChatConfig(0, name="default", gm_enabled=False, weekly_winner=False)
+
+CHAT_CONFIGS: dict[int, ChatConfig] = {}
+
+
+def load_chat_configs(path: str = None) -> dict[int, ChatConfig]:
+    """
+    Load the per-chat table from CHATS_CONFIG_FILE:
+
+        {"chats": [{"chat_id": -100123, "name": "main", "gm_window": [14, "15:30"],
+                    "timezone": "Europe/Berlin", "knowledge": ["links.md"],
+                    "tokens": ["FUNGI", "BTC"], "excluded_user_ids": [42],
+                    "gm": true, "gm_mode": "peak", "weekly_winner": true}]}
+
+    Falls back to a single chat from GM_CHAT_ID and the GM window env vars.
+    """
+    path = path or CHATS_CONFIG_FILE
+    configs = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            for entry in raw.get("chats", []):
+                chat = ChatConfig.from_dict(entry)
+                configs[chat.chat_id] = chat
+        except Exception as e:
+            logger.error("Could not load %s: %s", path, e)
+    elif GM_CHAT_ID != 0:
+        configs[GM_CHAT_ID] = ChatConfig(GM_CHAT_ID, name="main")
+    return configs
+
+
+def get_chat_config(chat_id) -> ChatConfig:
+    return CHAT_CONFIGS.get(chat_id, DEFAULT_CHAT_CONFIG)
+
+
+def primary_chat_config():
+    """The chat GM_CHAT_ID points at (for callers that don't pass a chat)."""
+    return CHAT_CONFIGS.get(GM_CHAT_ID) or (
+        ChatConfig(GM_CHAT_ID, name="main") if GM_CHAT_ID != 0 else None
+    )
@@ -0,0 +1,170 @@
+"""Leader election and exactly-once claims for scheduled jobs."""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from telegram.ext import ContextTypes
+
+from .config import LEADER_LEASE_SECONDS, SCHEDULE_FILE, WORKER_ID
+from .storage import SHARED_STORE, SharedStore, write_file_atomic
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCoordinator:
+    """
+    Single instance: always the leader. Timer due times and job claims are
+    kept in SCHEDULE_FILE and written on every change, so a restart keeps
+    today's GM time and knows what already ran.
+    """
+
+    # Claims older than this are dropped from the file
+    CLAIM_RETENTION_SECONDS = 35 * 24 * 3600
+
+    def __init__(self, path: str):
+        self.path = path
+        self.worker_id = WORKER_ID
+        self.is_leader = True
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._state is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                state = {}
+            except Exception as e:
+                logger.error("Could not read %s: %s", self.path, e)
+                state = {}
+            state.setdefault("timers", {})
+            state.setdefault("claims", {})
+            self._state = state
+        return self._state
+
+    def _save(self):
+        try:
+            write_file_atomic(self.path, json.dumps(self._state))
+        except Exception as e:
+            logger.error("Could not write %s: %s", self.path, e)
+
+    def renew(self) -> bool:
+        return True
+
+    def job_ran(self, job_key: str) -> bool:
+        with self._lock:
+            return job_key in self._load()["claims"]
+
+    def claim_job(self, job_key: str) -> bool:
+        return job_key in self.claim_jobs([job_key])
+
+    def claim_jobs(self, job_keys) -> set:
+        """Claim several runs with one write; returns the keys claimed now."""
+        with self._lock:
+            claims = self._load()["claims"]
+            now = time.time()
+            claimed = {key for key in job_keys if key not in claims}
+            if not claimed:
+                return claimed
+            for key in claimed:
+                claims[key] = now
+            for key in [k for k, at in claims.items() if now - at > self.CLAIM_RETENTION_SECONDS]:
+                del claims[key]
+            self._save()
+            return claimed
+
+    def release_job(self, job_key: str):
+        with self._lock:
+            if self._load()["claims"].pop(job_key, None) is not None:
+                self._save()
+
+    def load_due(self, name: str):
+        with self._lock:
+            return self._load()["timers"].get(name)
+
+    def store_due(self, name: str, due: float, previous) -> float:
+        with self._lock:
+            timers = self._load()["timers"]
+            if timers.get(name) == previous:
+                timers[name] = due
+                self._save()
+            return timers[name]
+
+    def release(self):
+        pass
+
+
+class LeaseCoordinator:
+    """
+    Leader election over a lease row in the shared store. The leader renews
+    every LEADER_LEASE_SECONDS / 3; if it dies, another worker takes over once
+    the lease expires. The lease decides who *tries* to run scheduled jobs;
+    claim_job (a unique row per job key) is what makes each run happen once,
+    even across a leadership handover.
+    """
+
+    def __init__(self, store: SharedStore, worker_id: str, lease_seconds: float,
+                 name: str = "scheduler"):
+        self.store = store
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.name = name
+        self.is_leader = False
+
+    def renew(self) -> bool:
+        try:
+            leader = self.store.acquire_lease(self.name, self.worker_id, self.lease_seconds)
+        except sqlite3.Error as e:
+            logger.error("Lease renewal failed: %s", e)
+            leader = False
+        if leader != self.is_leader:
+            state = "is now the leader" if leader else "lost leadership"
+            logger.info("Worker %s %s", self.worker_id, state)
+        self.is_leader = leader
+        return leader
+
+    def claim_job(self, job_key: str) -> bool:
+        return self.store.claim_job(job_key, self.worker_id)
+
+    def claim_jobs(self, job_keys) -> set:
+        return self.store.claim_jobs(job_keys, self.worker_id)
+
+    def release_job(self, job_key: str):
+        try:
+            self.store.release_job(job_key, self.worker_id)
+        except sqlite3.Error as e:
+            logger.error("Could not release claim %s: %s", job_key, e)
+
+    def job_ran(self, job_key: str) -> bool:
+        return self.store.job_ran(job_key)
+
+    def load_due(self, name: str):
+        return self.store.load_due(name)
+
+    def store_due(self, name: str, due: float, previous) -> float:
+        return self.store.store_due(name, due, previous)
+
+    def release(self):
+        if self.is_leader:
+            self.is_leader = False
+            try:
+                self.store.release_lease(self.name, self.worker_id)
+            except sqlite3.Error as e:
+                logger.error("Could not release lease: %s", e)
+
+
+COORDINATOR = (
+    LeaseCoordinator(SHARED_STORE, WORKER_ID, LEADER_LEASE_SECONDS)
+    if SHARED_STORE
+    else LocalCoordinator(SCHEDULE_FILE)
+)
+
+
+async def renew_leadership(context: ContextTypes.DEFAULT_TYPE):
+    """Job that keeps (or takes over) the scheduler lease."""
+    await asyncio.to_thread(COORDINATOR.renew)
@@ -0,0 +1,168 @@
+"""Settings read from environment variables."""
+
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+BOT_USERNAME = os.getenv("BOT_USERNAME", "")  # e.g. SporeLoreBot (NO @)
+
+# Owner (bot creator) – excluded from weekly prize
+OWNER_USER_ID = int(os.getenv("OWNER_USER_ID", "0"))
+
+# GM (good morning) config
+GM_CHAT_ID = int(os.getenv("GM_CHAT_ID", "0"))  # Telegram chat ID for GM messages
+
+# UTC window for when GM can fire (here: 14–15 = 2–3pm UTC)
+GM_WINDOW_START_HOUR_UTC = int(os.getenv("GM_WINDOW_START_HOUR_UTC", "14"))
+GM_WINDOW_END_HOUR_UTC = int(os.getenv("GM_WINDOW_END_HOUR_UTC", "15"))
+
+# How GM times are picked: "window" (random minute in the GM window) or
+# "peak" (shortly before the chat's busiest hour that day, from the activity
+# heatmap; falls back to the window until GM_PEAK_MIN_MESSAGES were seen).
+# chats.json can set "gm_mode" per chat.
+GM_MODE = os.getenv("GM_MODE", "window").strip().lower()
+GM_PEAK_LEAD_MINUTES = min(60, int(os.getenv("GM_PEAK_LEAD_MINUTES", "30")))
+GM_PEAK_MIN_MESSAGES = int(os.getenv("GM_PEAK_MIN_MESSAGES", "200"))
+
+# Weeks of hour-of-week message counts behind the /activity heatmap and peak GMs
+HEATMAP_WEEKS = int(os.getenv("HEATMAP_WEEKS", "4"))
+
+# Per-chat config table (GM window, timezone, knowledge, tokens, exclusions).
+# If the file doesn't exist, GM_CHAT_ID + the GM window env vars define one chat.
+CHATS_CONFIG_FILE = os.getenv("CHATS_CONFIG_FILE", "chats.json")
+
+# How often (seconds) the timer wheel checks for due GM / weekly tasks
+TIMER_TICK_SECONDS = int(os.getenv("TIMER_TICK_SECONDS", "20"))
+
+# Bot API endpoint (override to point at a local fake Telegram server)
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "https://api.telegram.org/bot")
+
+# Update intake: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+
+# Webhook mode config
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # public URL registered with Telegram (empty = don't register)
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "256"))
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", str(1024 * 1024)))
+
+# Outbound send limits (Telegram: ~30 msg/s overall, 20 msg/min per group, 1 msg/s per private chat)
+SEND_GLOBAL_PER_SEC = float(os.getenv("SEND_GLOBAL_PER_SEC", "25"))
+SEND_GROUP_PER_MIN = int(os.getenv("SEND_GROUP_PER_MIN", "20"))
+SEND_PRIVATE_PER_SEC = float(os.getenv("SEND_PRIVATE_PER_SEC", "1"))
+SEND_MAX_IN_FLIGHT = int(os.getenv("SEND_MAX_IN_FLIGHT", "8"))
+
+# Max updates processed concurrently (1 = strictly one at a time)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "16"))
+
+# Multi-worker mode: every instance pointed at the same SQLite file shares
+# activity counts and the price cache, and only the lease holder (leader)
+# fires GM / weekly winner. Empty = single instance, activity in a local file.
+SHARED_STORE_PATH = os.getenv("SHARED_STORE_PATH", "")
+WORKER_ID = os.getenv("WORKER_ID", "") or f"{socket.gethostname()}:{os.getpid()}"
+LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", "30"))
+
+# Let several workers bind the same webhook port (Linux SO_REUSEPORT)
+WEBHOOK_REUSE_PORT = os.getenv("WEBHOOK_REUSE_PORT", "0") == "1"
+
+# How long (seconds) fetched prices are reused before hitting CoinGecko again
+PRICE_CACHE_SECONDS = int(os.getenv("PRICE_CACHE_SECONDS", "30"))
+
+# Fiat currencies prices can be quoted in besides USD (ETH, BTC and sats are
+# always available), and how long the USD -> fiat rates are reused
+FIAT_CURRENCIES = [c.strip().upper() for c in os.getenv("FIAT_CURRENCIES", "EUR,GBP,JPY,CAD,AUD,CHF,INR").split(",") if c.strip()]
+FX_CACHE_SECONDS = int(os.getenv("FX_CACHE_SECONDS", "3600"))
+
+# /chart: prices are sampled every CHART_SAMPLE_SECONDS (0 = off) into
+# CHART_HISTORY_FILE, and charts are drawn by CHART_WORKERS processes with
+# at most CHART_QUEUE_SIZE renders queued or running
+CHART_SAMPLE_SECONDS = int(os.getenv("CHART_SAMPLE_SECONDS", "300"))
+CHART_HISTORY_FILE = os.getenv("CHART_HISTORY_FILE", "price_history.json")
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "1"))
+CHART_QUEUE_SIZE = int(os.getenv("CHART_QUEUE_SIZE", "4"))
+
+# Weekly digest (Sunday 23:59 UTC, every chat with a weekly prize): how
+# many top chatters it lists, and how many threads compute chats' results
+WEEKLY_TOP_N = int(os.getenv("WEEKLY_TOP_N", "5"))
+WEEKLY_DIGEST_WORKERS = max(1, int(os.getenv("WEEKLY_DIGEST_WORKERS", "4")))
+
+# Next GM / weekly due times and which runs already happened (single instance;
+# multi-worker mode keeps these in the shared store), so restarts catch up
+SCHEDULE_FILE = os.getenv("SCHEDULE_FILE", "schedule.json")
+
+# How late (seconds) a missed task may still be caught up, e.g. after a restart;
+# older ones are skipped. The weekly winner gets longer than a GM.
+TIMER_MAX_LATE_SECONDS = int(os.getenv("TIMER_MAX_LATE_SECONDS", "3600"))
+WEEKLY_MAX_LATE_SECONDS = int(os.getenv("WEEKLY_MAX_LATE_SECONDS", str(2 * 24 * 3600)))
+
+# Shutdown (SIGTERM / SIGINT): how long in-flight updates, timer tasks and
+# queued replies get to finish before the rest is abandoned. Keep it below
+# the orchestrator's kill timeout (Docker's default is 10s).
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "8"))
+
+# How many recent update_ids are remembered to drop re-delivered updates
+UPDATE_DEDUPE_WINDOW = int(os.getenv("UPDATE_DEDUPE_WINDOW", "5000"))
+
+# Inline queries: results are cached per normalized query for
+# INLINE_CACHE_SECONDS here and on Telegram's side (cache_time)
+INLINE_CACHE_SECONDS = float(os.getenv("INLINE_CACHE_SECONDS", "30"))
+INLINE_CACHE_SIZE = int(os.getenv("INLINE_CACHE_SIZE", "1000"))
+INLINE_MAX_RESULTS = min(50, int(os.getenv("INLINE_MAX_RESULTS", "10")))
+
+# Link / team questions ("website?", "who's the dev?") are answered straight
+# from links.md / team-and-roles.md when at least INTENT_MIN_CONFIDENCE of
+# the question matches known keywords; everything else goes to the LLM
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "1") == "1"
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.75"))
+
+# Flood guard (ahead of activity counting and LLM replies): a text of at least
+# FLOOD_DUPLICATE_MIN_CHARS posted more than FLOOD_DUPLICATE_LIMIT times within
+# FLOOD_WINDOW_SECONDS, or a user sending more than FLOOD_USER_BURST messages
+# per FLOOD_BURST_SECONDS, is dropped. A chat above FLOOD_CHAT_BURST messages
+# per FLOOD_BURST_SECONDS still counts activity but gets no LLM replies.
+FLOOD_GUARD_ENABLED = os.getenv("FLOOD_GUARD", "1") == "1"
+FLOOD_WINDOW_SECONDS = float(os.getenv("FLOOD_WINDOW_SECONDS", "60"))
+FLOOD_DUPLICATE_LIMIT = int(os.getenv("FLOOD_DUPLICATE_LIMIT", "3"))
+FLOOD_DUPLICATE_MIN_CHARS = int(os.getenv("FLOOD_DUPLICATE_MIN_CHARS", "20"))
+FLOOD_BURST_SECONDS = float(os.getenv("FLOOD_BURST_SECONDS", "10"))
+FLOOD_USER_BURST = int(os.getenv("FLOOD_USER_BURST", "8"))
+FLOOD_CHAT_BURST = int(os.getenv("FLOOD_CHAT_BURST", "60"))
+FLOOD_MAX_TRACKED = int(os.getenv("FLOOD_MAX_TRACKED", "500"))
+FLOOD_MAX_CHATS = int(os.getenv("FLOOD_MAX_CHATS", "10000"))
+
+# Logging: default level, "text" or "json" records, per-module overrides
+# (e.g. "spore.prices=DEBUG,spore.webhook=WARNING") and sampling for
+# high-frequency events as "<sample key>=<keep 1 in N>" (e.g. "activity=100")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "activity=100")
+
+
+def check_config() -> bool:
+    """Report missing / invalid settings; False if the bot can't start."""
+    ok = True
+    if not TELEGRAM_TOKEN:
+        logger.error("TELEGRAM_BOT_TOKEN env var is not set.")
+        ok = False
+    if not OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY env var is not set.")
+        ok = False
+    if not BOT_USERNAME:
+        logger.error("BOT_USERNAME env var is not set.")
+        ok = False
+    if BOT_MODE not in ("polling", "webhook"):
+        logger.error("Unknown BOT_MODE %r (expected polling or webhook).", BOT_MODE)
+        ok = False
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        logger.error("WEBHOOK_SECRET env var is not set (required in webhook mode).")
+        ok = False
+    return ok
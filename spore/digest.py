@@ -0,0 +1,203 @@
+"""
+Weekly digest: winner, lifetime wins, top chatters and message totals for
+every chat with a weekly prize, from one read of the activity store.
+
+Safe to run again for the same week (after a crash or a failed attempt):
+a chat's win is recorded together with a "_won:<week>" marker bucket, so
+it's never counted twice, and each announcement is claimed before it's
+sent, so it goes out at most once. Chats that were fully done have had
+their week dropped and are skipped; a chat whose announcement failed
+gives its claim back and keeps its week for the next attempt.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+
+from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
+
+from .config import WEEKLY_DIGEST_WORKERS, WEEKLY_TOP_N
+from .cluster import COORDINATOR
+from .sender import PRIORITY_BROADCAST, SENDER
+from .chats import CHAT_CONFIGS, ChatConfig
+from .activity import ACTIVITY_STORE
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Bucket marking a chat whose win for the week is already recorded
+WON_BUCKET_PREFIX = "_won:"
+
+
+class ChatDigest:
+    """One chat's week: eligible top chatters as (count, user_id, handle), plus totals."""
+
+    __slots__ = ("chat", "week", "top", "total_messages", "chatters", "winner_id", "winner_handle", "wins")
+
+    def __init__(self, chat: ChatConfig, week: dict, top: list, total_messages: int):
+        self.chat = chat
+        self.week = week
+        self.top = top
+        self.total_messages = total_messages
+        self.chatters = len(week)
+        _, self.winner_id, self.winner_handle = top[0]
+        self.wins = 0
+
+
+def announcement_key(chat: ChatConfig, week_key: str) -> str:
+    """Claim for one chat's announcement (the key the per-chat weekly job used)."""
+    return f"weekly:{chat.chat_id}:{week_key}"
+
+
+def compute_digest(chat: ChatConfig, week: dict, top_n: int = WEEKLY_TOP_N):
+    """
+    Digest for one chat's week bucket, or None without eligible chatters
+    (the owner and the chat's excluded users can't win or place).
+    """
+    if not week:
+        return None
+    eligible = [
+        (entry["count"], user_id, entry.get("handle") or f"user {user_id}")
+        for user_id, entry in week.items()
+        if user_id not in chat.excluded_user_ids and entry["count"]
+    ]
+    if not eligible:
+        return None
+    # Ties go to the lower user id, so a retry picks the same winner
+    top = heapq.nsmallest(max(1, top_n), eligible, key=lambda e: (-e[0], int(e[1])))
+    return ChatDigest(chat, week, top, sum(entry["count"] for entry in week.values()))
+
+
+def _compute_batch(batch, top_n: int) -> list:
+    return [compute_digest(chat, week, top_n) for chat, week in batch]
+
+
+async def compute_digests(chats, weeks: dict, week_key: str, top_n: int = WEEKLY_TOP_N) -> list:
+    """Digests for all chats, computed in WEEKLY_DIGEST_WORKERS threads off the event loop."""
+    items = [(chat, weeks.get(str(chat.chat_id), {}).get(week_key)) for chat in chats]
+    batches = [items[i::WEEKLY_DIGEST_WORKERS] for i in range(WEEKLY_DIGEST_WORKERS)]
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_compute_batch, batch, top_n) for batch in batches if batch)
+    )
+    return [digest for batch in results for digest in batch if digest is not None]
+
+
+def digest_text(digest: ChatDigest) -> str:
+    weekly_count = digest.week.get(digest.winner_id, {}).get("count", 0)
+    if digest.wins == 1:
+        extra_line = (
+            "This is their *first* weekly crown — welcome to the mycelium hall of fame 🍄"
+        )
+    else:
+        extra_line = (
+            f"They've now won this weekly prize *{digest.wins}* times. "
+            "Certified chat fungus 🧠🍄"
+        )
+
+    lines = [
+        "🌱 Weekly Spore Activity Prize 🌱",
+        "",
+        f"Top chatter this week: {escape_markdown(digest.winner_handle)} with {weekly_count} messages.",
+        "",
+        extra_line,
+        "",
+        f"📊 {digest.total_messages} messages from {digest.chatters} chatters this week",
+    ]
+    if len(digest.top) > 1:
+        lines.append(f"🏆 Top {len(digest.top)}:")
+        lines += [
+            f"{rank}. {escape_markdown(handle)} — {count}"
+            for rank, (count, _, handle) in enumerate(digest.top, 1)
+        ]
+    return "\n".join(lines)
+
+
+async def _announce(context: ContextTypes.DEFAULT_TYPE, digest: ChatDigest) -> bool:
+    try:
+        await SENDER.send(
+            context.bot,
+            digest.chat.chat_id,
+            digest_text(digest),
+            parse_mode="Markdown",
+            priority=PRIORITY_BROADCAST,
+        )
+    except Exception as e:
+        logger.error("Error sending weekly digest to %s: %s", digest.chat.name, e)
+        return False
+    logger.info(
+        "Announced weekly winner for %s: %s (%d total wins)",
+        digest.chat.name, digest.winner_handle, digest.wins,
+    )
+    return True
+
+
+async def run_weekly_digest(context: ContextTypes.DEFAULT_TYPE, week_key: str, chats=None) -> dict:
+    """
+    Announce `week_key`'s winner in every chat with a weekly prize (default:
+    all configured chats): one read of the week for all chats, results
+    computed in parallel, one batch of win updates and one of claims, and
+    all announcements queued at once for the rate-limited sender.
+    Returns counts for the log; "failed" chats need another run.
+    """
+    started = time.perf_counter()
+    chats = [chat for chat in (CHAT_CONFIGS.values() if chats is None else chats) if chat.weekly_winner]
+    marker = WON_BUCKET_PREFIX + week_key
+
+    with TRACER.stage("weekly_digest"):
+        # Include this worker's buffered increments before reading the week
+        await asyncio.to_thread(ACTIVITY_STORE.flush)
+        weeks = await asyncio.to_thread(ACTIVITY_STORE.read_buckets, [chat.chat_id for chat in chats], [week_key])
+        digests = await compute_digests(chats, weeks, week_key)
+
+        sent = []
+        if digests:
+            # Wins first, written before anything is announced
+            recorded = await asyncio.to_thread(
+                ACTIVITY_STORE.record_wins,
+                marker,
+                [(d.chat.chat_id, d.winner_id, d.winner_handle) for d in digests],
+            )
+            await asyncio.to_thread(ACTIVITY_STORE.flush)
+            for digest in digests:
+                digest.winner_id, digest.winner_handle, digest.wins = recorded[str(digest.chat.chat_id)]
+
+            claimed = await asyncio.to_thread(
+                COORDINATOR.claim_jobs, [announcement_key(d.chat, week_key) for d in digests]
+            )
+            pending = [d for d in digests if announcement_key(d.chat, week_key) in claimed]
+            sent = await asyncio.gather(*(_announce(context, d) for d in pending))
+            failed = [d for d, ok in zip(pending, sent) if not ok]
+            for digest in failed:
+                await asyncio.to_thread(COORDINATOR.release_job, announcement_key(digest.chat, week_key))
+
+            # Done with the week: drop its counts and the win markers, so a
+            # retry skips these chats and next week starts fresh. Failed chats
+            # keep both, so the retry announces the same recorded winner.
+            failed_ids = {d.chat.chat_id for d in failed}
+            await asyncio.to_thread(
+                ACTIVITY_STORE.drop_buckets,
+                [
+                    (d.chat.chat_id, key)
+                    for d in digests
+                    if d.chat.chat_id not in failed_ids
+                    for key in (week_key, marker)
+                ],
+            )
+            await asyncio.to_thread(ACTIVITY_STORE.flush)
+
+    summary = {
+        "chats": len(chats),
+        "winners": len(digests),
+        "announced": sum(sent),
+        "already_announced": len(digests) - len(sent),
+        "failed": len(sent) - sum(sent),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(
+        "Weekly digest %s: %d chats, %d with a winner, %d announced, %d already announced, %d failed (%.3fs)",
+        week_key, summary["chats"], summary["winners"], summary["announced"],
+        summary["already_announced"], summary["failed"], summary["seconds"],
+    )
+    return summary
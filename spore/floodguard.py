@@ -0,0 +1,159 @@
+"""Ingress flood guard: shed copy-paste floods and message bursts before activity / LLM work."""
+
+import logging
+import time
+from collections import OrderedDict, deque
+
+from .config import (
+    FLOOD_CHAT_BURST,
+    FLOOD_DUPLICATE_LIMIT,
+    FLOOD_DUPLICATE_MIN_CHARS,
+    FLOOD_GUARD_ENABLED,
+    FLOOD_BURST_SECONDS,
+    FLOOD_MAX_CHATS,
+    FLOOD_MAX_TRACKED,
+    FLOOD_USER_BURST,
+    FLOOD_WINDOW_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Verdicts
+ALLOW = "allow"
+DUPLICATE = "duplicate"  # same text already posted FLOOD_DUPLICATE_LIMIT times in the window
+BURST = "burst"  # one user posting faster than FLOOD_USER_BURST per FLOOD_BURST_SECONDS
+
+
+def content_hash(text: str) -> int:
+    """Hash of the text with case and whitespace normalized (so trivial edits still match)."""
+    return hash(" ".join(text.lower().split()))
+
+
+class _ChatWindow:
+    """
+    Recent messages of one chat, oldest first: (time, content hash or None,
+    user id). Per-hash counts and per-user timestamps are kept alongside so a
+    check is O(1) apart from pruning what fell out of the window.
+    """
+
+    __slots__ = ("events", "hash_counts", "user_times", "recent")
+
+    def __init__(self):
+        self.events = deque()
+        self.hash_counts = {}
+        self.user_times = {}
+        self.recent = deque()  # accepted message times within FLOOD_BURST_SECONDS
+
+    def prune(self, now: float, window: float, burst_seconds: float, max_tracked: int):
+        cutoff = now - window
+        events = self.events
+        while events and (events[0][0] <= cutoff or len(events) > max_tracked):
+            _, digest, user_id = events.popleft()
+            if digest is not None:
+                left = self.hash_counts[digest] - 1
+                if left:
+                    self.hash_counts[digest] = left
+                else:
+                    del self.hash_counts[digest]
+            times = self.user_times.get(user_id)
+            if times and times[-1] <= cutoff:
+                del self.user_times[user_id]
+        recent_cutoff = now - burst_seconds
+        while self.recent and self.recent[0] <= recent_cutoff:
+            self.recent.popleft()
+
+
+class FloodGuard:
+    """
+    Per-chat rolling windows of content hashes and sender timestamps.
+
+    check() classifies one message:
+      - DUPLICATE: the same (normalized) text of at least
+        FLOOD_DUPLICATE_MIN_CHARS was already seen FLOOD_DUPLICATE_LIMIT
+        times in the last FLOOD_WINDOW_SECONDS, from anyone (copy-paste raid)
+      - BURST: this user already sent FLOOD_USER_BURST messages in the last
+        FLOOD_BURST_SECONDS
+      - ALLOW otherwise
+
+    Shed messages still enter the window, so a flood stays flagged for as
+    long as it continues. is_flooding() reports a chat taking more than
+    FLOOD_CHAT_BURST accepted messages per FLOOD_BURST_SECONDS; those
+    messages still count for activity but don't get LLM replies.
+
+    State is per process and bounded: at most FLOOD_MAX_TRACKED messages per
+    chat and FLOOD_MAX_CHATS chats (least recently active dropped first).
+    """
+
+    def __init__(
+        self,
+        window_seconds=FLOOD_WINDOW_SECONDS,
+        duplicate_limit=FLOOD_DUPLICATE_LIMIT,
+        duplicate_min_chars=FLOOD_DUPLICATE_MIN_CHARS,
+        burst_seconds=FLOOD_BURST_SECONDS,
+        user_burst=FLOOD_USER_BURST,
+        chat_burst=FLOOD_CHAT_BURST,
+        max_tracked=FLOOD_MAX_TRACKED,
+        max_chats=FLOOD_MAX_CHATS,
+        clock=time.monotonic,
+    ):
+        self.window_seconds = window_seconds
+        self.duplicate_limit = duplicate_limit
+        self.duplicate_min_chars = duplicate_min_chars
+        self.burst_seconds = burst_seconds
+        self.user_burst = user_burst
+        self.chat_burst = chat_burst
+        self.max_tracked = max_tracked
+        self.max_chats = max_chats
+        self.clock = clock
+        self._chats = OrderedDict()
+
+    def _window(self, chat_id, now) -> _ChatWindow:
+        window = self._chats.get(chat_id)
+        if window is None:
+            window = self._chats[chat_id] = _ChatWindow()
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        window.prune(now, self.window_seconds, self.burst_seconds, self.max_tracked)
+        return window
+
+    def check(self, chat_id, user_id, text: str) -> str:
+        now = self.clock()
+        window = self._window(chat_id, now)
+
+        digest = None
+        if len(text) >= self.duplicate_min_chars:
+            digest = content_hash(text)
+
+        verdict = ALLOW
+        if digest is not None and window.hash_counts.get(digest, 0) >= self.duplicate_limit:
+            verdict = DUPLICATE
+        else:
+            times = window.user_times.get(user_id)
+            if times is not None and len(times) >= self.user_burst and now - times[-self.user_burst] < self.burst_seconds:
+                verdict = BURST
+
+        window.events.append((now, digest, user_id))
+        if digest is not None:
+            window.hash_counts[digest] = window.hash_counts.get(digest, 0) + 1
+        times = window.user_times.get(user_id)
+        if times is None:
+            times = window.user_times[user_id] = deque(maxlen=self.user_burst)
+        times.append(now)
+        if verdict is ALLOW:
+            window.recent.append(now)
+        return verdict
+
+    def is_flooding(self, chat_id) -> bool:
+        """True while the chat is above FLOOD_CHAT_BURST accepted messages per FLOOD_BURST_SECONDS."""
+        window = self._chats.get(chat_id)
+        if window is None:
+            return False
+        cutoff = self.clock() - self.burst_seconds
+        while window.recent and window.recent[0] <= cutoff:
+            window.recent.popleft()
+        return len(window.recent) > self.chat_burst
+
+
+FLOOD_GUARD = FloodGuard() if FLOOD_GUARD_ENABLED else None
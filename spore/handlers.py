@@ -0,0 +1,297 @@
+"""Telegram update handlers: activity, mentions and commands."""
+
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from .config import BOT_USERNAME, INTENT_ROUTER_ENABLED, OWNER_USER_ID
+from .logs import set_correlation_id, update_correlation_id
+from .tracing import TRACER, format_stats
+from .llm import complete
+from .prompts import chat_messages, chat_prefix
+from .sender import SENDER
+from .prices import (
+    QUOTE_CURRENCIES,
+    build_price_line,
+    extract_price_request_tokens,
+    extract_quote_currency,
+    format_prices_message,
+    get_quotes,
+    parse_currency,
+)
+from .chats import get_chat_config
+from .activity import ACTIVITY_STORE, chat_heatmap, format_heatmap, increment_activity_for_message
+from .floodguard import ALLOW, FLOOD_GUARD
+from .intents import route_question
+
+logger = logging.getLogger(__name__)
+
+# Per-message debug lines are sampled (LOG_SAMPLE, keys "activity" / "flood")
+_SAMPLE_ACTIVITY = {"sample": "activity"}
+_SAMPLE_FLOOD = {"sample": "flood"}
+
+
+# --- Update intake handlers (dedupe + flood guard + activity) ---
+
+
+async def drop_duplicate_updates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Runs first for every update: stop handling an update_id that was already
+    processed (re-delivered after a crash or a webhook retry).
+    """
+    # Later handler groups, SENDER deliveries and to_thread calls for this
+    # update inherit the id, so its log lines can be tied together
+    set_correlation_id(update_correlation_id(update.update_id))
+    TRACER.count("updates")
+    if not await ACTIVITY_STORE.claim_update(update.update_id):
+        TRACER.count("duplicate_updates")
+        logger.info("Dropping duplicate update %s", update.update_id)
+        raise ApplicationHandlerStop
+
+
+async def guard_ingress(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Runs on text messages after dedupe: drop copy-paste floods and per-user
+    bursts (see floodguard.FloodGuard) before they are counted for the
+    weekly prize or reach the LLM.
+    """
+    msg = update.effective_message
+    if FLOOD_GUARD is None or msg.from_user is None or msg.from_user.id == OWNER_USER_ID:
+        return
+    verdict = FLOOD_GUARD.check(msg.chat_id, msg.from_user.id, msg.text)
+    if verdict is ALLOW:
+        return
+    TRACER.count(f"shed_{verdict}")
+    logger.info(
+        "Shedding %s message from user %s in chat %s", verdict, msg.from_user.id, msg.chat_id, extra=_SAMPLE_FLOOD
+    )
+    raise ApplicationHandlerStop
+
+
+async def track_activity(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler that runs on every text message to track activity."""
+    msg = update.effective_message
+    with TRACER.stage("track_activity"):
+        increment_activity_for_message(msg, update.update_id)
+    logger.debug("Counted message in chat %s", msg.chat_id, extra=_SAMPLE_ACTIVITY)
+
+
+# --- Core helpers ---
+
+
+def message_mentions_bot(message_text: str, entities, bot_username: str) -> bool:
+    """Return True if the message explicitly @mentions this bot."""
+    if not entities or not message_text:
+        return False
+
+    for ent in entities:
+        if ent.type == "mention":
+            mention_text = message_text[ent.offset : ent.offset + ent.length]
+            if mention_text.lstrip("@").lower() == bot_username.lower():
+                return True
+    return False
+
+
+async def handle_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    msg = update.message
+    if msg is None or msg.text is None:
+        return
+
+    text = msg.text
+
+    with TRACER.stage("mention_detection"):
+        # 1) Trigger on @mention
+        mentioned = message_mentions_bot(text, msg.entities, BOT_USERNAME)
+
+        # 2) Trigger if user is replying directly to the bot
+        is_reply_to_bot = (
+            msg.reply_to_message is not None
+            and msg.reply_to_message.from_user is not None
+            and msg.reply_to_message.from_user.id == context.bot.id
+        )
+
+    if not (mentioned or is_reply_to_bot):
+        return
+
+    # During a chat-wide flood the messages still count, but nobody gets an
+    # LLM reply (a raid pinging the bot would otherwise fan out completions)
+    if FLOOD_GUARD is not None and FLOOD_GUARD.is_flooding(msg.chat_id):
+        TRACER.count("shed_llm_flooding")
+        logger.info("Chat %s is flooding, not answering mention", msg.chat_id, extra=_SAMPLE_FLOOD)
+        return
+
+    with TRACER.stage("mention_total"):
+        await answer_mention(update, context, mentioned)
+
+
+async def answer_mention(update: Update, context: ContextTypes.DEFAULT_TYPE, mentioned: bool):
+    """Price line or LLM reply for a message that @mentions / replies to the bot."""
+    msg = update.message
+    text = msg.text
+
+    # Build the question we send to the LLM
+    if mentioned:
+        clean_question = text.replace(f"@{BOT_USERNAME}", "").strip()
+    else:
+        clean_question = text.strip()
+
+    if not clean_question:
+        clean_question = "They pinged you without any text. Say hi and explain what you can do."
+
+    user_handle = msg.from_user.username or msg.from_user.first_name
+    chat = get_chat_config(msg.chat_id)
+
+    # If they wrote /prices inside a mention, treat it as the /prices command
+    stripped = clean_question.strip()
+    if stripped.startswith("/prices"):
+        await prices(update, context)
+        return
+
+    # Natural-language price queries ("fungi price in eth" quotes FUNGI in ETH)
+    with TRACER.stage("extract_price_request_tokens"):
+        currency, price_question = extract_quote_currency(clean_question)
+        requested_symbols = extract_price_request_tokens(price_question, chat.token_symbols())
+    if requested_symbols:
+        with TRACER.stage("price_line"):
+            price_line = await asyncio.to_thread(build_price_line, requested_symbols, currency or "USD")
+        if price_line:
+            reply = f"@{user_handle} {price_line}"
+        else:
+            reply = f"@{user_handle} I can’t fetch prices for those spores rn. Try /prices."
+        with TRACER.stage("reply_text"):
+            await SENDER.reply(msg, reply, mergeable=True)
+        return
+
+    # Link / team questions straight from the knowledge files, no LLM call
+    if INTENT_ROUTER_ENABLED:
+        with TRACER.stage("intent_route"):
+            answer = route_question(clean_question, chat.knowledge)
+        if answer is not None:
+            TRACER.count("intent_answers")
+            with TRACER.stage("reply_text"):
+                await SENDER.reply(msg, f"@{user_handle} {answer}", mergeable=True)
+            return
+
+    # Prebuilt persona + knowledge prefix, identical for every call in this chat
+    prefix = chat_prefix(chat.knowledge)
+
+    try:
+        with TRACER.stage("completion"):
+            reply_text = await asyncio.to_thread(
+                complete,
+                chat_messages(prefix, user_handle, clean_question),
+                max_tokens=250,
+                temperature=0.8,
+                purpose="chat",
+                cache_key=prefix.cache_key,
+            )
+        reply_text = reply_text.strip()
+    except Exception as e:
+        logger.error("OpenAI error: %s", e)
+        reply_text = "My spores are clogged rn, try again in a bit."
+
+    with TRACER.stage("reply_text"):
+        await SENDER.reply(msg, f"@{user_handle} {reply_text}", mergeable=True)
+
+
+# --- /prices command handler (full market view) ---
+
+
+def _prices_currency(text: str):
+    """Quote currency from "/prices eth" or "/prices in eur"; USD without one, None if unknown."""
+    args = (text or "").split("/prices", 1)[-1].split(maxsplit=1)
+    if args and args[0].startswith("@"):  # /prices@SporeLoreBot eth
+        args = args[1:]
+    if not args:
+        return "USD"
+    currency, _ = extract_quote_currency(" ".join(args))
+    return currency or parse_currency(args[0].split()[0])
+
+
+async def prices(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show current prices and 24h changes, optionally quoted in another currency (/prices eth)."""
+    msg = update.effective_message
+    if msg is None:
+        return
+
+    currency = _prices_currency(msg.text)
+    if currency is None:
+        await SENDER.reply(msg, f"I can quote prices in {', '.join(QUOTE_CURRENCIES)}, e.g. /prices eth")
+        return
+
+    data = await asyncio.to_thread(get_quotes, currency)
+    if data is None:
+        await SENDER.reply(msg, f"Can't get the {currency} rate rn, try /prices for USD.")
+        return
+    if not data:
+        await SENDER.reply(msg, "Could not fetch prices rn, spores are tired.")
+        return
+
+    text = format_prices_message(data, get_chat_config(msg.chat_id).token_symbols(), currency)
+    await SENDER.reply(msg, text, parse_mode="Markdown")
+
+
+# --- /chatid command (for retrieving Telegram chat ID) ---
+
+
+async def chatid(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    await SENDER.reply(update.message, f"Chat ID: {chat_id}")
+
+
+# --- /whoami command (to get your numeric Telegram user id) ---
+
+
+async def whoami(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    handle = f"@{user.username}" if user.username else user.first_name
+    await SENDER.reply(
+        update.message,
+        f"Handle: {handle}\nYour Telegram user ID: {user.id}",
+    )
+
+
+# --- /activity command (hour-of-week heatmap for this chat) ---
+
+
+async def activity_heatmap(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    msg = update.effective_message
+    chat = get_chat_config(msg.chat_id)
+    if not (chat.weekly_winner or chat.gm_enabled):
+        await SENDER.reply(msg, "I don't track activity in this chat.")
+        return
+
+    rows = await asyncio.to_thread(chat_heatmap, chat)
+    text = format_heatmap(rows, str(chat.timezone))
+    if chat.gm_enabled and chat.gm_mode == "peak":
+        text += "\nGM: shortly before the day's busiest hour"
+    await SENDER.reply(msg, f"```\n{text}\n```", parse_mode="Markdown")
+
+
+# --- /stats command (owner only: stage latencies since start) ---
+
+
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if user is None or OWNER_USER_ID == 0 or user.id != OWNER_USER_ID:
+        return
+
+    send = SENDER.snapshot_stats()
+    text = (
+        f"{format_stats(TRACER.snapshot())}\n\n"
+        f"send queue: depth {send['depth']}, wait avg {send['wait_avg_s'] * 1000:.0f} ms "
+        f"/ max {send['wait_max_s'] * 1000:.0f} ms, {send['retry_after']} flood waits, "
+        f"{send['failed']} failed"
+    )
+    await SENDER.reply(update.message, f"```\n{text}\n```", parse_mode="Markdown")
+
+
+# --- Error handler ---
+
+
+async def on_handler_error(update: object, context: ContextTypes.DEFAULT_TYPE):
+    """Count and log exceptions that escaped a handler."""
+    TRACER.count("handler_errors")
+    logger.error("Unhandled error in handler", exc_info=context.error)
@@ -0,0 +1,165 @@
+"""Inline queries (`@SporeLoreBot fungi`): price cards and knowledge snippets, cached per query."""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import ContextTypes
+
+from .config import INLINE_CACHE_SECONDS, INLINE_CACHE_SIZE, INLINE_MAX_RESULTS
+from .knowledge import KNOWLEDGE_STORE
+from .prices import (
+    TOKEN_CONFIG,
+    extract_quote_currency,
+    format_change,
+    format_price,
+    format_prices_message,
+    get_quotes,
+    match_price_tokens,
+)
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Telegram caps an inline result's description; longer snippets are cut here
+_DESCRIPTION_CHARS = 120
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive cache key: ' FUNGI  price' -> 'fungi price'."""
+    return " ".join(query.lower().split())
+
+
+class InlineResultCache:
+    """
+    Results per normalized query for INLINE_CACHE_SECONDS, least recently
+    used dropped beyond INLINE_CACHE_SIZE. Entries also remember the
+    knowledge snapshot they were built from, so a knowledge reload
+    invalidates lore results without waiting for the TTL.
+    """
+
+    def __init__(self, ttl: float = INLINE_CACHE_SECONDS, size: int = INLINE_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict()
+
+    def get(self, key: str, content_hash: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, entry_hash, results = entry
+        if expires_at < time.monotonic() or entry_hash != content_hash:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def put(self, key: str, content_hash: str, results):
+        self._entries[key] = (time.monotonic() + self.ttl, content_hash, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+INLINE_CACHE = InlineResultCache()
+
+
+def _result_id(*parts: str) -> str:
+    """Stable id (Telegram allows up to 64 bytes), so its client cache can dedupe too."""
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def price_results(query: str, prices: dict, currency: str = "USD") -> list:
+    """A card per token named in the query; all tokens plus the market view for an empty query."""
+    symbols = match_price_tokens(query) if query else list(TOKEN_CONFIG)
+    results = []
+    if not query:
+        results.append(
+            InlineQueryResultArticle(
+                id=_result_id("prices", "all", currency),
+                title=f"📊 All spore prices ({currency})",
+                description=", ".join(symbols),
+                input_message_content=InputTextMessageContent(
+                    format_prices_message(prices, symbols, currency), parse_mode="Markdown"
+                ),
+            )
+        )
+    for symbol in symbols:
+        info = prices.get(symbol)
+        if not info or info["price"] is None:
+            continue
+        emoji, change_str = format_change(info["change"])
+        price_str = format_price(info["price"], currency)
+        results.append(
+            InlineQueryResultArticle(
+                id=_result_id("price", symbol, currency),
+                title=f"{emoji} {symbol} {price_str}",
+                description=f"{info['label']}, {change_str} 24h",
+                input_message_content=InputTextMessageContent(
+                    f"{emoji} *{info['label']}* ({symbol}): {price_str}  ({change_str})", parse_mode="Markdown"
+                ),
+            )
+        )
+    return results
+
+
+def lore_results(query: str, limit: int) -> list:
+    """Best-matching knowledge chunks (BM25 over the knowledge index) as plain-text snippets."""
+    index = KNOWLEDGE_STORE.snapshot.index
+    if not query or index is None or limit <= 0:
+        return []
+    results = []
+    for _, name, heading, text in index.search(query, limit=limit):
+        body = text.strip()
+        description = " ".join(body.split())
+        if len(description) > _DESCRIPTION_CHARS:
+            description = description[: _DESCRIPTION_CHARS - 1] + "…"
+        results.append(
+            InlineQueryResultArticle(
+                id=_result_id("lore", name, heading, body[:64]),
+                # Chunks before a file's first heading have none
+                title=f"🍄 {heading or description[:60]}",
+                description=description,
+                # Knowledge text is free-form markdown; send it unparsed
+                input_message_content=InputTextMessageContent(f"{heading}\n\n{body}" if heading else body),
+            )
+        )
+    return results
+
+
+def build_inline_results(query: str) -> list:
+    """Price cards first, then lore snippets, up to INLINE_MAX_RESULTS (runs in a worker thread)."""
+    results = []
+    # "fungi in eth" -> FUNGI quoted in ETH
+    currency, price_query = extract_quote_currency(query)
+    currency = currency or "USD"
+    prices = get_quotes(currency)
+    if prices:
+        results = price_results(price_query.strip(), prices, currency)
+    results += lore_results(query, INLINE_MAX_RESULTS - len(results))
+    return results[:INLINE_MAX_RESULTS]
+
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Answer an inline query from our cache or freshly built results. The
+    same cache_time lets Telegram serve repeats without asking us at all
+    (results aren't personal, so one cached answer fits every user).
+    Inline mode has to be enabled for the bot in @BotFather (/setinline).
+    """
+    query = normalize_query(update.inline_query.query)
+    content_hash = KNOWLEDGE_STORE.snapshot.content_hash
+    results = INLINE_CACHE.get(query, content_hash)
+    if results is None:
+        TRACER.count("inline_cache_miss")
+        with TRACER.stage("inline_build"):
+            results = await asyncio.to_thread(build_inline_results, query)
+        INLINE_CACHE.put(query, content_hash, results)
+    else:
+        TRACER.count("inline_cache_hit")
+
+    with TRACER.stage("inline_answer"):
+        await update.inline_query.answer(results, cache_time=int(INLINE_CACHE_SECONDS), is_personal=False)
@@ -0,0 +1,215 @@
+"""
+Zero-LLM answers for link and team questions ("website?", "fungi twitter",
+"who's the dev?"), straight from links.md and team-and-roles.md.
+
+Each link and each team section becomes one answer with a set of keywords
+(its label or heading plus common synonyms). A question is scored
+against them TF-IDF style; only short, on-topic questions are answered
+here, everything else goes to the LLM.
+"""
+
+import math
+import re
+
+from .config import INTENT_MIN_CONFIDENCE
+from .knowledge import KNOWLEDGE_STORE, KnowledgeSnapshot
+from .prices import TOKEN_CONFIG
+
+LINKS_FILE = "links.md"
+TEAM_FILE = "team-and-roles.md"
+
+# Extra words people use for a link whose label contains the key
+LINK_SYNONYMS = {
+    "website": ("website", "site", "web", "homepage", "url"),
+    "app": ("app", "dashboard", "dapp", "inscription", "inscriptions"),
+    "twitter": ("twitter", "x", "tweet", "tweets", "social"),
+    "whitepaper": ("whitepaper", "litepaper", "paper", "wp", "doc"),
+    "basescan": ("basescan", "contract", "ca", "address", "explorer", "scan"),
+    "github": ("github", "git", "repo", "code", "source"),
+    "dextools": ("dextools", "dex", "chart", "charts"),
+    "gecko": ("coingecko", "gecko", "cg"),
+    "bubble": ("bubblemaps", "bubblemap", "bubble", "holders"),
+}
+
+# Same for team sections whose heading contains the key
+TEAM_SYNONYMS = {
+    "owner": ("owner", "founder", "creator", "dev", "developer", "builder", "built", "made", "created", "team", "rj"),
+    "moderator": ("mod", "moderator", "admin", "team"),
+}
+
+# Filler that says nothing about which answer is wanted
+STOPWORDS = frozenset(
+    """
+    a an and any anyone are at bro can check do does drop fam find for fren frens from get give gm got guys
+    has have hey hi i in is it its know link links look looking me my need of official on or our pls please
+    plz s see send ser share spore the their there this to u ur want what whats where wheres which who whos
+    ya yo you your
+    """.split()
+)
+
+# Words that make a question open-ended: those always go to the LLM
+OPEN_ENDED = frozenset(
+    """
+    why how explain tell think opinion story history happened happen when will should would could
+    difference compare vs mean means meaning lore legit safe scam rug
+    """.split()
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_LINK_RE = re.compile(r"^\s*[-*]\s*\*\*(?P<label>[^*]+?):?\*\*:?\s*(?P<url>https?://\S+)")
+_HANDLE_RE = re.compile(r"Handle:\s*(@\w+)")
+_ROLE_RE = re.compile(r"Role:\s*(.+)")
+_EMOJI_PREFIX_RE = re.compile(r"^[^\w(]+")
+
+
+def _terms(text: str) -> list[str]:
+    """Lowercased words, crude plural folding ("mods" -> "mod", "websites" -> "website")."""
+    words = _WORD_RE.findall(text.lower().replace("'s", ""))
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+
+
+class Answer:
+    __slots__ = ("file", "text", "keywords")
+
+    def __init__(self, file: str, text: str, keywords):
+        self.file = file
+        self.text = text
+        self.keywords = frozenset(keywords)
+
+
+def _keywords(text: str, synonyms: dict):
+    words = {t for t in _terms(text) if t not in STOPWORDS}
+    lowered = text.lower()
+    for key, extra in synonyms.items():
+        if key in lowered:
+            words.update(_terms(" ".join(extra)))
+    return words
+
+
+def parse_links(sections) -> list[Answer]:
+    """One answer per "- **Label:** https://..." line in links.md."""
+    answers = []
+    for heading, body in sections:
+        emoji = heading.split(" ", 1)[0] if _EMOJI_PREFIX_RE.match(heading) else "🔗"
+        for line in body.splitlines():
+            match = _LINK_RE.match(line)
+            if match is None:
+                continue
+            label, url = match.group("label").strip(), match.group("url")
+            # Label only: heading words ("Official Websites") would tie every link in the section
+            answers.append(Answer(LINKS_FILE, f"{emoji} {label}: {url}", _keywords(label, LINK_SYNONYMS)))
+    return answers
+
+
+def parse_team(sections) -> list[Answer]:
+    """One answer per team-and-roles.md section that lists handles: "Moderators: @a (role), @b (role)"."""
+    answers = []
+    for heading, body in sections:
+        people = []
+        for line in body.splitlines():
+            handle = _HANDLE_RE.search(line)
+            if handle:
+                people.append([handle.group(1), None])
+                continue
+            role = _ROLE_RE.search(line)
+            if role and people and people[-1][1] is None:
+                # First clause only: "Community moderator & chat guardian. Creator of ..." -> the former
+                people[-1][1] = role.group(1).strip().split(". ")[0].rstrip(".*")
+        if not people:
+            continue
+        who = ", ".join(f"{handle} ({role})" if role else handle for handle, role in people)
+        answers.append(Answer(TEAM_FILE, f"{heading}: {who}", _keywords(heading, TEAM_SYNONYMS)))
+    return answers
+
+
+class IntentRouter:
+    """
+    Answers for one knowledge snapshot. Keyword weights are inverse
+    document frequencies over all answers, so "twitter" (five links) counts
+    less than "whitepaper" (one).
+    """
+
+    def __init__(self, answers: list):
+        self.answers = answers
+        df = {}
+        for answer in answers:
+            for word in answer.keywords:
+                df[word] = df.get(word, 0) + 1
+        n = max(1, len(answers))
+        self.idf = {word: math.log(n / count) + 1.0 for word, count in df.items()}
+        # Unknown words weigh like the rarest keyword: one of them in a short
+        # question is enough to drop below the confidence threshold
+        self.unknown_weight = math.log(n) + 1.0
+        # Token names only narrow a match down ("fungi twitter"), never make one
+        self.qualifiers = frozenset(_terms(" ".join(f"{s} {c['label']}" for s, c in TOKEN_CONFIG.items())))
+
+    @classmethod
+    def from_snapshot(cls, snapshot: KnowledgeSnapshot) -> "IntentRouter":
+        answers = []
+        links = snapshot.files.get(LINKS_FILE)
+        if links is not None:
+            answers += parse_links(links.sections)
+        team = snapshot.files.get(TEAM_FILE)
+        if team is not None:
+            answers += parse_team(team.sections)
+        return cls(answers)
+
+    def classify(self, question: str, files=None):
+        """
+        (confidence, [answers]) for the best-scoring answers, restricted to
+        `files` (None = all); (0.0, []) when nothing matches or the question
+        is open-ended. Confidence is the share of the question's weight
+        that matched: 1.0 means every meaningful word is a known keyword.
+        """
+        words = [w for w in _terms(question) if w not in STOPWORDS]
+        if not words or any(w in OPEN_ENDED for w in words):
+            return 0.0, []
+
+        total = sum(self.idf.get(w, self.unknown_weight) for w in words)
+        best, best_score = [], 0.0
+        for answer in self.answers:
+            if files is not None and answer.file not in files:
+                continue
+            matched = [w for w in set(words) if w in answer.keywords]
+            if not matched or all(w in self.qualifiers for w in matched):
+                continue
+            score = sum(self.idf[w] for w in matched)
+            if score > best_score + 1e-9:
+                best, best_score = [answer], score
+            elif abs(score - best_score) <= 1e-9:
+                best.append(answer)
+        if not best:
+            return 0.0, []
+        known = sum(self.idf[w] for w in words if w in self.idf)
+        return known / total, best
+
+
+_router = (None, None)  # (content hash, IntentRouter)
+
+
+def current_router() -> IntentRouter:
+    """Router for the current knowledge snapshot, rebuilt after a reload."""
+    global _router
+    snap = KNOWLEDGE_STORE.snapshot
+    content_hash, router = _router
+    if content_hash != snap.content_hash:
+        router = IntentRouter.from_snapshot(snap)
+        _router = (snap.content_hash, router)
+    return router
+
+
+# More equally good answers than this means the question was too vague
+MAX_ANSWERS = 6
+
+# Link questions are short; anything longer goes to the LLM untokenized
+MAX_QUESTION_CHARS = 200
+
+
+def route_question(question: str, files=None):
+    """Reply text for a confident link / team question, else None (ask the LLM)."""
+    if len(question) > MAX_QUESTION_CHARS:
+        return None
+    confidence, answers = current_router().classify(question, files)
+    if confidence < INTENT_MIN_CONFIDENCE or not answers or len(answers) > MAX_ANSWERS:
+        return None
+    return "\n".join(answer.text for answer in answers)
@@ -0,0 +1,479 @@
+"""Knowledge base: markdown files under knowledge/, hot-reloaded, with a persisted search index."""
+
+import asyncio
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import Counter
+
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+
+# --- Knowledge store (hot-reloaded from /knowledge) ---
+
+KNOWLEDGE_DIR = "knowledge"
+
+# How often (seconds) the knowledge folder is polled for changes
+KNOWLEDGE_POLL_SECONDS = int(os.getenv("KNOWLEDGE_POLL_SECONDS", "30"))
+
+EMPTY_KNOWLEDGE_TEXT = "No knowledge files yet. Add .md files under the knowledge/ folder."
+
+# Persisted chunk/term index, rebuilt only when the knowledge content hash changes
+KNOWLEDGE_INDEX_FILE = os.getenv("KNOWLEDGE_INDEX_FILE", "knowledge_index.bin")
+
+# Target size (characters) of one indexed knowledge chunk
+KNOWLEDGE_CHUNK_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", "800"))
+
+
+def split_markdown_sections(content: str) -> list[tuple[str, str]]:
+    """
+    Split a markdown document into (heading, body) pairs.
+    Text before the first heading is returned under an empty heading.
+    """
+    sections = []
+    heading = ""
+    body = []
+    for line in content.splitlines():
+        if line.startswith("#"):
+            if heading or any(l.strip() for l in body):
+                sections.append((heading, "\n".join(body).strip()))
+            heading = line.lstrip("#").strip()
+            body = []
+        else:
+            body.append(line)
+    if heading or any(l.strip() for l in body):
+        sections.append((heading, "\n".join(body).strip()))
+    return sections
+
+
+class KnowledgeFile:
+    """Derived artifacts for a single knowledge file."""
+
+    __slots__ = ("name", "mtime_ns", "size", "content", "sha256", "sections")
+
+    def __init__(self, name, mtime_ns, size, content):
+        self.name = name
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.content = content
+        self.sha256 = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self.sections = split_markdown_sections(content)
+
+
+class KnowledgeSnapshot:
+    """
+    Immutable view of the knowledge folder at one point in time. The full
+    text, section index and content hash are precomputed here; text_for()
+    joins a subset on each call (prompts.chat_prefix caches the result).
+    """
+
+    __slots__ = ("files", "text", "sections", "content_hash", "index")
+
+    def __init__(self, files: dict):
+        self.files = files
+        self.index = None
+        names = sorted(files)
+        self.text = self._join(names)
+
+        # Section index: lowercased heading -> [(file name, heading, body), ...]
+        sections = {}
+        for name in names:
+            for heading, body in files[name].sections:
+                sections.setdefault(heading.lower(), []).append((name, heading, body))
+        self.sections = sections
+
+        digest = hashlib.sha256()
+        for name in names:
+            digest.update(name.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(files[name].sha256.encode("ascii"))
+        self.content_hash = digest.hexdigest()
+
+    def _join(self, names) -> str:
+        parts = [f"# From {name}\n\n{self.files[name].content}" for name in names]
+        return "\n\n---\n\n".join(parts) if parts else EMPTY_KNOWLEDGE_TEXT
+
+    def text_for(self, names=None) -> str:
+        """Concatenated prompt for a subset of files (None = everything)."""
+        if names is None:
+            return self.text
+        return self._join([n for n in sorted(names) if n in self.files])
+
+
+# --- Persisted knowledge index (chunk table + term postings, memory-mapped) ---
+#
+# File layout (little-endian):
+#   header | chunk table | term table (sorted by term bytes) | postings | strings
+# Every string (file name, heading, chunk text, term) lives in the strings
+# blob and is referenced by (offset, length), so reads go straight through
+# the mmap without unpacking the whole file.
+
+INDEX_MAGIC = b"SPKI"
+INDEX_VERSION = 1
+
+# magic, version, reserved, content hash, chunks, terms, total term count,
+# chunk table offset, term table offset, postings offset, strings offset
+_INDEX_HEADER = struct.Struct("<4sHH32sIIIIIII")
+# file off/len, heading off/len, text off/len, term count
+_INDEX_CHUNK = struct.Struct("<IIIIIII")
+# term off/len, first posting, posting count
+_INDEX_TERM = struct.Struct("<IIII")
+# chunk id, term frequency
+_INDEX_POSTING = struct.Struct("<II")
+
+TERM_RE = re.compile(r"\$?\w+")
+
+
+def tokenize_terms(text: str) -> list[str]:
+    return TERM_RE.findall(text.lower())
+
+
+def chunk_knowledge(snapshot: KnowledgeSnapshot) -> list[tuple[str, str, str]]:
+    """
+    Split every section of the snapshot into (file name, heading, text)
+    chunks of roughly KNOWLEDGE_CHUNK_CHARS, packing whole paragraphs.
+    """
+    chunks = []
+    for name in sorted(snapshot.files):
+        for heading, body in snapshot.files[name].sections:
+            current = []
+            size = 0
+            for para in body.split("\n\n"):
+                para = para.strip()
+                if not para:
+                    continue
+                if current and size + len(para) > KNOWLEDGE_CHUNK_CHARS:
+                    chunks.append((name, heading, "\n\n".join(current)))
+                    current = []
+                    size = 0
+                current.append(para)
+                size += len(para) + 2
+            if current:
+                chunks.append((name, heading, "\n\n".join(current)))
+            elif heading:
+                chunks.append((name, heading, ""))
+    return chunks
+
+
+def build_knowledge_index(snapshot: KnowledgeSnapshot) -> bytes:
+    """Serialize the chunk table and term index for a snapshot."""
+    strings = bytearray()
+    interned = {}
+
+    def intern(value: str) -> tuple[int, int]:
+        raw = value.encode("utf-8")
+        ref = interned.get(raw)
+        if ref is None:
+            ref = (len(strings), len(raw))
+            strings.extend(raw)
+            interned[raw] = ref
+        return ref
+
+    chunk_rows = []
+    postings = {}
+    total_terms = 0
+    for chunk_id, (name, heading, text) in enumerate(chunk_knowledge(snapshot)):
+        terms = tokenize_terms(f"{heading}\n{text}")
+        total_terms += len(terms)
+        for term, tf in Counter(terms).items():
+            postings.setdefault(term.encode("utf-8"), []).append((chunk_id, tf))
+        chunk_rows.append((*intern(name), *intern(heading), *intern(text), len(terms)))
+
+    term_rows = []
+    posting_rows = []
+    for raw_term in sorted(postings):
+        term_off, term_len = intern(raw_term.decode("utf-8"))
+        entries = postings[raw_term]
+        term_rows.append((term_off, term_len, len(posting_rows), len(entries)))
+        posting_rows.extend(entries)
+
+    chunks_off = _INDEX_HEADER.size
+    terms_off = chunks_off + _INDEX_CHUNK.size * len(chunk_rows)
+    postings_off = terms_off + _INDEX_TERM.size * len(term_rows)
+    strings_off = postings_off + _INDEX_POSTING.size * len(posting_rows)
+
+    out = bytearray(
+        _INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            INDEX_VERSION,
+            0,
+            bytes.fromhex(snapshot.content_hash),
+            len(chunk_rows),
+            len(term_rows),
+            total_terms,
+            chunks_off,
+            terms_off,
+            postings_off,
+            strings_off,
+        )
+    )
+    for row in chunk_rows:
+        out += _INDEX_CHUNK.pack(*row)
+    for row in term_rows:
+        out += _INDEX_TERM.pack(*row)
+    for row in posting_rows:
+        out += _INDEX_POSTING.pack(*row)
+    out += strings
+    return bytes(out)
+
+
+class KnowledgeIndex:
+    """
+    Read-only view over a serialized knowledge index. The buffer is usually
+    an mmap of the index file, so opening is O(1) and lookups only touch the
+    pages they need.
+    """
+
+    def __init__(self, buf):
+        self._buf = buf
+        (
+            magic,
+            version,
+            _,
+            content_hash,
+            self.chunk_count,
+            self.term_count,
+            total_terms,
+            self._chunks_off,
+            self._terms_off,
+            self._postings_off,
+            self._strings_off,
+        ) = _INDEX_HEADER.unpack_from(buf, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError("not a knowledge index (or unsupported version)")
+        self.content_hash = content_hash.hex()
+        self._avg_terms = total_terms / self.chunk_count if self.chunk_count else 0.0
+
+    @classmethod
+    def open(cls, path: str, content_hash: str):
+        """Memory-map an index file; returns None if missing, stale or corrupt."""
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            index = cls(mm)
+        except (struct.error, ValueError):
+            mm.close()
+            return None
+        if index.content_hash != content_hash:
+            mm.close()
+            return None
+        return index
+
+    def close(self):
+        """Unmap the index file (nothing to do for an in-memory index)."""
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    def _string(self, off: int, length: int) -> str:
+        start = self._strings_off + off
+        return str(self._buf[start : start + length], "utf-8")
+
+    def chunk(self, chunk_id: int) -> tuple[str, str, str]:
+        """Return (file name, heading, text) for one chunk."""
+        row = _INDEX_CHUNK.unpack_from(
+            self._buf, self._chunks_off + chunk_id * _INDEX_CHUNK.size
+        )
+        return (
+            self._string(row[0], row[1]),
+            self._string(row[2], row[3]),
+            self._string(row[4], row[5]),
+        )
+
+    def _chunk_terms(self, chunk_id: int) -> int:
+        return _INDEX_CHUNK.unpack_from(
+            self._buf, self._chunks_off + chunk_id * _INDEX_CHUNK.size
+        )[6]
+
+    def _find_term(self, raw_term: bytes):
+        """Binary search the sorted term table; returns (first, count) or None."""
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            term_off, term_len, first, count = _INDEX_TERM.unpack_from(
+                self._buf, self._terms_off + mid * _INDEX_TERM.size
+            )
+            start = self._strings_off + term_off
+            probe = self._buf[start : start + term_len]
+            if probe == raw_term:
+                return first, count
+            if probe < raw_term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def search(self, query: str, limit: int = 3) -> list[tuple[float, str, str, str]]:
+        """
+        BM25-rank chunks for a free-text query.
+        Returns [(score, file name, heading, text), ...], best first.
+        """
+        if not self.chunk_count:
+            return []
+
+        scores = {}
+        for term in set(tokenize_terms(query)):
+            found = self._find_term(term.encode("utf-8"))
+            if found is None:
+                continue
+            first, count = found
+            idf = math.log(1 + (self.chunk_count - count + 0.5) / (count + 0.5))
+            base = self._postings_off + first * _INDEX_POSTING.size
+            for i in range(count):
+                chunk_id, tf = _INDEX_POSTING.unpack_from(
+                    self._buf, base + i * _INDEX_POSTING.size
+                )
+                norm = 1.2 * (
+                    0.25 + 0.75 * self._chunk_terms(chunk_id) / (self._avg_terms or 1)
+                )
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * 2.2 / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return [(score, *self.chunk(chunk_id)) for chunk_id, score in best]
+
+
+def load_or_build_knowledge_index(snapshot: KnowledgeSnapshot, path: str) -> KnowledgeIndex:
+    """
+    Map the on-disk index if it matches the snapshot's content hash,
+    otherwise rebuild it, write it atomically and map the new file.
+    """
+    index = KnowledgeIndex.open(path, snapshot.content_hash)
+    if index is not None:
+        return index
+
+    data = build_knowledge_index(snapshot)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error("Could not write index %s: %s", path, e)
+        return KnowledgeIndex(data)
+
+    index = KnowledgeIndex.open(path, snapshot.content_hash)
+    if index is None:
+        return KnowledgeIndex(data)
+    logger.info("Rebuilt index %s (%d chunks, %d terms)", path, index.chunk_count, index.term_count)
+    return index
+
+
+class KnowledgeStore:
+    """
+    Watches the knowledge folder (mtime polling) and rebuilds artifacts only
+    for files that changed. A new snapshot is swapped in with a single
+    reference assignment, so readers never see a half-built state and never
+    take a lock. A replaced index stays mapped until the next refresh, so
+    readers still holding the old snapshot can finish.
+    """
+
+    def __init__(self, knowledge_dir: str, index_path: str | None = None):
+        self.knowledge_dir = knowledge_dir
+        self.index_path = index_path
+        self._snapshot = None
+        self._retired_index = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> KnowledgeSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            self.refresh()
+            snap = self._snapshot
+        return snap
+
+    def _scan(self) -> dict:
+        entries = {}
+        if not os.path.isdir(self.knowledge_dir):
+            return entries
+        for name in os.listdir(self.knowledge_dir):
+            if not name.lower().endswith(".md"):
+                continue
+            path = os.path.join(self.knowledge_dir, name)
+            try:
+                entries[name] = os.stat(path)
+            except OSError as e:
+                logger.error("Could not stat %s: %s", path, e)
+        return entries
+
+    def refresh(self) -> bool:
+        """Rescan the folder; returns True if a new snapshot was published."""
+        with self._refresh_lock:
+            if self._retired_index is not None:
+                self._retired_index.close()
+                self._retired_index = None
+            old = self._snapshot
+            old_files = old.files if old is not None else {}
+
+            files = {}
+            changed = old is None
+            for name, st in self._scan().items():
+                prev = old_files.get(name)
+                if (
+                    prev is not None
+                    and prev.mtime_ns == st.st_mtime_ns
+                    and prev.size == st.st_size
+                ):
+                    files[name] = prev
+                    continue
+
+                path = os.path.join(self.knowledge_dir, name)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        content = f.read()
+                except Exception as e:
+                    logger.error("Could not read %s: %s", path, e)
+                    if prev is not None:
+                        files[name] = prev
+                    continue
+
+                files[name] = KnowledgeFile(name, st.st_mtime_ns, st.st_size, content)
+                if prev is None or prev.sha256 != files[name].sha256:
+                    changed = True
+
+            if files.keys() != old_files.keys():
+                changed = True
+            if not changed:
+                # Content is identical, but keep the fresh stat info
+                if any(files[n] is not old_files[n] for n in files):
+                    snap = KnowledgeSnapshot(files)
+                    snap.index = old.index
+                    self._snapshot = snap
+                return False
+
+            snap = KnowledgeSnapshot(files)
+            if self.index_path:
+                snap.index = load_or_build_knowledge_index(snap, self.index_path)
+            self._snapshot = snap
+            if old is not None and old.index is not snap.index:
+                self._retired_index = old.index
+            return True
+
+
+KNOWLEDGE_STORE = KnowledgeStore(KNOWLEDGE_DIR, KNOWLEDGE_INDEX_FILE)
+
+
+def load_knowledge():
+    """Return the concatenated knowledge prompt from the current snapshot."""
+    return KNOWLEDGE_STORE.snapshot.text
+
+
+async def refresh_knowledge(context: ContextTypes.DEFAULT_TYPE):
+    """Job that polls the knowledge folder and swaps in changed artifacts."""
+    try:
+        reloaded = await asyncio.to_thread(KNOWLEDGE_STORE.refresh)
+    except Exception as e:
+        logger.error("Error refreshing knowledge: %s", e)
+        return
+    if reloaded:
+        snap = KNOWLEDGE_STORE.snapshot
+        logger.info("Reloaded %d knowledge files (hash %s)", len(snap.files), snap.content_hash[:12])
@@ -0,0 +1,114 @@
+"""
+Startup / shutdown plumbing shared by polling and webhook mode: run until
+SIGINT / SIGTERM, then drain within DRAIN_TIMEOUT_SECONDS.
+
+Drain order: stop intake (no new updates), let queued and in-flight updates
+and timer tasks finish, cancel whatever is still running at the deadline,
+then give queued replies the rest of the time to go out. State is flushed
+afterwards by app.on_shutdown.
+"""
+
+import asyncio
+import logging
+import signal
+import time
+
+from telegram import Update
+
+from .config import DRAIN_TIMEOUT_SECONDS
+from .processing import IN_FLIGHT
+from .sender import SENDER
+
+logger = logging.getLogger(__name__)
+
+
+def stop_event_on_signals() -> asyncio.Event:
+    """An event set by SIGINT / SIGTERM (where the loop supports signal handlers)."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    return stop_event
+
+
+def discard_queued_updates(queue: asyncio.Queue) -> list[str]:
+    """Drop updates still waiting in the intake queue; returns their labels."""
+    labels, keep = [], []
+    while True:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        queue.task_done()
+        if isinstance(item, Update):
+            labels.append(f"update:{item.update_id}")
+        else:
+            keep.append(item)  # PTB's stop signal
+    for item in keep:
+        queue.put_nowait(item)
+    return labels
+
+
+async def drain(app, stop_intake, timeout: float = DRAIN_TIMEOUT_SECONDS) -> dict:
+    """
+    Stop `app` gracefully: await stop_intake(), then app.stop() (which
+    processes everything already queued and waits for running jobs and
+    tasks). Updates and timer tasks still running at the deadline are
+    cancelled and queued ones dropped; a GM abandoned before it was sent
+    releases its claim so the next start catches it up.
+
+    With UPDATE_CONCURRENCY=1 PTB runs each update inline in its fetcher,
+    which can't be cancelled: the update being handled always finishes.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    IN_FLIGHT.start_draining()
+    await stop_intake()
+
+    stop_task = asyncio.create_task(app.stop(), name="application_stop")
+    await asyncio.wait({stop_task}, timeout=max(0.0, deadline - time.monotonic()))
+    abandoned = []
+    while not stop_task.done():
+        # Past the deadline. The fetcher may still pick up an update between
+        # rounds, so repeat until app.stop() returns.
+        abandoned += discard_queued_updates(app.update_queue)
+        abandoned += IN_FLIGHT.cancel_all()
+        await asyncio.wait({stop_task}, timeout=0.1)
+    stop_task.result()
+
+    # Replies from the handlers that finished, still paced by the sender
+    while SENDER.pending() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+    report = {
+        "seconds": round(time.monotonic() - started, 2),
+        "drained": dict(IN_FLIGHT.drained),
+        "abandoned": abandoned,
+        "unsent": SENDER.pending(),
+    }
+    drained = ", ".join(f"{kind}={n}" for kind, n in sorted(report["drained"].items())) or "nothing"
+    if abandoned or report["unsent"]:
+        logger.warning(
+            "Drained %s in %.2fs; abandoned %d (%s), %d replies unsent",
+            drained, report["seconds"], len(abandoned), ", ".join(abandoned[:20]) or "-", report["unsent"],
+        )
+    else:
+        logger.info("Drained %s in %.2fs, nothing abandoned", drained, report["seconds"])
+    return report
+
+
+async def run_polling(app):
+    """Run the application on getUpdates long polling until SIGINT/SIGTERM, then drain; returns the drain report."""
+    stop_event = stop_event_on_signals()
+    async with app:
+        await app.updater.start_polling()
+        await app.start()
+        try:
+            await stop_event.wait()
+        finally:
+            # updater.stop() confirms the fetched updates' offset with Telegram
+            report = await drain(app, app.updater.stop)
+    return report
@@ -0,0 +1,76 @@
+"""OpenAI access. The client (and the `openai` package) load on first use."""
+
+import logging
+import threading
+import time
+
+from .config import OPENAI_API_KEY
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "gpt-4.1-mini"
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+
+def record_usage(purpose: str, usage, seconds: float):
+    """
+    Log one call's token usage and add it to the llm_* counters in /stats.
+    Latency goes to llm_<purpose>_cached / _uncached, depending on whether
+    the provider served part of the prompt from its prompt cache.
+    """
+    if usage is None:
+        return
+    prompt = usage.prompt_tokens or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    completion = usage.completion_tokens or 0
+    TRACER.count("llm_calls")
+    TRACER.count("llm_prompt_tokens", prompt)
+    TRACER.count("llm_cached_tokens", cached)
+    TRACER.count("llm_completion_tokens", completion)
+    TRACER.observe(f"llm_{purpose}_{'cached' if cached else 'uncached'}", seconds)
+    logger.info(
+        "LLM %s: %d prompt tokens (%d cached), %d completion tokens, %.0f ms",
+        purpose, prompt, cached, completion, seconds * 1000,
+    )
+
+
+def complete(messages: list[dict], max_tokens: int, temperature: float, purpose: str = "chat", cache_key: str = None):
+    """
+    Blocking chat completion returning the reply content (call it via
+    asyncio.to_thread). cache_key is sent as prompt_cache_key, so calls
+    sharing a prompt prefix land on the same provider cache.
+    """
+    kwargs = {}
+    if cache_key:
+        # extra_body: works whether or not the installed openai knows the parameter
+        kwargs["extra_body"] = {"prompt_cache_key": cache_key}
+    start = time.perf_counter()
+    completion = get_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        **kwargs,
+    )
+    record_usage(purpose, getattr(completion, "usage", None), time.perf_counter() - start)
+    return completion.choices[0].message.content
+
+
+def warm_up():
+    """Import openai and build the client in the background, off the startup path."""
+    threading.Thread(target=get_client, name="llm-warmup", daemon=True).start()
@@ -0,0 +1,184 @@
+"""Structured logging: leveled text/JSON records written from a background thread."""
+
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+from .config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_SAMPLE
+
+
+# --- Correlation IDs ---
+
+# Set once per update (see handlers.drop_duplicate_updates); every task and
+# to_thread call started while handling the update inherits it.
+CORRELATION_ID = contextvars.ContextVar("correlation_id", default=None)
+
+
+def set_correlation_id(value):
+    return CORRELATION_ID.set(value)
+
+
+def update_correlation_id(update_id) -> str:
+    return f"u{update_id}"
+
+
+# --- Record handling ---
+
+# Attributes every LogRecord has; anything else came in through extra=...
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "correlation_id", "sample"}
+
+
+def parse_pairs(spec: str) -> dict:
+    """'a=1, b=2' -> {'a': '1', 'b': '2'} (malformed entries are ignored)."""
+    pairs = {}
+    for item in spec.split(","):
+        key, sep, value = item.partition("=")
+        if sep and key.strip() and value.strip():
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keeps 1 in N records logged with extra={"sample": key}, per key
+    (deterministic counter, no randomness). Keys without a rate pass through.
+    Records come from the event loop and worker threads, so the counters
+    are updated under a lock.
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None:
+            return True
+        every = self.rates.get(key, 1)
+        if every <= 1:
+            return True
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class CorrelationQueueHandler(logging.handlers.QueueHandler):
+    """
+    Runs in the caller's thread: stamps the correlation id and enqueues.
+    Formatting (timestamps, JSON) happens on the listener thread; only the
+    %-merge of the message args is done here, so later mutation of an arg
+    can't change what was logged.
+    """
+
+    def prepare(self, record):
+        record.correlation_id = CORRELATION_ID.get()
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        cid = getattr(record, "correlation_id", None)
+        record.cid = f" [{cid}]" if cid else ""
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, cid and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        cid = getattr(record, "correlation_id", None)
+        if cid:
+            entry["cid"] = cid
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "cid":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# --- Setup ---
+
+_listener = None
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, levels=LOG_LEVELS, sample=LOG_SAMPLE, stream=None):
+    """
+    Route the root logger through a queue to a stream handler running on a
+    background thread, so logging never blocks the event loop on I/O.
+    Safe to call again (replaces the previous setup).
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s%(cid)s: %(message)s"))
+
+    rates = {}
+    for key, value in parse_pairs(sample).items():
+        try:
+            rates[key] = max(1, int(value))
+        except ValueError:
+            pass
+
+    records = queue.SimpleQueue()
+    handler = CorrelationQueueHandler(records)
+    handler.addFilter(SampleFilter(rates))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    # LOG_LEVEL applies to the bot's own modules; third-party libraries
+    # (httpx, telegram, apscheduler, openai) stay at WARNING unless LOG_LEVELS
+    # names them
+    root.setLevel(logging.WARNING)
+    _set_level(logging.getLogger("spore"), level)
+    for name, module_level in parse_pairs(levels).items():
+        _set_level(logging.getLogger(name), module_level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def _set_level(logger, level):
+    try:
+        logger.setLevel(level.upper())
+    except ValueError:
+        print(f"Unknown log level {level!r} for {logger.name or 'root'}, using INFO.")
+        logger.setLevel(logging.INFO)
+
+
+def stop_logging():
+    """Drain the queue and stop the writer thread (also runs at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,398 @@
+"""CoinGecko prices, cross-currency quotes and natural-language price question detection."""
+
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import time
+
+from .config import FIAT_CURRENCIES, FX_CACHE_SECONDS, PRICE_CACHE_SECONDS
+from .storage import SHARED_STORE
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+# --- Price config and fetcher ---
+
+TOKEN_CONFIG = {
+    "BTC": {"id": "bitcoin", "label": "Bitcoin"},
+    "ETH": {"id": "ethereum", "label": "Ethereum"},
+    "FUNGI": {"id": "fungi", "label": "Fungi"},
+    "FROGGI": {"id": "froggi", "label": "Froggi"},
+    "PEPI": {"id": "pepi-2", "label": "Pepi"},
+    "JELLI": {"id": "jelli", "label": "Jelli"},
+}
+
+COINGECKO_URL = os.getenv(
+    "COINGECKO_URL", "https://api.coingecko.com/api/v3/simple/price"
+)
+
+# BTC-denominated rates for every fiat currency (one call covers them all)
+COINGECKO_FX_URL = os.getenv(
+    "COINGECKO_FX_URL", "https://api.coingecko.com/api/v3/exchange_rates"
+)
+
+
+def fetch_prices():
+    """Fetch current price + 24h change for configured tokens."""
+    if not TOKEN_CONFIG:
+        return {}
+
+    ids = ",".join(cfg["id"] for cfg in TOKEN_CONFIG.values())
+
+    params = {
+        "ids": ids,
+        "vs_currencies": "usd",
+        "include_24hr_change": "true",
+    }
+
+    # Imported on first use: only price lookups need it
+    import requests
+
+    try:
+        resp = requests.get(COINGECKO_URL, params=params, timeout=10)
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as e:
+        logger.error("Price fetch error: %s", e)
+        return {}
+
+    results = {}
+    for symbol, cfg in TOKEN_CONFIG.items():
+        cid = cfg["id"]
+        if cid not in data:
+            continue
+        entry = data[cid]
+        price = entry.get("usd")
+        change = entry.get("usd_24h_change")
+        results[symbol] = {
+            "label": cfg["label"],
+            "price": price,
+            "change": change,
+        }
+
+    return results
+
+
+def fetch_fx_rates():
+    """Units of each fiat currency per 1 USD, e.g. {"EUR": 0.92, ...}."""
+    import requests
+
+    try:
+        resp = requests.get(COINGECKO_FX_URL, timeout=10)
+        resp.raise_for_status()
+        rates = resp.json()["rates"]
+        usd_per_btc = rates["usd"]["value"]
+    except Exception as e:
+        logger.error("FX rate fetch error: %s", e)
+        return {}
+
+    fx = {}
+    for code in FIAT_CURRENCIES:
+        entry = rates.get(code.lower())
+        if entry and entry.get("value"):
+            fx[code] = entry["value"] / usd_per_btc
+    return fx
+
+
+_price_cache = {"at": 0.0, "data": {}}
+_fx_cache = {"at": 0.0, "data": {}}
+
+
+def _cached_fetch(name: str, cache: dict, ttl: float, fetch):
+    """
+    fetch() behind a `ttl` cache: per process, and in multi-worker mode also
+    through the shared store under `name`, so a burst of questions across
+    workers costs one upstream call.
+    """
+    now = time.time()
+    if cache["data"] and now - cache["at"] < ttl:
+        return cache["data"]
+
+    if SHARED_STORE is not None:
+        try:
+            cached = SHARED_STORE.cache_get(name)
+        except sqlite3.Error as e:
+            logger.error("Shared cache read failed: %s", e)
+            cached = None
+        if cached:
+            data = json.loads(cached)
+            cache.update(at=now, data=data)
+            return data
+
+    start = time.perf_counter()
+    data = fetch()
+    TRACER.observe(f"fetch_{name}", time.perf_counter() - start, error=not data)
+    if data:
+        cache.update(at=now, data=data)
+        if SHARED_STORE is not None:
+            try:
+                SHARED_STORE.cache_set(name, json.dumps(data), ttl)
+            except sqlite3.Error as e:
+                logger.error("Shared cache write failed: %s", e)
+    return data
+
+
+def get_prices():
+    """fetch_prices() behind the PRICE_CACHE_SECONDS cache (see _cached_fetch)."""
+    return _cached_fetch("prices", _price_cache, PRICE_CACHE_SECONDS, fetch_prices)
+
+
+def get_fx_rates():
+    """fetch_fx_rates() behind its own, much longer FX_CACHE_SECONDS cache."""
+    return _cached_fetch("fx", _fx_cache, FX_CACHE_SECONDS, fetch_fx_rates)
+
+
+# --- Quote currencies (cross rates) ---
+#
+# Everything is fetched once in USD. Other quotes are cross rates against
+# that one snapshot: ETH / BTC / sats from the ETH and BTC USD prices, fiat
+# from the separately cached FX table. No extra upstream call per currency.
+
+CRYPTO_QUOTES = ("ETH", "BTC", "SATS")
+
+# currency -> (prefix, suffix) for display: $1.23, 1.23 ETH, €1.23, 1.23 CHF
+QUOTE_CURRENCIES = {"USD": ("$", ""), "ETH": ("", " ETH"), "BTC": ("", " BTC"), "SATS": ("", " sats")}
+_FIAT_SYMBOLS = {"EUR": "€", "GBP": "£", "JPY": "¥", "INR": "₹"}
+for _code in FIAT_CURRENCIES:
+    QUOTE_CURRENCIES.setdefault(_code, (_FIAT_SYMBOLS[_code], "") if _code in _FIAT_SYMBOLS else ("", f" {_code}"))
+
+CURRENCY_ALIASES = {
+    "dollar": "USD",
+    "dollars": "USD",
+    "ether": "ETH",
+    "ethereum": "ETH",
+    "bitcoin": "BTC",
+    "sat": "SATS",
+    "satoshi": "SATS",
+    "satoshis": "SATS",
+    "euro": "EUR",
+    "euros": "EUR",
+    "pound": "GBP",
+    "pounds": "GBP",
+    "yen": "JPY",
+    "rupee": "INR",
+    "rupees": "INR",
+}
+
+# "... in eth", "... to sats", "... in EUR?"
+_QUOTE_PHRASE_RE = re.compile(r"\b(?:in|to)\s+([a-z]+)\b", re.IGNORECASE)
+
+
+def parse_currency(word: str):
+    """'sats' -> 'SATS', 'euros' -> 'EUR', 'chf' -> 'CHF'; None if not a quote currency."""
+    word = word.strip().lower()
+    code = CURRENCY_ALIASES.get(word, word.upper())
+    return code if code in QUOTE_CURRENCIES else None
+
+
+def extract_quote_currency(text: str):
+    """
+    Find an "in <currency>" / "to <currency>" phrase. Returns (currency or
+    None, text with the phrase removed), so "fungi price in eth" doesn't
+    also ask for the ETH price.
+    """
+    for match in _QUOTE_PHRASE_RE.finditer(text):
+        currency = parse_currency(match.group(1))
+        if currency is not None:
+            return currency, text[: match.start()] + text[match.end():]
+    return None, text
+
+
+def usd_per_unit(currency: str, prices: dict, fx: dict = None):
+    """USD value of one unit of the quote currency, or None if unknown."""
+    if currency == "USD":
+        return 1.0
+    if currency in CRYPTO_QUOTES:
+        base = prices.get("BTC" if currency == "SATS" else currency) or {}
+        if not base.get("price"):
+            return None
+        return base["price"] / 1e8 if currency == "SATS" else base["price"]
+    rate = (fx or {}).get(currency)
+    return 1.0 / rate if rate else None
+
+
+def convert_prices(prices: dict, currency: str, fx: dict = None):
+    """
+    The USD snapshot re-quoted in `currency` (same shape as get_prices()),
+    or None if the cross rate isn't available. The 24h change is relative
+    to the quote: against ETH / BTC it's (1 + token) / (1 + base) - 1, or
+    None when the base's change is unknown; fiat keeps the USD change (FX
+    moves are small next to these tokens).
+    """
+    if currency == "USD":
+        return prices
+    unit = usd_per_unit(currency, prices, fx)
+    if unit is None:
+        return None
+    symbols = list(prices)
+    infos = [prices[symbol] for symbol in symbols]
+    quoted = [info["price"] / unit if info["price"] is not None else None for info in infos]
+    if currency not in CRYPTO_QUOTES:
+        changes = [info["change"] for info in infos]
+    else:
+        base_change = prices["BTC" if currency == "SATS" else currency].get("change")
+        changes = [
+            ((1 + info["change"] / 100) / (1 + base_change / 100) - 1) * 100
+            if info["change"] is not None and base_change is not None
+            else None
+            for info in infos
+        ]
+    return {
+        symbol: {"label": info["label"], "price": price, "change": change}
+        for symbol, info, price, change in zip(symbols, infos, quoted, changes)
+    }
+
+
+def get_quotes(currency: str = "USD"):
+    """
+    get_prices() quoted in `currency` ({} if prices are unavailable, None if
+    the cross rate is). FX rates are only fetched for fiat quotes.
+    """
+    prices = get_prices()
+    if not prices:
+        return {}
+    fx = get_fx_rates() if currency != "USD" and currency not in CRYPTO_QUOTES else None
+    return convert_prices(prices, currency, fx)
+
+
+# --- Natural-language price detection helpers ---
+
+TOKEN_ALIASES = {
+    "BTC": ["btc", "$btc", "bitcoin"],
+    "ETH": ["eth", "$eth", "ethereum"],
+    "FUNGI": ["fungi", "$fungi"],
+    "FROGGI": ["froggi", "$froggi"],
+    "PEPI": ["pepi", "$pepi"],
+    "JELLI": ["jelli", "$jelli"],
+}
+
+PRICE_KEYWORDS = [
+    "price",
+    "how much",
+    "worth",
+    "cost",
+    "trading at",
+    "going for",
+    "quote",
+]
+
+
+def extract_price_request_tokens(message_text: str, symbols=None) -> list[str]:
+    """
+    Returns a list of canonical token symbols (e.g. ["FUNGI", "PEPI"])
+    if the message looks like a price request for those tokens.
+    `symbols` limits matching to a chat's token list (None = all).
+    """
+    if not message_text:
+        return []
+
+    text = message_text.lower()
+
+    # Only treat it as a price query if at least one keyword appears
+    if not any(keyword in text for keyword in PRICE_KEYWORDS):
+        return []
+
+    return match_price_tokens(text, symbols)
+
+
+def match_price_tokens(text: str, symbols=None) -> list[str]:
+    """Canonical symbols whose aliases appear in already-lowercased text (no keyword needed)."""
+    requested = []
+    for symbol, aliases in TOKEN_ALIASES.items():
+        if symbols is not None and symbol not in symbols:
+            continue
+        for alias in aliases:
+            if alias in text:
+                requested.append(symbol)
+                break
+
+    return requested
+
+
+# --- Price formatting ---
+
+
+def format_price(price: float, currency: str = "USD") -> str:
+    """
+    $97,123.45 for USD prices >= 1, six decimals below that. Other
+    currencies: two decimals >= 1, else four significant digits
+    (0.00000003558 ETH, 0.1266 sats, €0.0001132).
+    """
+    if currency == "USD":
+        if price >= 1:
+            return f"${price:,.2f}"
+        return f"${price:.6f}"
+    prefix, suffix = QUOTE_CURRENCIES.get(currency, ("", f" {currency}"))
+    if price >= 1 or price <= 0:
+        amount = f"{price:,.2f}"
+    else:
+        amount = f"{price:.{min(16, 3 - math.floor(math.log10(price)))}f}"
+    return f"{prefix}{amount}{suffix}"
+
+
+def format_change(change) -> tuple[str, str]:
+    """(emoji, '+3.45%') for a 24h change; ('➖', 'n/a') when unknown."""
+    if change is None:
+        return "➖", "n/a"
+    return ("🟢" if change >= 0 else "🔴"), f"{change:+.2f}%"
+
+
+def format_prices_message(data: dict, symbols, currency: str = "USD") -> str:
+    """The /prices market view (Markdown) for the given symbols, quoted in `currency`."""
+    lines = [f"📊 *Market Spores* ({currency}, 24h change)\n"]
+    for symbol, info in data.items():
+        # 1 ETH = 1 ETH isn't worth a line
+        if symbol not in symbols or symbol == {"SATS": "BTC"}.get(currency, currency):
+            continue
+        price = info["price"]
+        if price is None:
+            continue
+        emoji, change_str = format_change(info["change"])
+        lines.append(f"{emoji} *{info['label']}* ({symbol}): {format_price(price, currency)}  ({change_str})")
+    return "\n".join(lines)
+
+
+def build_price_line(requested_symbols: list[str], currency: str = "USD") -> str | None:
+    """
+    Uses get_quotes() and returns a single-line string like:
+    '🟢 FROGGI: $0.002077 (+3.45%) | 🔴 FUNGI: $0.000123 (-1.23%)'
+    Only includes tokens that were successfully priced.
+    """
+    if not requested_symbols:
+        return None
+
+    all_prices = get_quotes(currency)
+    if not all_prices:
+        return None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("all_prices keys: %s", list(all_prices.keys()))
+
+    parts = []
+    for symbol in requested_symbols:
+        symbol = symbol.upper()
+        info = all_prices.get(symbol)
+        if not info:
+            logger.debug("no price info for %s", symbol)
+            continue
+
+        price = info.get("price")
+        change = info.get("change")
+
+        if price is None:
+            logger.debug("price is None for %s", symbol)
+            continue
+
+        emoji, change_str = format_change(change)
+        parts.append(f"{emoji} {symbol}: {format_price(price, currency)} ({change_str})")
+
+    if not parts:
+        logger.debug("no parts built for price line")
+        return None
+
+    line = " | ".join(parts)
+    logger.debug("final price line: %s", line)
+    return line
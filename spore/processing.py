@@ -0,0 +1,114 @@
+"""Concurrent update processing with per-chat / per-user ordering, and
+tracking of in-flight work for a graceful shutdown."""
+
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+# --- In-flight work ---
+
+
+class InFlightTasks:
+    """
+    Update handlers and timer tasks that are currently running, by label
+    ("update:<id>", "timer:gm:<chat>"), so a shutdown can wait for them and
+    cancel whatever is still running at the deadline. Once draining, tasks
+    that finish on their own are counted per kind as drained.
+    """
+
+    def __init__(self):
+        self._tasks = {}  # task -> label
+        self.draining = False
+        self.drained = {}  # kind -> tasks finished since draining started
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def track(self, task: asyncio.Task, label: str):
+        self._tasks[task] = label
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        label = self._tasks.pop(task, None)
+        if label is not None and self.draining and not task.cancelled():
+            kind = label.split(":", 1)[0]
+            self.drained[kind] = self.drained.get(kind, 0) + 1
+
+    def start_draining(self):
+        self.draining = True
+        self.drained = {}
+
+    def cancel_all(self) -> list[str]:
+        """Cancel every tracked task not cancelled yet; returns their labels."""
+        labels = []
+        for task, label in list(self._tasks.items()):
+            # Only once: a cancelled timer task still awaits its cleanup
+            if not task.done() and not task.cancelling():
+                task.cancel()
+                labels.append(label)
+        return labels
+
+
+IN_FLIGHT = InFlightTasks()
+
+
+# --- Concurrent update processing with per-chat ordering ---
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs up to max_concurrent_updates updates at once, but updates sharing
+    an ordering key (same chat, or same user for activity counting) run
+    strictly in arrival order. Each update waits only for the previous
+    update with one of its keys, so unrelated chats never block each other.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._tails = {}  # ordering key -> future resolved when its last update finishes
+
+    @staticmethod
+    def ordering_keys(update) -> tuple:
+        if not isinstance(update, Update):
+            return ()
+        keys = []
+        if update.effective_chat is not None:
+            keys.append(("chat", update.effective_chat.id))
+        if update.effective_user is not None:
+            keys.append(("user", update.effective_user.id))
+        return tuple(keys)
+
+    async def process_update(self, update, coroutine):
+        # Runs synchronously up to the first await, in the order PTB created
+        # the tasks, so chaining on the current tails preserves arrival order.
+        IN_FLIGHT.track(asyncio.current_task(), f"update:{getattr(update, 'update_id', '?')}")
+        keys = self.ordering_keys(update)
+        done = asyncio.get_running_loop().create_future()
+        predecessors = {self._tails[k] for k in keys if k in self._tails}
+        for key in keys:
+            self._tails[key] = done
+
+        try:
+            for previous in predecessors:
+                await asyncio.shield(previous)
+            await super().process_update(update, coroutine)
+        except asyncio.CancelledError:
+            coroutine.close()
+            raise
+        finally:
+            if not done.done():
+                done.set_result(None)
+            for key in keys:
+                if self._tails.get(key) is done:
+                    del self._tails[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,102 @@
+"""
+LLM prompts. The chat system prompt (persona + knowledge) is built once per
+knowledge snapshot and reused byte for byte by every call, so the
+provider's prompt cache can serve it; per-user content only ever goes in
+the final user message.
+"""
+
+import hashlib
+
+from .knowledge import KNOWLEDGE_STORE
+
+# Bump when PERSONA / KNOWLEDGE_FOOTER / the GM prompts change
+PROMPT_VERSION = 1
+
+PERSONA = (
+    "You are Spore, a semi-sentient mushroom archivist and lore keeper for an "
+    "ERC-20i / Base Telegram community.\n"
+    "- You speak like a friendly crypto degen (CT tone) but stay helpful and positive.\n"
+    "- You explain the community's history, culture, key events, characters, memes, links, and tools.\n"
+    "- Keep replies short and group-chat friendly (1–3 short paragraphs or a few lines).\n"
+    "- If you don't know something, say you're not sure and suggest asking mods or checking official resources.\n\n"
+    "Below is ALL community knowledge loaded from the /knowledge folder, including history, links, docs, characters, memes, FAQs, and ecosystem info:\n\n"
+)
+
+KNOWLEDGE_FOOTER = (
+    "\n\n"
+    "Use this knowledge when helpful. If a user asks for official links, socials, website, docs, or tools, pull the answer directly from the links.md file."
+)
+
+
+class PromptPrefix:
+    """A finished system prompt plus the version id it is cached under."""
+
+    __slots__ = ("text", "version")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.version = f"v{PROMPT_VERSION}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+
+    @property
+    def cache_key(self) -> str:
+        """prompt_cache_key: routes calls sharing this prefix to the same provider cache."""
+        return f"spore-chat-{self.version}"
+
+
+_prefixes = {}  # knowledge subset (None = all) -> PromptPrefix
+_prefixes_hash = None
+
+
+def chat_prefix(names=None) -> PromptPrefix:
+    """
+    System prompt for a chat's knowledge subset (None = all files), built
+    on first use after each knowledge reload and then shared by all calls.
+    """
+    global _prefixes_hash
+    snap = KNOWLEDGE_STORE.snapshot
+    if snap.content_hash != _prefixes_hash:
+        _prefixes.clear()
+        _prefixes_hash = snap.content_hash
+    key = tuple(sorted(names)) if names is not None else None
+    prefix = _prefixes.get(key)
+    if prefix is None:
+        prefix = _prefixes[key] = PromptPrefix(PERSONA + snap.text_for(names) + KNOWLEDGE_FOOTER)
+    return prefix
+
+
+def chat_messages(prefix: PromptPrefix, user_handle: str, question: str) -> list[dict]:
+    return [
+        {"role": "system", "content": prefix.text},
+        {
+            "role": "user",
+            "content": (
+                f"Telegram user @{user_handle} asked or said:\n"
+                f"{question}\n\n"
+                "Reply as Spore in a busy group chat. Address them directly, keep it casual and concise."
+            ),
+        },
+    ]
+
+
+GM_MESSAGES = (
+    {
+        "role": "system",
+        "content": (
+            "You are Spore, a semi-sentient mushroom archivist and lore keeper for an "
+            "ERC-20i / Base Telegram community. You speak like a friendly crypto degen, "
+            "but stay positive and welcoming. Your task now is to generate a single, short "
+            "good-morning style message for the community."
+        ),
+    },
+    {
+        "role": "user",
+        "content": (
+            "Generate ONE short 'gm' style message for a Telegram group chat.\n"
+            "- Tone: friendly crypto degen, but not cringe.\n"
+            "- You can mention building, spores, mycelium, or 20i / Base occasionally.\n"
+            "- Keep it to 1–2 short sentences.\n"
+            "- No hashtags, no markdown formatting.\n"
+            "- Do not add quotes around the message. Just output the message text."
+        ),
+    },
+)
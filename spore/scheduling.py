@@ -0,0 +1,325 @@
+"""GM and weekly digest scheduling on a single timer wheel."""
+
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+import random
+import time
+
+from telegram.ext import ContextTypes
+
+from .config import (
+    GM_PEAK_LEAD_MINUTES,
+    GM_PEAK_MIN_MESSAGES,
+    GM_WINDOW_END_HOUR_UTC,
+    GM_WINDOW_START_HOUR_UTC,
+    TIMER_MAX_LATE_SECONDS,
+    WEEKLY_MAX_LATE_SECONDS,
+)
+from .logs import set_correlation_id
+from .llm import complete
+from .prompts import GM_MESSAGES
+from .cluster import COORDINATOR
+from .processing import IN_FLIGHT
+from .sender import PRIORITY_BROADCAST, SENDER
+from .chats import CHAT_CONFIGS, ChatConfig, primary_chat_config
+from .activity import chat_heatmap, week_key_for
+from .digest import run_weekly_digest
+
+logger = logging.getLogger(__name__)
+
+# A failed weekly digest is retried this often (it's idempotent) until it goes stale
+DIGEST_RETRY_SECONDS = 300
+
+
+# --- GM (Good Morning) scheduling helpers ---
+
+
+def get_peak_gm_datetime_utc(chat: ChatConfig, now: datetime.datetime = None, heatmap=None):
+    """
+    GM time in "peak" mode: GM_PEAK_LEAD_MINUTES (give or take half) before
+    the chat's busiest local hour on the next day that's still ahead.
+    `heatmap` is the chat's local 7 x 24 grid (activity.chat_heatmap).
+    Returns None while it holds fewer than GM_PEAK_MIN_MESSAGES messages.
+    """
+    if heatmap is None or sum(map(sum, heatmap)) < GM_PEAK_MIN_MESSAGES:
+        return None
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(chat.timezone)
+    all_days = [sum(day[hour] for day in heatmap) for hour in range(24)]
+    for days_ahead in range(3):
+        day = (now + datetime.timedelta(days=days_ahead)).date()
+        row = heatmap[day.weekday()]
+        # That weekday's hours, smoothed with the week-wide hour profile.
+        # Midnight is left out so the GM always lands on the same local day.
+        peak_hour = max(range(1, 24), key=lambda hour: 7 * row[hour] + all_days[hour])
+        lead = random.randint(GM_PEAK_LEAD_MINUTES // 2, GM_PEAK_LEAD_MINUTES)
+        fire = datetime.datetime(day.year, day.month, day.day, peak_hour, tzinfo=chat.timezone)
+        fire -= datetime.timedelta(minutes=lead)
+        if fire > now:
+            next_time = fire.astimezone(datetime.timezone.utc)
+            logger.debug(
+                "Picked GM time for %s: %s (%d min before the %02d:00 peak)",
+                chat.name, next_time.isoformat(), lead, peak_hour,
+            )
+            return next_time
+    return None
+
+
+def get_next_gm_datetime_utc(chat: ChatConfig = None, now: datetime.datetime = None, heatmap=None) -> datetime.datetime:
+    """
+    Pick a random datetime in the chat's next GM window [start, end),
+    evaluated in the chat's timezone and returned in UTC.
+    If we're before today's window, use today.
+    If we're inside or after today's window, use tomorrow.
+
+    Chats in "peak" mode are scheduled from their activity heatmap instead
+    (see get_peak_gm_datetime_utc) once it has enough data.
+    """
+    if chat is not None and chat.gm_mode == "peak":
+        peak_time = get_peak_gm_datetime_utc(chat, now, heatmap)
+        if peak_time is not None:
+            return peak_time
+
+    start_minute = chat.gm_start_minute if chat else GM_WINDOW_START_HOUR_UTC * 60
+    end_minute = chat.gm_end_minute if chat else GM_WINDOW_END_HOUR_UTC * 60
+    tz = chat.timezone if chat else datetime.timezone.utc
+
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(tz)
+
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_today = midnight + datetime.timedelta(minutes=start_minute)
+    end_today = midnight + datetime.timedelta(minutes=end_minute)
+
+    if now < start_today:
+        target_date = start_today.date()
+    elif now < end_today:
+        target_date = now.date()
+    else:
+        target_date = (now + datetime.timedelta(days=1)).date()
+
+    window_start = datetime.datetime(
+        year=target_date.year,
+        month=target_date.month,
+        day=target_date.day,
+        tzinfo=tz,
+    ) + datetime.timedelta(minutes=start_minute)
+
+    window_minutes = max(1, end_minute - start_minute)
+    offset_minutes = random.randrange(window_minutes)
+
+    next_time = (window_start + datetime.timedelta(minutes=offset_minutes)).astimezone(
+        datetime.timezone.utc
+    )
+    name = chat.name if chat else "main"
+    logger.debug("Picked GM time for %s: %s", name, next_time.isoformat())
+    return next_time
+
+
+def get_next_weekly_datetime_utc(now: datetime.datetime = None) -> datetime.datetime:
+    """Next Sunday 23:59 UTC (weeks are UTC ISO weeks for every chat)."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    days_ahead = (6 - now.weekday()) % 7
+    target = (now + datetime.timedelta(days=days_ahead)).replace(
+        hour=23, minute=59, second=0, microsecond=0
+    )
+    if target <= now:
+        target += datetime.timedelta(days=7)
+    return target
+
+
+class TimerWheel:
+    """
+    One min-heap of (due, seq, kind, chat_id) entries drives every scheduled
+    task for every chat, polled by a single repeating job. Memory is one
+    small tuple per pending task, and scheduling is O(log n), instead of a
+    job-queue job per chat per task.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, due: datetime.datetime, kind: str, chat_id: int):
+        heapq.heappush(self._heap, (due.timestamp(), next(self._seq), kind, chat_id))
+
+    def pop_due(self, now_ts: float) -> list[tuple[float, str, int]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            when, _, kind, chat_id = heapq.heappop(self._heap)
+            due.append((when, kind, chat_id))
+        return due
+
+    def peek(self):
+        return self._heap[0] if self._heap else None
+
+
+TIMER_WHEEL = TimerWheel()
+
+
+def next_due_for(kind: str, chat: ChatConfig = None, now: datetime.datetime = None):
+    if kind == "gm":
+        heatmap = chat_heatmap(chat, now) if chat.gm_mode == "peak" else None
+        return get_next_gm_datetime_utc(chat, now, heatmap)
+    if kind == "digest":
+        return get_next_weekly_datetime_utc(now)
+    raise ValueError(f"unknown timer kind {kind!r}")
+
+
+def timer_job_key(kind: str, chat: ChatConfig, due: datetime.datetime) -> str:
+    """Identity of one scheduled run: one GM per chat-local day, one digest (all chats) per week."""
+    if kind == "gm":
+        return f"gm:{chat.chat_id}:{due.astimezone(chat.timezone).date().isoformat()}"
+    return f"{kind}:{week_key_for(due)}"
+
+
+def planned_due(kind: str, chat: ChatConfig = None, now: datetime.datetime = None) -> datetime.datetime:
+    """
+    The persisted due time for a chat's task (chat None: the weekly digest)
+    if that run hasn't happened yet (possibly in the past: missed while we
+    were down, so the first tick catches it up), otherwise a freshly picked
+    next one, persisted.
+    """
+    name = f"{kind}:{chat.chat_id}" if chat is not None else kind
+    stored = COORDINATOR.load_due(name)
+    if stored is not None:
+        due = datetime.datetime.fromtimestamp(stored, datetime.timezone.utc)
+        if not COORDINATOR.job_ran(timer_job_key(kind, chat, due)):
+            return due
+    fresh = next_due_for(kind, chat, now)
+    while COORDINATOR.job_ran(timer_job_key(kind, chat, fresh)):
+        # Still inside today's window after today's run: move on a day
+        local = fresh.astimezone(chat.timezone if chat is not None else datetime.timezone.utc)
+        fresh = next_due_for(
+            kind, chat, local.replace(hour=0, minute=0, second=0) + datetime.timedelta(days=1)
+        )
+    due = datetime.datetime.fromtimestamp(
+        COORDINATOR.store_due(name, fresh.timestamp(), stored), datetime.timezone.utc
+    )
+    logger.info("Next %s for %s scheduled for: %s", kind, chat.name if chat is not None else "all chats", due.isoformat())
+    return due
+
+
+def schedule_chat_tasks(wheel: TimerWheel, chats):
+    """Seed the wheel with the next GM for each chat and the next weekly digest."""
+    chats = list(chats)
+    for chat in chats:
+        if chat.gm_enabled:
+            wheel.schedule(planned_due("gm", chat), "gm", chat.chat_id)
+    # One digest covers every chat with a weekly prize
+    if any(chat.weekly_winner for chat in chats):
+        wheel.schedule(planned_due("digest"), "digest", 0)
+
+
+async def run_timer_task(context, kind: str, chat: ChatConfig, due_ts: float):
+    """Run one due wheel entry: a chat's GM, or the weekly digest (chat None)."""
+    due = datetime.datetime.fromtimestamp(due_ts, datetime.timezone.utc)
+    name = chat.name if chat is not None else "all chats"
+    max_late = WEEKLY_MAX_LATE_SECONDS if kind == "digest" else TIMER_MAX_LATE_SECONDS
+    job_key = timer_job_key(kind, chat, due)
+    set_correlation_id(job_key)
+    handed_off = False
+    retry = False
+    try:
+        if kind == "digest":
+            # Idempotent, so claimed only once complete: a failed or
+            # interrupted digest simply runs again
+            if await asyncio.to_thread(COORDINATOR.job_ran, job_key):
+                logger.info("%s for %s already ran, skipping", kind, name)
+            elif time.time() - due_ts > max_late:
+                await asyncio.to_thread(COORDINATOR.claim_job, job_key)
+                logger.warning("Skipping stale %s for %s (was due %s)", kind, name, due.isoformat())
+            else:
+                summary = await run_weekly_digest(context, week_key_for(due))
+                if summary["failed"]:
+                    logger.warning("%s for %s: %d announcements failed, retrying", kind, name, summary["failed"])
+                    retry = True
+                else:
+                    await asyncio.to_thread(COORDINATOR.claim_job, job_key)
+        # Claim first, even for a run we skip as stale, so it's never retried
+        elif not await asyncio.to_thread(COORDINATOR.claim_job, job_key):
+            logger.info("%s for %s already ran, skipping", kind, name)
+        elif time.time() - due_ts > max_late:
+            logger.warning("Skipping stale %s for %s (was due %s)", kind, name, due.isoformat())
+        elif kind == "gm":
+            text = await generate_gm_text()
+            handed_off = True
+            await send_gm(context, chat, text)
+    except asyncio.CancelledError:
+        # A GM abandoned by a shutdown before anything was sent: drop the
+        # claim so the next start catches it up instead of skipping it.
+        # Inline, since the executor's threads may all be stuck in abandoned calls.
+        if kind == "gm" and not handed_off:
+            COORDINATOR.release_job(job_key)
+            logger.warning("%s for %s abandoned at shutdown, will catch up after restart", kind, name)
+        raise
+    except Exception as e:
+        logger.error("%s for %s failed: %s", kind, name, e)
+        retry = kind == "digest"
+    next_due = await asyncio.to_thread(planned_due, kind, chat)
+    if retry:
+        retry_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=DIGEST_RETRY_SECONDS)
+        next_due = max(next_due, retry_at)
+    TIMER_WHEEL.schedule(next_due, kind, chat.chat_id if chat is not None else 0)
+
+
+async def timer_tick(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Single repeating job: fire every due task on the wheel. Followers leave
+    due entries in place, so a worker that takes over leadership fires them
+    (claim_job stops anything the old leader already ran).
+    """
+    if not COORDINATOR.is_leader or IN_FLIGHT.draining:
+        return
+    now_ts = time.time()
+    for due_ts, kind, chat_id in TIMER_WHEEL.pop_due(now_ts):
+        chat = CHAT_CONFIGS.get(chat_id)
+        if chat is None and kind != "digest":
+            continue  # chat was removed from the config table
+        label = f"timer:{kind}:{chat_id}"
+        task = context.application.create_task(run_timer_task(context, kind, chat, due_ts), name=label)
+        IN_FLIGHT.track(task, label)
+
+
+async def generate_gm_text() -> str:
+    """A fresh, LLM-generated GM (or a canned one if the LLM call fails)."""
+    try:
+        text = await asyncio.to_thread(
+            complete,
+            list(GM_MESSAGES),
+            max_tokens=80,
+            temperature=0.9,
+            purpose="gm",
+        )
+        return (text or "").strip()
+    except Exception as e:
+        logger.error("OpenAI error while generating GM: %s", e)
+        return "gm spores 🌞 what are we building today?"
+
+
+async def send_gm(context: ContextTypes.DEFAULT_TYPE, chat: ChatConfig = None, text: str = None):
+    """
+    Send a GM to a chat (default: the main chat), generating one unless
+    `text` is given. The timer wheel schedules the next one.
+    """
+    chat = chat or primary_chat_config()
+    if chat is None:
+        logger.info("GM_CHAT_ID is 0, skipping GM.")
+        return
+
+    gm_text = text if text is not None else await generate_gm_text()
+
+    try:
+        await SENDER.send(
+            context.bot,
+            chat.chat_id,
+            gm_text,
+            priority=PRIORITY_BROADCAST,
+        )
+        logger.info("Sent GM message to %s: %s", chat.chat_id, gm_text)
+    except Exception as e:
+        logger.error("Error sending GM message: %s", e)
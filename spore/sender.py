@@ -0,0 +1,306 @@
+"""Outbound send scheduler that keeps bot sends inside Telegram rate limits."""
+
+import asyncio
+import datetime
+import logging
+import time
+from collections import deque
+
+import httpx
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from .config import (
+    SEND_GLOBAL_PER_SEC,
+    SEND_GROUP_PER_MIN,
+    SEND_MAX_IN_FLIGHT,
+    SEND_PRIVATE_PER_SEC,
+)
+from .logs import CORRELATION_ID, set_correlation_id
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+# --- Outbound send scheduler (Telegram rate limits) ---
+
+PRIORITY_INTERACTIVE = 0  # replies to users
+PRIORITY_BROADCAST = 1  # GM, weekly announcements
+
+TELEGRAM_MAX_MESSAGE_CHARS = 4096
+
+
+# Attempts per message for errors where the request never reached Telegram
+SEND_ATTEMPTS = 3
+
+
+def _not_sent(exc: Exception) -> bool:
+    """
+    True if a failed send certainly didn't reach Telegram, so sending again
+    can't duplicate it: connection errors and Telegram's 5xx answers, and
+    timeouts waiting for a pooled connection. Any other timeout may have
+    been delivered, and other exceptions are unknown.
+    """
+    if isinstance(exc, TimedOut):
+        return isinstance(exc.__cause__, httpx.PoolTimeout)
+    return isinstance(exc, NetworkError)
+
+
+class _OutboundMessage:
+    __slots__ = ("chat_id", "text", "parse_mode", "reply_to", "bot", "priority",
+                 "mergeable", "futures", "enqueued_at", "attempts", "correlation_id", "photo")
+
+    def __init__(self, chat_id, text, parse_mode, reply_to, bot, priority, mergeable, future, photo=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.photo = photo  # PNG bytes or a Telegram file_id; text is then the caption
+        self.parse_mode = parse_mode
+        self.reply_to = reply_to
+        self.bot = bot
+        self.priority = priority
+        self.mergeable = mergeable
+        self.futures = [future]
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        self.correlation_id = CORRELATION_ID.get()
+
+
+class OutboundScheduler:
+    """
+    Single queue for every message the bot sends.
+
+    - Enforces a global send rate (sliding 1s window) plus Telegram's
+      per-chat limits (sliding 60s window for groups, minimum spacing for
+      private chats).
+    - Interactive replies are sent before broadcasts; within one priority,
+      each chat's messages go out in order, one in flight per chat.
+    - 429 RetryAfter pauses the affected chat for retry_after and requeues
+      the message at the front instead of dropping it.
+    - Mergeable messages queued back-to-back for the same chat are joined
+      into one send (a merged reply quotes the first message).
+    """
+
+    def __init__(self, global_per_sec, group_per_min, private_per_sec, max_in_flight):
+        self.global_per_sec = max(1, int(global_per_sec))
+        self.group_per_min = group_per_min
+        self.private_interval = 1.0 / private_per_sec if private_per_sec > 0 else 0.0
+        self.max_in_flight = max_in_flight
+
+        self._queues = {}  # chat_id -> [deque per priority]
+        self._recent = {}  # chat_id -> deque of send timestamps (last 60s)
+        self._paused_until = {}  # chat_id -> monotonic time
+        self._busy = set()  # chats with a send in flight
+        self._global_recent = deque()  # send timestamps in the last second
+        self._in_flight = 0
+        self._wakeup = None
+        self._worker = None
+        self._loop = None
+
+        self.stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "merged": 0,
+            "retry_after": 0,
+            "failed": 0,
+            "max_depth": 0,
+            "wait_count": 0,
+            "wait_total_s": 0.0,
+            "wait_max_s": 0.0,
+        }
+
+    # -- public API --
+
+    async def send(self, bot, chat_id, text, *, parse_mode=None,
+                   priority=PRIORITY_BROADCAST, mergeable=False):
+        """Queue a plain send_message; resolves to the sent Message."""
+        return await self._enqueue(chat_id, text, parse_mode, None, bot, priority, mergeable)
+
+    async def reply(self, msg, text, *, parse_mode=None,
+                    priority=PRIORITY_INTERACTIVE, mergeable=False):
+        """Queue msg.reply_text(text); resolves to the sent Message."""
+        return await self._enqueue(msg.chat_id, text, parse_mode, msg, None, priority, mergeable)
+
+    async def reply_photo(self, msg, photo, caption="", *, priority=PRIORITY_INTERACTIVE):
+        """Queue msg.reply_photo(photo, caption=caption); resolves to the sent Message."""
+        return await self._enqueue(msg.chat_id, caption, None, msg, None, priority, False, photo)
+
+    def depth(self) -> int:
+        return sum(len(q) for queues in self._queues.values() for q in queues)
+
+    def pending(self) -> int:
+        """Messages queued or being sent right now."""
+        return self.depth() + self._in_flight
+
+    def snapshot_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["depth"] = self.depth()
+        stats["in_flight"] = self._in_flight
+        stats["wait_avg_s"] = (
+            stats["wait_total_s"] / stats["wait_count"] if stats["wait_count"] else 0.0
+        )
+        return stats
+
+    # -- internals --
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run(), name="outbound_scheduler")
+
+    async def _enqueue(self, chat_id, text, parse_mode, reply_to, bot, priority, mergeable, photo=None):
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self.stats["enqueued"] += 1
+
+        queues = self._queues.get(chat_id)
+        if queues is None:
+            queues = self._queues[chat_id] = [deque(), deque()]
+        queue = queues[priority]
+
+        tail = queue[-1] if queue else None
+        if (
+            mergeable
+            and tail is not None
+            and tail.mergeable
+            and tail.parse_mode == parse_mode
+            and len(tail.text) + len(text) + 2 <= TELEGRAM_MAX_MESSAGE_CHARS
+        ):
+            tail.text = f"{tail.text}\n\n{text}"
+            tail.futures.append(future)
+            self.stats["merged"] += 1
+        else:
+            queue.append(_OutboundMessage(chat_id, text, parse_mode, reply_to, bot,
+                                          priority, mergeable, future, photo))
+
+        depth = self.depth()
+        if depth > self.stats["max_depth"]:
+            self.stats["max_depth"] = depth
+        self._wakeup.set()
+        return await future
+
+    def _chat_ready_at(self, chat_id, now) -> float:
+        ready = self._paused_until.get(chat_id, 0.0)
+        recent = self._recent.get(chat_id)
+        if recent:
+            while recent and now - recent[0] >= 60.0:
+                recent.popleft()
+            if chat_id < 0:
+                if len(recent) >= self.group_per_min:
+                    ready = max(ready, recent[0] + 60.0)
+            elif recent:
+                ready = max(ready, recent[-1] + self.private_interval)
+        return ready
+
+    def _pick(self, now):
+        """Return (message, None) for the best sendable message, or (None, wait seconds)."""
+        best = None
+        best_key = None
+        soonest = None
+        for chat_id, queues in self._queues.items():
+            if chat_id in self._busy:
+                continue
+            for priority, queue in enumerate(queues):
+                if not queue:
+                    continue
+                ready_at = self._chat_ready_at(chat_id, now)
+                if ready_at > now:
+                    soonest = ready_at if soonest is None else min(soonest, ready_at)
+                    break
+                key = (priority, queue[0].enqueued_at)
+                if best_key is None or key < best_key:
+                    best, best_key = queue, key
+                break
+        if best is not None:
+            recent = self._global_recent
+            while recent and now - recent[0] >= 1.0:
+                recent.popleft()
+            if len(recent) >= self.global_per_sec:
+                return None, recent[0] + 1.0 - now
+            return best.popleft(), None
+        return None, (soonest - now) if soonest is not None else None
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            item, wait = (None, None)
+            if self._in_flight < self.max_in_flight:
+                item, wait = self._pick(now)
+
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._global_recent.append(now)
+            self._busy.add(item.chat_id)
+            self._in_flight += 1
+            self._recent.setdefault(item.chat_id, deque()).append(now)
+
+            waited = now - item.enqueued_at
+            TRACER.observe("send_queue_wait", waited)
+            self.stats["wait_count"] += 1
+            self.stats["wait_total_s"] += waited
+            if waited > self.stats["wait_max_s"]:
+                self.stats["wait_max_s"] = waited
+
+            self._loop.create_task(self._deliver(item))
+
+    async def _deliver(self, item):
+        # Own task: log lines for this send carry the sender's correlation id
+        set_correlation_id(item.correlation_id)
+        requeue = False
+        try:
+            item.attempts += 1
+            with TRACER.stage("telegram_send"):
+                if item.photo is not None:
+                    message = await item.reply_to.reply_photo(item.photo, caption=item.text or None)
+                elif item.reply_to is not None:
+                    message = await item.reply_to.reply_text(item.text, parse_mode=item.parse_mode)
+                else:
+                    message = await item.bot.send_message(
+                        chat_id=item.chat_id, text=item.text, parse_mode=item.parse_mode
+                    )
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, datetime.timedelta):
+                retry_after = retry_after.total_seconds()
+            self.stats["retry_after"] += 1
+            self._paused_until[item.chat_id] = time.monotonic() + float(retry_after)
+            logger.warning("Flood control for chat %s, retrying in %ss", item.chat_id, retry_after)
+            requeue = True
+        except (BadRequest, Forbidden) as e:
+            self._fail(item, e)
+        except Exception as e:
+            if _not_sent(e) and item.attempts < SEND_ATTEMPTS:
+                self._paused_until[item.chat_id] = time.monotonic() + item.attempts
+                requeue = True
+            else:
+                self._fail(item, e)
+        else:
+            self.stats["sent"] += 1
+            for future in item.futures:
+                if not future.done():
+                    future.set_result(message)
+        finally:
+            self._in_flight -= 1
+            self._busy.discard(item.chat_id)
+            if requeue:
+                self._queues[item.chat_id][item.priority].appendleft(item)
+            elif not any(self._queues[item.chat_id]):
+                del self._queues[item.chat_id]
+            self._wakeup.set()
+
+    def _fail(self, item, exc):
+        self.stats["failed"] += 1
+        for future in item.futures:
+            if not future.done():
+                future.set_exception(exc)
+
+
+SENDER = OutboundScheduler(
+    SEND_GLOBAL_PER_SEC, SEND_GROUP_PER_MIN, SEND_PRIVATE_PER_SEC, SEND_MAX_IN_FLIGHT
+)
@@ -0,0 +1,195 @@
+"""Startup profiling (`python bot.py --profile-startup`) and the startup budget check."""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTUP_BUDGET_FILE = "startup_budget.json"
+
+# Phases in the order main() runs them
+PHASES = (
+    "imports",
+    "config",
+    "knowledge",
+    "app_build",
+    "handlers",
+    "bot_initialize",
+    "first_get_updates",
+)
+
+
+def import_hot_spots(module: str = "spore.app", limit: int = 10) -> dict:
+    """
+    Run `python -X importtime -c "import <module>"` in a fresh interpreter
+    (the current one has already imported everything) and return the
+    slowest modules by self time plus the direct imports by cumulative time.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, capture_output=True, text=True, env=dict(os.environ),
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+    by_self = sorted(entries, key=lambda e: e[1], reverse=True)[:limit]
+    direct = sorted((e for e in entries if e[3] == 1), key=lambda e: e[2], reverse=True)[:limit]
+    return {
+        "self": [{"module": n, "self_ms": s / 1000, "cumulative_ms": c / 1000} for n, s, c, _ in by_self],
+        "direct": [{"module": n, "cumulative_ms": c / 1000} for n, _, c, _ in direct],
+    }
+
+
+def load_budget(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_budget(phases_ms: dict, budget: dict) -> list[str]:
+    """Return one message per phase (or the total) over its `<phase>_ms` budget."""
+    over = []
+    measured = dict(phases_ms, total=sum(phases_ms.values()))
+    for phase, value in measured.items():
+        limit = budget.get(f"{phase}_ms")
+        if limit is not None and value > limit:
+            over.append(f"{phase}: {value:.1f} ms > budget {limit} ms")
+    return over
+
+
+def _isolate_state_files(workdir: str):
+    """
+    Point the files startup writes (schedule, knowledge index, shared store)
+    at `workdir`, so profiling leaves the real ones alone. Must run before
+    spore.config is imported. The existing knowledge index is copied over,
+    so the knowledge phase still measures a warm start.
+    """
+    index_file = os.getenv("KNOWLEDGE_INDEX_FILE", "knowledge_index.bin")
+    index_copy = os.path.join(workdir, os.path.basename(index_file))
+    if os.path.exists(index_file):
+        shutil.copy(index_file, index_copy)
+    os.environ["KNOWLEDGE_INDEX_FILE"] = index_copy
+    os.environ["SCHEDULE_FILE"] = os.path.join(workdir, "schedule.json")
+    if os.getenv("SHARED_STORE_PATH"):
+        os.environ["SHARED_STORE_PATH"] = os.path.join(workdir, "shared.db")
+
+
+async def _first_contact(app, timings: dict, errors: dict):
+    start = time.perf_counter()
+    try:
+        await app.initialize()  # getMe
+    except Exception as e:
+        errors["bot_initialize"] = str(e)
+    timings["bot_initialize"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    try:
+        # No offset: nothing is confirmed, so no update is consumed
+        await app.bot.get_updates(limit=1, timeout=0)
+    except Exception as e:
+        errors["first_get_updates"] = str(e)
+    timings["first_get_updates"] = (time.perf_counter() - start) * 1000
+
+    try:
+        await app.shutdown()
+    except Exception:
+        pass
+
+
+def profile_startup(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="bot.py --profile-startup")
+    parser.add_argument("--profile-startup", action="store_true")
+    parser.add_argument("--budget", default=STARTUP_BUDGET_FILE, help="budget JSON ('' to skip)")
+    parser.add_argument("--json", dest="json_out", help="write the report to this file")
+    parser.add_argument("--no-hot-spots", action="store_true", help="skip the -X importtime run")
+    args = parser.parse_args(argv)
+
+    timings = {}
+    errors = {}
+    workdir = tempfile.mkdtemp(prefix="spore-startup-")
+    try:
+        return _profile(args, timings, errors, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _profile(args, timings: dict, errors: dict, workdir: str) -> int:
+    _isolate_state_files(workdir)
+
+    # Log lines go to stderr so they don't interleave with the report
+    from .logs import setup_logging
+
+    setup_logging(stream=sys.stderr)
+
+    start = time.perf_counter()
+    app_module = importlib.import_module("spore.app")
+    timings["imports"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    if not app_module.check_config():
+        print("Missing or invalid configuration, can't profile startup.")
+        return 2
+    app_module.load_configuration()
+    timings["config"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    app_module.load_knowledge_base()
+    timings["knowledge"] = (time.perf_counter() - start) * 1000
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    start = time.perf_counter()
+    app = app_module.build_application()
+    timings["app_build"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    app_module.register_handlers(app)
+    timings["handlers"] = (time.perf_counter() - start) * 1000
+
+    loop.run_until_complete(_first_contact(app, timings, errors))
+    loop.close()
+
+    report = {"phases_ms": {phase: round(timings[phase], 3) for phase in PHASES}, "errors": errors}
+    report["total_ms"] = round(sum(timings.values()), 3)
+    if not args.no_hot_spots:
+        report["import_hot_spots"] = import_hot_spots()
+
+    print("\nstartup phase            ms")
+    for phase in PHASES:
+        note = f"  ERROR: {errors[phase]}" if phase in errors else ""
+        print(f"  {phase:<20} {timings[phase]:>9.1f}{note}")
+    print(f"  {'total':<20} {report['total_ms']:>9.1f}")
+
+    if "import_hot_spots" in report:
+        print("\nslowest imports (self ms / cumulative ms)")
+        for entry in report["import_hot_spots"]["self"]:
+            print(f"  {entry['module']:<45} {entry['self_ms']:>8.1f} {entry['cumulative_ms']:>9.1f}")
+        print("\ndirect imports of spore.app (cumulative ms)")
+        for entry in report["import_hot_spots"]["direct"]:
+            print(f"  {entry['module']:<45} {entry['cumulative_ms']:>8.1f}")
+
+    over = []
+    if args.budget and os.path.exists(args.budget):
+        over = check_budget(report["phases_ms"], load_budget(args.budget))
+        report["over_budget"] = over
+        print(f"\nbudget {args.budget}: " + ("OK" if not over else "EXCEEDED"))
+        for line in over:
+            print(f"  {line}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if over else 0
@@ -0,0 +1,368 @@
+"""Atomic file writes and the SQLite store shared by workers in multi-worker mode."""
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+from .config import SHARED_STORE_PATH, WORKER_ID
+from .activity_table import HOURS_BUCKET_PREFIX
+
+
+# --- Shared store + leader election (multi-worker mode) ---
+
+def write_file_atomic(path, payload):
+    """Write str or bytes via a temp file + rename so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    if isinstance(payload, bytes):
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+    os.replace(tmp_path, path)
+
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity (
+    chat_id TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    handle TEXT,
+    PRIMARY KEY (chat_id, bucket, user_id)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_runs (
+    job_key TEXT PRIMARY KEY,
+    worker TEXT NOT NULL,
+    ran_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS timers (
+    name TEXT PRIMARY KEY,
+    due REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recent_updates (
+    seq INTEGER PRIMARY KEY,
+    update_id INTEGER NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedStore:
+    """
+    SQLite file shared by all workers on a host. WAL mode lets workers read
+    while another writes; every write is one short IMMEDIATE transaction, so
+    concurrent workers serialize on the file lock instead of losing updates.
+    The connection is opened lazily and guarded by a lock (it's used from
+    worker threads via asyncio.to_thread).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SHARED_SCHEMA)
+            self._migrate_updates(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _migrate_updates(conn):
+        """Older stores kept update_ids in "updates", ordered by id rather than arrival."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'updates'").fetchone():
+                conn.execute(
+                    "INSERT OR IGNORE INTO recent_updates (update_id) SELECT update_id FROM updates ORDER BY update_id"
+                )
+                conn.execute("DROP TABLE updates")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # -- leases / exactly-once jobs --
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Take or extend lease `name`; True if `holder` owns it afterwards."""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, "
+                "expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (name, holder, now + ttl, now),
+            )
+            row = conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == holder
+
+    def release_lease(self, name: str, holder: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def claim_job(self, job_key: str, worker: str) -> bool:
+        """Record that `job_key` runs now; False if any worker already claimed it."""
+        with self.transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO job_runs (job_key, worker, ran_at) VALUES (?, ?, ?)",
+                (job_key, worker, time.time()),
+            )
+        return cur.rowcount == 1
+
+    def claim_jobs(self, job_keys, worker: str) -> set:
+        """claim_job for several keys in one transaction; returns the keys claimed now."""
+        claimed = set()
+        now = time.time()
+        with self.transaction() as conn:
+            for job_key in job_keys:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO job_runs (job_key, worker, ran_at) VALUES (?, ?, ?)",
+                    (job_key, worker, now),
+                )
+                if cur.rowcount == 1:
+                    claimed.add(job_key)
+        return claimed
+
+    def release_job(self, job_key: str, worker: str):
+        """Undo `worker`'s claim on a run that was abandoned before it did anything."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM job_runs WHERE job_key = ? AND worker = ?", (job_key, worker))
+
+    def job_ran(self, job_key: str) -> bool:
+        return bool(self.query("SELECT 1 FROM job_runs WHERE job_key = ?", (job_key,)))
+
+    def load_due(self, name: str):
+        rows = self.query("SELECT due FROM timers WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def store_due(self, name: str, due: float, previous) -> float:
+        """
+        Replace timer `name` if it still holds `previous` (compare-and-set),
+        so racing workers agree on one due time; returns the stored value.
+        """
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO timers (name, due) VALUES (?, ?) ON CONFLICT(name) "
+                "DO UPDATE SET due = excluded.due WHERE timers.due IS ?",
+                (name, due, previous),
+            )
+            return conn.execute("SELECT due FROM timers WHERE name = ?", (name,)).fetchone()[0]
+
+    # -- cache --
+
+    def cache_get(self, key: str):
+        rows = self.query(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        )
+        return rows[0][0] if rows else None
+
+    def cache_set(self, key: str, value: str, ttl: float):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+
+    # -- activity (same chat -> bucket -> user layout as activity.json) --
+
+    def add_activity(self, rows, marker: str = None) -> bool:
+        """
+        Add (chat_id, bucket, user_id, delta, handle) rows in one transaction.
+        With `marker`, the rows are only applied if that job key is unclaimed
+        (used for the one-time activity.json import).
+        """
+        with self.transaction() as conn:
+            if marker is not None:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO job_runs (job_key, worker, ran_at) VALUES (?, ?, ?)",
+                    (marker, WORKER_ID, time.time()),
+                )
+                if cur.rowcount != 1:
+                    return False
+            conn.executemany(
+                "INSERT INTO activity (chat_id, bucket, user_id, count, handle) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(chat_id, bucket, user_id) DO UPDATE SET "
+                "count = count + excluded.count, handle = excluded.handle",
+                rows,
+            )
+        return True
+
+    def claim_update(self, update_id: int, keep_updates: int) -> bool:
+        """
+        Record that a worker handles update_id; False if any worker already
+        did (Telegram re-delivery, a webhook retry reaching another worker).
+        The newest keep_updates ids are kept.
+        """
+        with self.transaction() as conn:
+            cur = conn.execute("INSERT OR IGNORE INTO recent_updates (update_id) VALUES (?)", (update_id,))
+            if cur.rowcount != 1:
+                return False
+            # Oldest first by arrival: Telegram may re-seed update_id lower
+            conn.execute(
+                "DELETE FROM recent_updates WHERE seq <= (SELECT MAX(seq) FROM recent_updates) - ?",
+                (keep_updates,),
+            )
+        return True
+
+    def add_message_activity(self, entries, keep_hour_weeks: int = None) -> int:
+        """
+        Count (chat_id, week, user_id, handle, hour) messages in one
+        transaction. A user_id / hour of None isn't counted; hours go to
+        "_hours:<week>" buckets keyed by hour of week, of which each chat
+        keeps the newest keep_hour_weeks. Returns how many were counted.
+        """
+        counted = 0
+        hour_buckets = set()  # (chat_id, bucket) known to exist in this transaction
+        with self.transaction() as conn:
+            for chat_id, week_key, user_id, handle, hour in entries:
+                if user_id is not None:
+                    conn.execute(
+                        "INSERT INTO activity (chat_id, bucket, user_id, count, handle) "
+                        "VALUES (?, ?, ?, 1, ?) ON CONFLICT(chat_id, bucket, user_id) DO UPDATE SET "
+                        "count = count + 1, handle = excluded.handle",
+                        (chat_id, week_key, user_id, handle),
+                    )
+                if hour is not None:
+                    bucket = HOURS_BUCKET_PREFIX + week_key
+                    if keep_hour_weeks and (chat_id, bucket) not in hour_buckets:
+                        hour_buckets.add((chat_id, bucket))
+                        if not conn.execute(
+                            "SELECT 1 FROM activity WHERE chat_id = ? AND bucket = ? LIMIT 1", (chat_id, bucket)
+                        ).fetchone():
+                            self._prune_hour_buckets(conn, chat_id, bucket, keep_hour_weeks)
+                    conn.execute(
+                        "INSERT INTO activity (chat_id, bucket, user_id, count) VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT(chat_id, bucket, user_id) DO UPDATE SET count = count + 1",
+                        (chat_id, bucket, str(hour)),
+                    )
+                counted += 1
+        return counted
+
+    @staticmethod
+    def _prune_hour_buckets(conn, chat_id: str, new_bucket: str, keep_weeks: int):
+        """Before `new_bucket` is created: keep only the chat's newest keep_weeks "_hours:" buckets, counting it."""
+        pattern = HOURS_BUCKET_PREFIX + "*"
+        conn.execute(
+            "DELETE FROM activity WHERE chat_id = ? AND bucket GLOB ? AND bucket NOT IN ("
+            "SELECT bucket FROM (SELECT DISTINCT bucket FROM activity WHERE chat_id = ? AND bucket GLOB ? "
+            "UNION SELECT ?) ORDER BY bucket DESC LIMIT ?)",
+            (chat_id, pattern, chat_id, pattern, new_bucket, keep_weeks),
+        )
+
+    def recent_update_ids(self, limit: int) -> list[int]:
+        rows = self.query(
+            "SELECT update_id FROM recent_updates ORDER BY seq DESC LIMIT ?", (limit,)
+        )
+        return [row[0] for row in reversed(rows)]
+
+    def activity_bucket(self, chat_id: str, bucket: str) -> dict:
+        rows = self.query(
+            "SELECT user_id, count, handle FROM activity WHERE chat_id = ? AND bucket = ?",
+            (chat_id, bucket),
+        )
+        return {user_id: {"count": count, "handle": handle} for user_id, count, handle in rows}
+
+    def activity_buckets(self, buckets) -> dict:
+        """{chat_id: {bucket: {user_id: {"count", "handle"}}}} for the given buckets of every chat."""
+        buckets = list(buckets)
+        rows = self.query(
+            "SELECT chat_id, bucket, user_id, count, handle FROM activity "
+            f"WHERE bucket IN ({', '.join('?' * len(buckets))}) AND count > 0",
+            buckets,
+        )
+        result = {}
+        for chat_id, bucket, user_id, count, handle in rows:
+            result.setdefault(chat_id, {}).setdefault(bucket, {})[user_id] = {"count": count, "handle": handle}
+        return result
+
+    def record_wins(self, marker: str, winners) -> dict:
+        """
+        Add one lifetime win per (chat_id, user_id, handle) in one
+        transaction, unless the chat already has a `marker` bucket from an
+        earlier attempt: then the winner recorded there is kept. Returns
+        {chat_id: (user_id, handle, lifetime wins)}.
+        """
+        results = {}
+        with self.transaction() as conn:
+            for chat_id, user_id, handle in winners:
+                row = conn.execute(
+                    "SELECT user_id, handle FROM activity WHERE chat_id = ? AND bucket = ? LIMIT 1",
+                    (chat_id, marker),
+                ).fetchone()
+                if row is not None:
+                    user_id, handle = row
+                else:
+                    conn.executemany(
+                        "INSERT INTO activity (chat_id, bucket, user_id, count, handle) "
+                        "VALUES (?, ?, ?, 1, ?) ON CONFLICT(chat_id, bucket, user_id) DO UPDATE SET "
+                        "count = count + 1, handle = excluded.handle",
+                        [(chat_id, marker, user_id, handle), (chat_id, "_wins", user_id, handle)],
+                    )
+                total = conn.execute(
+                    "SELECT count FROM activity WHERE chat_id = ? AND bucket = '_wins' AND user_id = ?",
+                    (chat_id, user_id),
+                ).fetchone()
+                results[chat_id] = (user_id, handle, total[0] if total else 0)
+        return results
+
+    def hour_counts(self, chat_id: str, week_keys) -> dict:
+        """{hour of week: messages} summed over the given weeks' "_hours:<week>" buckets."""
+        buckets = [HOURS_BUCKET_PREFIX + week_key for week_key in week_keys]
+        if not buckets:
+            return {}
+        rows = self.query(
+            "SELECT user_id, SUM(count) FROM activity WHERE chat_id = ? "
+            f"AND bucket IN ({', '.join('?' * len(buckets))}) GROUP BY user_id",
+            (chat_id, *buckets),
+        )
+        return {int(hour): count for hour, count in rows}
+
+    def clear_buckets(self, pairs):
+        """Delete (chat_id, bucket) buckets in one transaction."""
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM activity WHERE chat_id = ? AND bucket = ?", list(pairs))
+
+
+SHARED_STORE = SharedStore(SHARED_STORE_PATH) if SHARED_STORE_PATH else None
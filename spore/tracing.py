@@ -0,0 +1,173 @@
+"""Per-stage latency histograms for update handling (shown by /stats)."""
+
+import bisect
+import threading
+import time
+
+
+# --- Latency histograms ---
+
+# Bucket upper bounds in seconds: 0.1 ms .. ~150 s, ~12% apart, so any
+# quantile is within one bucket width of the true value
+_BOUNDS = []
+_bound = 0.0001
+while _bound < 150:
+    _BOUNDS.append(_bound)
+    _bound *= 1.12
+del _bound
+
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets: observe() is a bisect and an increment."""
+
+    __slots__ = ("counts", "count", "errors", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.counts[bisect.bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (capped at max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(_BOUNDS[i], self.max) if i < len(_BOUNDS) else self.max
+        return self.max
+
+
+class _StageTimer:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.observe(self.name, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+class StageTracer:
+    """
+    Named stages (track_activity, mention_detection, fetch_prices, completion,
+    reply_text, ...) each get a LatencyHistogram. Stages run on the event
+    loop and in to_thread workers, so updates take a short lock.
+
+        with TRACER.stage("fetch_prices"):
+            ...
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> _StageTimer:
+        return _StageTimer(self, name)
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            hist = self._stages.get(name)
+            if hist is None:
+                hist = self._stages[name] = LatencyHistogram()
+            hist.observe(seconds, error)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        """Plain-dict summary: uptime, counters and p50/p95/p99 (ms) per stage."""
+        with self._lock:
+            uptime = max(time.time() - self.started_at, 1e-9)
+            stages = {
+                name: {
+                    "count": hist.count,
+                    "errors": hist.errors,
+                    "per_sec": hist.count / uptime,
+                    "mean_ms": hist.total / hist.count * 1000 if hist.count else 0.0,
+                    "p50_ms": hist.quantile(0.50) * 1000,
+                    "p95_ms": hist.quantile(0.95) * 1000,
+                    "p99_ms": hist.quantile(0.99) * 1000,
+                    "max_ms": hist.max * 1000,
+                }
+                for name, hist in self._stages.items()
+            }
+            return {"uptime_s": uptime, "counters": dict(self._counters), "stages": stages}
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._stages.clear()
+            self._counters.clear()
+
+
+TRACER = StageTracer()
+
+
+def format_stats(snap: dict) -> str:
+    """Monospace table for /stats (latencies in ms unless suffixed)."""
+    uptime = snap["uptime_s"]
+    counters = snap["counters"]
+    updates = counters.get("updates", 0)
+    lines = [
+        f"uptime {_duration(uptime)}, {updates} updates ({updates / uptime:.2f}/s), "
+        f"{counters.get('handler_errors', 0)} handler errors",
+    ]
+    shed = {name[5:]: n for name, n in sorted(counters.items()) if name.startswith("shed_")}
+    if counters.get("duplicate_updates") or shed:
+        parts = [f"{counters.get('duplicate_updates', 0)} redelivered"]
+        parts += [f"{n} {reason}" for reason, n in shed.items()]
+        lines.append("shed: " + ", ".join(parts))
+    if counters.get("llm_calls"):
+        prompt = counters.get("llm_prompt_tokens", 0)
+        cached = counters.get("llm_cached_tokens", 0)
+        lines.append(
+            f"llm: {counters['llm_calls']} calls, {prompt} prompt tokens "
+            f"({100.0 * cached / prompt if prompt else 0.0:.0f}% cached), "
+            f"{counters.get('llm_completion_tokens', 0)} completion tokens"
+        )
+    lines += [
+        "",
+        f"{'stage':<30}{'n':>7}{'err%':>6}{'p50':>8}{'p95':>8}{'p99':>8}",
+    ]
+    for name, s in sorted(snap["stages"].items()):
+        err_pct = 100.0 * s["errors"] / s["count"] if s["count"] else 0.0
+        lines.append(
+            f"{name:<30}{s['count']:>7}{err_pct:>6.1f}"
+            f"{_ms(s['p50_ms']):>8}{_ms(s['p95_ms']):>8}{_ms(s['p99_ms']):>8}"
+        )
+    return "\n".join(lines)
+
+
+def _ms(value: float) -> str:
+    if value >= 10000:
+        return f"{value / 1000:.1f}s"
+    return f"{value:.1f}" if value >= 1 else f"{value:.2f}"
+
+
+def _duration(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 60:.1f}m" if seconds >= 60 else f"{seconds:.0f}s"
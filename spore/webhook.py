@@ -0,0 +1,179 @@
+"""Webhook mode: embedded HTTP server feeding the update queue."""
+
+import asyncio
+import hmac
+import json
+import logging
+
+from telegram import Update
+
+from .config import (
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_BODY_BYTES,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_REUSE_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+from .lifecycle import drain, stop_event_on_signals
+
+logger = logging.getLogger(__name__)
+
+
+# --- Webhook mode (embedded HTTP server) ---
+
+
+class WebhookServer:
+    """
+    Minimal asyncio HTTP server for Telegram webhook delivery.
+
+    POST <path>   verify the secret token, parse the Update and put it on the
+                  application's bounded update queue (503 when full, so
+                  Telegram retries later instead of us buffering unboundedly)
+    GET /healthz  liveness: the process is up
+    GET /readyz   readiness: application running and intake not saturated
+    """
+
+    def __init__(self, app, secret: str, path: str = "/telegram", max_body: int = 1024 * 1024):
+        self.app = app
+        self.secret = secret
+        self.path = path
+        self.max_body = max_body
+        self.accepting = True
+        self.stats = {"accepted": 0, "rejected_secret": 0, "rejected_full": 0, "bad_request": 0}
+        self._server = None
+
+    async def start(self, host: str, port: int, reuse_port: bool = False):
+        self._server = await asyncio.start_server(
+            self._handle_connection, host, port, reuse_port=reuse_port or None
+        )
+        sockets = self._server.sockets or []
+        bound = sockets[0].getsockname() if sockets else (host, port)
+        logger.info("Listening on %s:%s%s", bound[0], bound[1], self.path)
+
+    async def stop(self):
+        self.accepting = False
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def is_ready(self) -> bool:
+        queue = self.app.update_queue
+        full = queue.maxsize > 0 and queue.qsize() >= queue.maxsize
+        return self.accepting and self.app.running and not full
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            status, body = await self._handle_request(reader)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            status, body = 400, {"ok": False, "error": "malformed request"}
+        except Exception as e:
+            logger.exception("Error handling request: %s", e)
+            status, body = 500, {"ok": False, "error": "internal error"}
+
+        raw = json.dumps(body).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+                  405: "Method Not Allowed", 413: "Payload Too Large",
+                  500: "Internal Server Error", 503: "Service Unavailable"}.get(status, "OK")
+        try:
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(raw)}\r\n"
+                "Connection: close\r\n\r\n".encode("ascii")
+                + raw
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader):
+        request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        path = target.split("?", 1)[0]
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=10)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if method == "GET" and path == "/healthz":
+            return 200, {"ok": True, "status": "alive"}
+        if method == "GET" and path == "/readyz":
+            ready = self.is_ready()
+            return (200 if ready else 503), {
+                "ok": ready,
+                "queue_depth": self.app.update_queue.qsize(),
+                "queue_size": self.app.update_queue.maxsize,
+                **self.stats,
+            }
+        if path != self.path:
+            return 404, {"ok": False, "error": "not found"}
+        if method != "POST":
+            return 405, {"ok": False, "error": "method not allowed"}
+
+        token = headers.get("x-telegram-bot-api-secret-token", "")
+        if not self.secret or not hmac.compare_digest(token.encode(), self.secret.encode()):
+            self.stats["rejected_secret"] += 1
+            return 403, {"ok": False, "error": "bad secret token"}
+
+        length = int(headers.get("content-length") or 0)
+        if length > self.max_body:
+            return 413, {"ok": False, "error": "payload too large"}
+        payload = await asyncio.wait_for(reader.readexactly(length), timeout=10)
+
+        if not self.accepting:
+            self.stats["rejected_full"] += 1
+            return 503, {"ok": False, "error": "shutting down"}
+
+        try:
+            update = Update.de_json(json.loads(payload), self.app.bot)
+        except Exception:
+            self.stats["bad_request"] += 1
+            return 400, {"ok": False, "error": "invalid update"}
+
+        try:
+            self.app.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.stats["rejected_full"] += 1
+            return 503, {"ok": False, "error": "intake queue full"}
+
+        self.stats["accepted"] += 1
+        return 200, {"ok": True}
+
+
+async def run_webhook(app):
+    """
+    Run the application fed by the embedded webhook server until
+    SIGINT/SIGTERM, then drain; returns the drain report.
+    """
+    stop_event = stop_event_on_signals()
+
+    server = WebhookServer(app, WEBHOOK_SECRET, WEBHOOK_PATH, WEBHOOK_MAX_BODY_BYTES)
+    async with app:
+        await app.start()
+        await server.start(WEBHOOK_LISTEN, WEBHOOK_PORT, reuse_port=WEBHOOK_REUSE_PORT)
+
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info("Registered webhook %s", WEBHOOK_URL)
+        else:
+            logger.info("WEBHOOK_URL not set, not registering with Telegram.")
+
+        try:
+            await stop_event.wait()
+        finally:
+            # Telegram retries what the closed server no longer accepts
+            report = await drain(app, server.stop)
+    return report